@@ -0,0 +1,252 @@
+"""
+Benchmark the tfapi, yolov2 and yolov3 pipelines of bin/obj_detector.py
+offline, on the same clip with a fixed number of frames.
+
+The clip is built from a local video, or from the images of
+object_detection/test_images shifted a few pixels per frame. Every detector
+runs in its own obj_detector.py process writing its per stage latencies
+(obj_track.detection.timing) after a warm-up, the process is reaped with
+os.wait4 to get its own peak RSS. The results can be saved as a baseline and
+later runs compared to it, the program exits with status 1 when a number is
+worse than the baseline by more than the tolerance.
+
+Run this program like this:
+- python benchmarks/bench_detectors.py [OPTIONS]
+
+OPTIONS
+-------
+--detectors : detectors to run, among tfapi, yolov2 and yolov3.
+--video : local video to take the frames from instead of the test images.
+--size : width and height of the frames built from the test images.
+--warmup : number of first frames left out of the steady state numbers.
+--frames : number of frames of the steady state.
+--batch-size : frames per inference call of yolov3.
+--detect-every : run the network every k frames (num_frames of tfapi).
+--config : configuration of the TF API, configs/cfg.json by default.
+--output : JSON file the results are written to.
+--baseline : JSON results of a previous run to compare to.
+--tolerance : relative degradation allowed before a regression is reported.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BIN_DIR = os.path.join(REPO_DIR, 'bin')
+TEST_IMAGES_DIR = os.path.join(REPO_DIR, 'models', 'research',
+                               'object_detection', 'test_images')
+DETECTORS = ('tfapi', 'yolov2', 'yolov3')
+# Metrics compared to the baseline, higher is better only for fps.
+HIGHER_IS_BETTER = {'fps'}
+
+
+def make_clip(path, num_frames, video=None, size=(1280, 720), fps=30):
+    """Write num_frames frames to path, the first frames of video (looped
+    if it is shorter) or the test images, each shown for one second and
+    shifted by 4 pixels every frame."""
+    if video:
+        capture = cv2.VideoCapture(video)
+        ok, frame = capture.read()
+        if not ok:
+            raise ValueError('Cannot read {}'.format(video))
+        size = (frame.shape[1], frame.shape[0])
+        fps = capture.get(cv2.CAP_PROP_FPS) or fps
+    else:
+        images = [cv2.resize(cv2.imread(os.path.join(TEST_IMAGES_DIR, name)),
+                             size, interpolation=cv2.INTER_AREA)
+                  for name in sorted(os.listdir(TEST_IMAGES_DIR))
+                  if name.endswith('.jpg')]
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps,
+                             size)
+    for k in range(num_frames):
+        if video:
+            if k:
+                ok, frame = capture.read()
+                if not ok:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ok, frame = capture.read()
+        else:
+            frame = np.roll(images[(k // int(fps)) % len(images)], 4 * k,
+                            axis=1)
+        writer.write(frame)
+    writer.release()
+    if video:
+        capture.release()
+    return path
+
+
+def peak_rss_mb(rusage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1024. * 1024. if sys.platform == 'darwin' else 1024.
+    return rusage.ru_maxrss / scale
+
+
+def run_detector(detector, clip, work_dir, args, extra_args=()):
+    """Run obj_detector.py on the clip, with extra_args appended to its
+    command line, return the results of the detector."""
+    out_dir = os.path.join(work_dir, detector)
+    os.makedirs(out_dir, exist_ok=True)
+    timings = os.path.join(out_dir, 'timings.json')
+    command = [sys.executable, 'obj_detector.py', '-v', clip, '-d', detector,
+               '-s', out_dir, '-k', str(args.detect_every),
+               '-b', str(args.batch_size),
+               '--timings', timings, '--timings-every', '1e9',
+               '--timings-warmup', str(args.warmup)]
+    if detector == 'tfapi':
+        with open(args.config) as fid:
+            params = json.load(fid)
+        params.update({'base_dir': os.path.join(REPO_DIR, 'models',
+                                                'research',
+                                                'object_detection'),
+                       'save': True, 'show': False, 'out': out_dir + '/',
+                       'num_frames': args.detect_every})
+        config = os.path.join(out_dir, 'cfg.json')
+        with open(config, 'w') as fid:
+            json.dump(params, fid)
+        command += ['-c', config]
+    command += list(extra_args)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [REPO_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+    log_path = os.path.join(out_dir, 'log.txt')
+    start = time.time()
+    # obj_detector.py expects to be started from bin/.
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=BIN_DIR, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        _, status, rusage = os.wait4(process.pid, 0)
+    wall_time = time.time() - start
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    # Already reaped, Popen must not wait for it.
+    process.returncode = returncode
+
+    result = {'returncode': returncode, 'wall_s': wall_time,
+              'peak_rss_mb': peak_rss_mb(rusage)}
+    if returncode != 0 or not os.path.isfile(timings):
+        with open(log_path) as log:
+            result['error'] = 'obj_detector.py failed:\n' + \
+                log.read()[-2000:]
+        return result
+    with open(timings) as fid:
+        summary = json.load(fid)
+    result.update({
+        'frames': summary['frames'],
+        'fps': summary['fps'],
+        # Start of the process to steady state: imports, model load and
+        # the warm-up frames.
+        'warmup_s': summary['warmup_end'] - start
+        if summary['warmup_end'] else None,
+        'stages': summary['stages']})
+    return result
+
+
+def metrics(result):
+    """Flat {name: value} of the numbers gated on."""
+    values = {'fps': result.get('fps'),
+              'warmup_s': result.get('warmup_s'),
+              'peak_rss_mb': result.get('peak_rss_mb')}
+    for name, stage in result.get('stages', {}).items():
+        values['{}.p95_ms'.format(name)] = stage['p95_ms']
+    return {name: value for name, value in values.items()
+            if value is not None}
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against baseline, as strings."""
+    regressions = []
+    for detector, base in baseline['detectors'].items():
+        if 'error' in base:
+            continue
+        result = results['detectors'].get(detector)
+        if result is None:
+            continue
+        if 'error' in result:
+            regressions.append('{}: failed with status {}'.format(
+                detector, result['returncode']))
+            continue
+        current = metrics(result)
+        for name, base_value in metrics(base).items():
+            if name not in current:
+                continue
+            value = current[name]
+            if name in HIGHER_IS_BETTER:
+                worse = value < base_value * (1 - tolerance)
+            else:
+                worse = value > base_value * (1 + tolerance)
+            if worse:
+                regressions.append('{} {}: {:.2f}, baseline {:.2f}'.format(
+                    detector, name, value, base_value))
+    return regressions
+
+
+def report(results):
+    for detector, result in results['detectors'].items():
+        if 'error' in result:
+            print('{}: {}'.format(detector, result['error']))
+            continue
+        print('{}: {:.1f} FPS over {} frames, warm-up {:.1f} s, peak RSS '
+              '{:.0f} MB'.format(detector, result['fps'], result['frames'],
+                                 result['warmup_s'] or 0.,
+                                 result['peak_rss_mb']))
+        for name, stage in result['stages'].items():
+            print('{:>14}: p50 {:.2f} ms, p95 {:.2f} ms, p99 {:.2f} '
+                  'ms'.format(name, stage['p50_ms'], stage['p95_ms'],
+                              stage['p99_ms']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="offline benchmark of the detectors")
+    parser.add_argument("--detectors", type=str, nargs='+',
+                        default=list(DETECTORS), choices=DETECTORS)
+    parser.add_argument("--video", type=str)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720],
+                        metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--config", type=str,
+                        default=os.path.join(REPO_DIR, 'configs',
+                                             'cfg.json'))
+    parser.add_argument("--output", type=str)
+    parser.add_argument("--baseline", type=str)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_detectors_')
+    try:
+        clip = make_clip(os.path.join(work_dir, 'clip.avi'),
+                         args.warmup + args.frames, video=args.video,
+                         size=tuple(args.size))
+        results = {'config': {key: value for key, value in vars(args).items()
+                              if key not in ('output', 'baseline')},
+                   'detectors': {}}
+        for detector in args.detectors:
+            print('Running {}'.format(detector))
+            results['detectors'][detector] = run_detector(detector, clip,
+                                                          work_dir, args)
+        report(results)
+        if args.output:
+            with open(args.output, 'w') as fid:
+                json.dump(results, fid, indent=2)
+    finally:
+        shutil.rmtree(work_dir)
+
+    if args.baseline:
+        with open(args.baseline) as fid:
+            baseline = json.load(fid)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION {}'.format(regression))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,68 @@
+"""
+Benchmark the HSV color jitter of get_random_data, per image cost of every
+backend of distort_image and its difference with the matplotlib one.
+
+Run this program like this:
+- python benchmarks/bench_hsv_jitter.py [OPTIONS]
+
+OPTIONS
+-------
+--size : side of the square RGB image, e.g. the model input size.
+--image : jitter this image instead of a synthetic one.
+--runs : number of timed runs after one warm-up run.
+"""
+import argparse
+from timeit import default_timer as timer
+
+import cv2
+import numpy as np
+
+from obj_track.yad2k.utils.utils_yolo_v3 import distort_image, HSV_BACKENDS
+
+# (hue, sat, val) drawn like get_random_data does with its defaults.
+JITTERS = [(.05, 1.3, .8), (-.08, 1 / 1.4, 1.2), (.1, 1.5, 1 / 1.5)]
+
+
+def synthetic_image(size, seed=0):
+    """Smooth gradients with some noise, closer to photos than pure noise."""
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:size, 0:size] / float(size)
+    image = np.stack([x, y, 1 - x * y], axis=-1) * 200 + \
+        rng.randn(size, size, 3) * 20
+    return np.clip(image + 28, 0, 255).astype('uint8')
+
+
+def time_runs(fn, runs):
+    fn()  # warm-up
+    times = []
+    for _ in range(runs):
+        start = timer()
+        result = fn()
+        times.append(timer() - start)
+    return result, 1000. * np.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HSV jitter benchmark")
+    parser.add_argument("--size", type=int, default=416)
+    parser.add_argument("--image", type=str)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.image:
+        image = cv2.cvtColor(cv2.imread(args.image), cv2.COLOR_BGR2RGB)
+    else:
+        image = synthetic_image(args.size)
+    print('image: {}x{}'.format(image.shape[1], image.shape[0]))
+
+    reference = [distort_image(image, *jitter, backend='matplotlib')
+                 for jitter in JITTERS]
+    for backend in HSV_BACKENDS:
+        results, run_time = time_runs(
+            lambda: [distort_image(image, *jitter, backend=backend)
+                     for jitter in JITTERS], args.runs)
+        error = np.array([np.abs(result - ref).mean() for result, ref
+                          in zip(results, reference)]) * 255
+        print('{}: {:.2f} ms per image, mean difference with matplotlib '
+              '{:.3f} grey levels'.format(backend, run_time / len(JITTERS),
+                                          error.mean()))
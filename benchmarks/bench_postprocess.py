@@ -0,0 +1,111 @@
+"""
+Benchmark the YOLOv3 post-processing, TF graph (yolo_eval with per class or
+class offset NMS) against NumPy (yolo_eval_np), on synthetic model outputs.
+
+Run this program like this:
+- python benchmarks/bench_postprocess.py [OPTIONS]
+
+OPTIONS
+-------
+--size : model input size, multiple of 32.
+--classes : number of classes.
+--objects : approximate number of confident predictions per frame.
+--runs : number of timed runs after one warm-up run.
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from obj_track.yad2k.models.numpy_yolov3 import yolo_eval_np
+
+YOLOV3_ANCHORS = np.array([[10, 13], [16, 30], [33, 23], [30, 61], [62, 45],
+                           [59, 119], [116, 90], [156, 198], [373, 326]],
+                          dtype='float32')
+
+
+def synthetic_outputs(size, num_classes, num_objects, seed=0):
+    """Raw yolo_body outputs with about num_objects confident boxes."""
+    rng = np.random.RandomState(seed)
+    outputs = []
+    for stride in (32, 16, 8):
+        grid = size // stride
+        feats = rng.randn(1, grid, grid, 3, num_classes + 5).astype('float32')
+        # Mostly background, a few confident cells.
+        feats[..., 4] -= 8.
+        feats[..., 5:] -= 4.
+        cells = rng.randint(0, grid, size=(num_objects, 2))
+        anchors = rng.randint(0, 3, size=num_objects)
+        feats[0, cells[:, 0], cells[:, 1], anchors, 4] += 12.
+        outputs.append(feats.reshape(1, grid, grid, -1))
+    return outputs
+
+
+def time_runs(fn, runs):
+    fn()  # warm-up
+    times = []
+    for _ in range(runs):
+        start = timer()
+        result = fn()
+        times.append(timer() - start)
+    return result, 1000. * np.median(times)
+
+
+def bench_graph(outputs, num_classes, image_shape, runs, nms):
+    """Build yolo_eval on placeholders, return detections, build and run
+    times, None if TensorFlow is not available."""
+    try:
+        from keras import backend as K
+        from obj_track.yad2k.models.keras_yolov3 import yolo_eval
+    except ImportError:
+        return None
+    start = timer()
+    feats = [K.placeholder(shape=(None, None, None, out.shape[-1]))
+             for out in outputs]
+    input_image_shape = K.placeholder(shape=(2, ))
+    boxes, scores, classes = yolo_eval(feats, YOLOV3_ANCHORS, num_classes,
+                                       input_image_shape,
+                                       score_threshold=.3, iou_threshold=.5,
+                                       nms=nms)
+    build_time = 1000. * (timer() - start)
+    sess = K.get_session()
+    feed_dict = dict(zip(feats, outputs))
+    feed_dict[input_image_shape] = image_shape
+
+    result, run_time = time_runs(
+        lambda: sess.run([boxes, scores, classes], feed_dict=feed_dict), runs)
+    return result, build_time, run_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="YOLOv3 post-processing benchmark")
+    parser.add_argument("--size", type=int, default=416)
+    parser.add_argument("--classes", type=int, default=80)
+    parser.add_argument("--objects", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    image_shape = [1080, 1920]
+    outputs = synthetic_outputs(args.size, args.classes, args.objects)
+
+    np_result, np_time = time_runs(
+        lambda: yolo_eval_np(outputs, YOLOV3_ANCHORS, args.classes,
+                             image_shape, score_threshold=.3,
+                             iou_threshold=.5), args.runs)
+    print('numpy: {:.2f} ms per frame, {} boxes'.format(np_time,
+                                                       len(np_result[0])))
+
+    for nms in ('per_class', 'offset'):
+        graph = bench_graph(outputs, args.classes, image_shape, args.runs,
+                            nms)
+        if graph is None:
+            print('graph: skipped, TensorFlow/Keras not installed')
+            break
+        graph_result, build_time, graph_time = graph
+        print('graph {}: {:.2f} ms per frame, {} boxes, {:.0f} ms to '
+              'build'.format(nms, graph_time, len(graph_result[0]),
+                             build_time))
+        same = all(a.shape == b.shape and np.allclose(a, b, atol=1e-2)
+                   for a, b in zip(np_result, graph_result))
+        print('same detections as numpy: {}'.format(same))
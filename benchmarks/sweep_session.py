@@ -0,0 +1,119 @@
+"""
+Find the TF session settings (obj_track.detection.session) giving the
+highest frame rate of a detector on this host.
+
+Every combination of intra_op threads, inter_op threads and XLA is run by
+bench_detectors.run_detector on the same clip, the Grappler options are
+taken as they are from --base-config. The best setting is written as a
+config usable with obj_detector.py --session-config.
+
+Run this program like this:
+- python benchmarks/sweep_session.py [OPTIONS]
+
+OPTIONS
+-------
+--detector : detector to tune, tfapi, yolov2 or yolov3.
+--intra : intra_op thread counts to try, 0 lets TF pick. Powers of two up to
+the number of cores and 0 by default.
+--inter : inter_op thread counts to try.
+--xla : off, on or both.
+--base-config : JSON config whose "session" entry the settings start from.
+--video, --size, --warmup, --frames, --batch-size, --detect-every, --config :
+as in bench_detectors.py.
+--output : JSON file the best setting is written to, {"session": {...}}.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+from bench_detectors import DETECTORS, REPO_DIR, make_clip, run_detector
+
+XLA_CHOICES = {'off': [False], 'on': [True], 'both': [False, True]}
+
+
+def default_intra_threads():
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count()
+    threads = [0]
+    n = 1
+    while n <= cores:
+        threads.append(n)
+        n *= 2
+    if threads[-1] != cores:
+        threads.append(cores)
+    return threads
+
+
+def settings(base, intra, inter, xla):
+    """Session settings of every combination, base for the other keys."""
+    for intra_op, inter_op, use_xla in itertools.product(intra, inter, xla):
+        yield dict(base, intra_op_threads=intra_op,
+                   inter_op_threads=inter_op, xla=use_xla)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="sweep of the TF session settings")
+    parser.add_argument("--detector", type=str, default="yolov3",
+                        choices=DETECTORS)
+    parser.add_argument("--intra", type=int, nargs='+')
+    parser.add_argument("--inter", type=int, nargs='+', default=[1, 2])
+    parser.add_argument("--xla", type=str, default="both",
+                        choices=sorted(XLA_CHOICES))
+    parser.add_argument("--base-config", type=str)
+    parser.add_argument("--video", type=str)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720],
+                        metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--config", type=str,
+                        default=os.path.join(REPO_DIR, 'configs',
+                                             'cfg.json'))
+    parser.add_argument("--output", type=str)
+    args = parser.parse_args()
+
+    base = {}
+    if args.base_config:
+        with open(args.base_config) as fid:
+            base = json.load(fid).get('session', {})
+    intra = args.intra or default_intra_threads()
+
+    work_dir = tempfile.mkdtemp(prefix='sweep_session_')
+    results = []
+    try:
+        clip = make_clip(os.path.join(work_dir, 'clip.avi'),
+                         args.warmup + args.frames, video=args.video,
+                         size=tuple(args.size))
+        for k, params in enumerate(settings(base, intra, args.inter,
+                                            XLA_CHOICES[args.xla])):
+            config = os.path.join(work_dir, 'session_{}.json'.format(k))
+            with open(config, 'w') as fid:
+                json.dump({'session': params}, fid)
+            result = run_detector(args.detector, clip,
+                                  os.path.join(work_dir, 'run_{}'.format(k)),
+                                  args, ['--session-config', config])
+            fps = result.get('fps')
+            print('intra {:>3}, inter {:>2}, xla {:<5}: {}'.format(
+                params['intra_op_threads'], params['inter_op_threads'],
+                str(params['xla']), '{:.2f} FPS'.format(fps)
+                if fps is not None else 'failed with status {}'.format(
+                    result['returncode'])))
+            if fps is not None:
+                results.append((fps, params))
+    finally:
+        shutil.rmtree(work_dir)
+
+    if not results:
+        raise SystemExit('Every setting failed')
+    fps, best = max(results, key=lambda result: result[0])
+    print('Best: {} at {:.2f} FPS'.format(json.dumps(best), fps))
+    if args.output:
+        with open(args.output, 'w') as fid:
+            json.dump({'session': best}, fid, indent=2)
@@ -10,13 +10,39 @@ YOLO directory structure:
 |   |-- weights : folder to store the .weights file to be downloaded
 |   |-- data : folder where the converted model, the labels and the anchors
                are stored
+|   |-- cache : converted models by hash of their cfg and weights
+
+Run this program like this, from any directory:
+- python bin/convert_yad2k.py -v yolov3
+- python bin/convert_yad2k.py --cfg path/yolov3.cfg --weights
+  path/yolov3.weights
+
+OPTIONS
+-------
+-v, --version : version of YOLO to download (yolov2, yolov3, ...), name of
+                the converted model.
+--cfg, --weights : local .cfg and .weights files, nothing is downloaded.
+--root : root of the project holding models/yolo, the parent of bin by
+         default, where the detectors look for the models.
+--fetcher : download tool, wget or urllib.
+--cfg-url-base, --weights-url-base : where the files are downloaded from,
+                                     e.g. a local mirror.
+--cache-dir : cache of converted models, models/yolo/cache by default.
+--force : convert even if the cache has the model.
+--freeze : also export YOLOv3 models to a frozen .pb with batch
+           normalization folded and yolo_eval appended.
+--nms : NMS mode of yolo_eval baked into the frozen graph, per_class or
+        offset, obj_detector.py --nms must match it.
+-flcl, --fully_convolutional : input shape (None, None, 3).
 """
-
 import argparse
 import configparser
+import hashlib
 import io
 import os
-import wget
+import shutil
+import tempfile
+import urllib.request
 from collections import defaultdict
 import numpy as np
 from keras import backend as K
@@ -30,12 +56,42 @@ from keras.models import Model
 from keras.regularizers import l2
 from keras.utils.vis_utils import plot_model as plot
 
+from obj_track.yad2k.models.freeze_yolov3 import freeze_yolo
 from obj_track.yad2k.models.keras_yolov2 import space_to_depth_x2, \
     space_to_depth_x2_output_shape
+from obj_track.yad2k.utils.darknet_weights import DarknetWeights
+
+# Root of the project, the detectors read models/yolo under it.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 parser = argparse.ArgumentParser(
     description='Yet Another Darknet To Keras Converter.')
 parser.add_argument('-v', '--version', help='Version of YOLO to download')
+parser.add_argument('--cfg', help='Local .cfg file, skips the download')
+parser.add_argument('--weights',
+                    help='Local .weights file, skips the download')
+parser.add_argument('--root', default=REPO_DIR,
+                    help='Root of the project holding models/yolo')
+parser.add_argument('--fetcher', default='wget',
+                    choices=['wget', 'urllib'],
+                    help='Tool downloading the cfg and weights files')
+parser.add_argument('--cfg-url-base',
+                    default='https://raw.github.com/pjreddie/darknet/master/'
+                            'cfg/',
+                    help='URL the .cfg files are downloaded from')
+parser.add_argument('--weights-url-base',
+                    default='https://pjreddie.com/media/files/',
+                    help='URL the .weights files are downloaded from')
+parser.add_argument('--cache-dir',
+                    help='Cache of converted models, default models/yolo/'
+                         'cache')
+parser.add_argument('--force', action='store_true',
+                    help='Convert even if the model is in the cache')
+parser.add_argument('--freeze', action='store_true',
+                    help='Export a frozen .pb of the YOLOv3 model too')
+parser.add_argument('--nms', default='per_class',
+                    choices=['per_class', 'offset'],
+                    help='NMS mode of the frozen graph')
 parser.add_argument(
     '-flcl',
     '--fully_convolutional',
@@ -62,69 +118,189 @@ def unique_config_sections(config_file):
     return output_stream
 
 
+def wget_fetcher(url, filename):
+    # wget is only needed when something is downloaded.
+    import wget
+    wget.download(url, out=filename)
+
+
+def urllib_fetcher(url, filename):
+    urllib.request.urlretrieve(url, filename)
+
+
+FETCHERS = {'wget': wget_fetcher, 'urllib': urllib_fetcher}
+
+
+def fetch(url, filename, fetcher):
+    """Download url to filename unless it is already there."""
+    if os.path.isfile(filename):
+        print("Using {}".format(filename))
+        return filename
+    print("Downloading {} to {}".format(url, filename))
+    # A partial download never takes the place of the file.
+    tmp_filename = filename + '.part'
+    fetcher(url, tmp_filename)
+    os.rename(tmp_filename, filename)
+    return filename
+
+
+def is_yolov2_config(config_path, yolo_version=''):
+    """True for a YOLOv2 cfg (a [region] output layer), False for YOLOv3
+    ([yolo] output layers). Configs without either, e.g. classifiers, fall
+    back to the name of the version."""
+    with open(config_path) as fin:
+        sections = {line.strip().strip('[]') for line in fin
+                    if line.startswith('[')}
+    if 'region' in sections:
+        return True
+    if 'yolo' in sections:
+        return False
+    return yolo_version.endswith('v2')
+
+
+def conversion_key(config_path, weights_path, **options):
+    """sha256 of the cfg, the weights and the conversion options."""
+    digest = hashlib.sha256()
+    for path in (config_path, weights_path):
+        with open(path, 'rb') as fid:
+            for chunk in iter(lambda: fid.read(1 << 20), b''):
+                digest.update(chunk)
+    digest.update(repr(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+
+def freeze(model_root, nms):
+    """Export model_root.h5 to model_root_<nms>.pb, see freeze_yolo."""
+    with open(model_root + '_anchors.txt') as f:
+        anchors = f.readline()
+    anchors = np.array([float(x) for x in anchors.split(',')]).reshape(-1, 2)
+    freeze_yolo(model_root + '.h5', anchors,
+                '{}_{}.pb'.format(model_root, nms), nms=nms)
+
+
+def cached_convert(config_path, weights_path, output_path, cache_dir,
+                   force=False, frozen=False, nms='per_class', **options):
+    """Convert a cfg/weights pair through a content addressed cache.
+    The model, anchors and summary are kept in cache_dir/<key>/ and copied
+    to output_path, a pair already converted with the same options is not
+    converted again.
+    Parameters
+    ----------
+    force: bool, convert even if the cache has the model
+    frozen: bool, export the frozen graph too, cached with the model
+    nms: str, NMS mode of the frozen graph, one graph is cached per mode
+    options: keyword arguments of convert, part of the key
+    """
+    key = conversion_key(config_path, weights_path, **options)
+    entry = os.path.join(cache_dir, key)
+    output_root = os.path.splitext(output_path)[0]
+    if force or not os.path.isfile(os.path.join(entry, 'model.h5')):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+        try:
+            convert(config_path, weights_path,
+                    os.path.join(tmp_dir, 'model.h5'), **options)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.rename(tmp_dir, entry)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir)
+    else:
+        print('{} and {} already converted in {}'.format(
+            config_path, weights_path, entry))
+    frozen_name = 'model_{}.pb'.format(nms)
+    if frozen and not os.path.isfile(os.path.join(entry, frozen_name)):
+        freeze(os.path.join(entry, 'model'), nms)
+
+    # Files of the entry and the outputs they are copied to.
+    copies = [('model' + suffix, output_root + suffix)
+              for suffix in ('.h5', '_anchors.txt', '_summary.txt')
+              if os.path.isfile(os.path.join(entry, 'model' + suffix))]
+    output_key = key
+    if frozen:
+        copies.append((frozen_name, output_root + '.pb'))
+        output_key += ' ' + nms
+    # The key of the current output avoids copying the same model again.
+    key_path = output_root + '.sha256'
+    if os.path.isfile(key_path) and all(
+            os.path.isfile(output) for _, output in copies):
+        with open(key_path) as fid:
+            if fid.read().strip() == output_key:
+                print('{} is up to date'.format(output_path))
+                return output_path
+    for name, output in copies:
+        shutil.copyfile(os.path.join(entry, name), output)
+    with open(key_path, 'w') as fid:
+        fid.write(output_key)
+    print('Saved Keras model to {}'.format(output_path))
+    return output_path
+
+
 # %%
 def _main(args):
-    # todo-paola: delete the following line when executing from root directory
-    os.chdir("..")
-
-    # make all dirs needed, run from root
-    working_dir = os.getcwd()
-    yolo_dir = os.path.join(working_dir, "models", "yolo")
+    # make all dirs needed under the root of the project
+    yolo_dir = os.path.join(os.path.abspath(args.root), "models", "yolo")
     os.makedirs(yolo_dir, exist_ok=True)
     os.makedirs(yolo_dir+'/cfg', exist_ok=True)
     os.makedirs(yolo_dir+'/weights', exist_ok=True)
     os.makedirs(yolo_dir+'/data', exist_ok=True)
-    yolo_version = args.version
-    cfg_url_base = 'https://raw.github.com/pjreddie/darknet/master/cfg/'
-    weight_url_base = 'https://pjreddie.com/media/files/'
-
-    # Get the .cfg file
-    url = cfg_url_base + yolo_version + '.cfg'
-    config_path = os.path.join(yolo_dir, 'cfg')
-    # download the url contents in binary
-    # todo-paola: uncomment the following line and delete the hardcoded path
-    print("Downloading .cfg file from {} to {}".format(url, config_path))
-    config_path = wget.download(url, out=config_path)
-    #config_path = config_path + '/yolov2.cfg'
-
-    # Get the .weights file
-    url = weight_url_base + yolo_version + '.weights'
-    weights_path = os.path.join(yolo_dir, 'weights')
-    # download the url contents in binary format
-    # todo-paola: uncomment the following line and delete the hardcoded
-    print("Downloading .weights file from {} to ".format(url, weights_path))
-    weights_path = wget.download(url, out=weights_path)
-    #weights_path = weights_path + '/yolov2.weights'
 
+    if args.cfg or args.weights:
+        # Offline mode, local files only.
+        if not (args.cfg and args.weights):
+            parser.error('--cfg and --weights must be given together')
+        config_path = args.cfg
+        weights_path = args.weights
+        yolo_version = args.version or \
+            os.path.splitext(os.path.basename(config_path))[0]
+    else:
+        if not args.version:
+            parser.error('--version is required to download the model')
+        yolo_version = args.version
+        fetcher = FETCHERS[args.fetcher]
+        # Get the .cfg and .weights files
+        config_path = fetch(args.cfg_url_base + yolo_version + '.cfg',
+                            os.path.join(yolo_dir, 'cfg',
+                                         yolo_version + '.cfg'), fetcher)
+        weights_path = fetch(
+            args.weights_url_base + yolo_version + '.weights',
+            os.path.join(yolo_dir, 'weights', yolo_version + '.weights'),
+            fetcher)
+
+    # From the cfg, yolov2-voc or yolov2-tiny do not end with v2.
+    v2 = is_yolov2_config(config_path, yolo_version)
+    if args.freeze and v2:
+        parser.error('--freeze only supports YOLOv3 models')
+    output_path = os.path.join(yolo_dir, 'data', yolo_version + '.h5')
+    cache_dir = args.cache_dir or os.path.join(yolo_dir, 'cache')
+    cached_convert(config_path, weights_path, output_path, cache_dir,
+                   force=args.force, frozen=args.freeze, nms=args.nms, v2=v2,
+                   fully_convolutional=args.fully_convolutional)
+
+
+def convert(config_path, weights_path, output_path, v2=False,
+            fully_convolutional=False):
+    """Convert a Darknet cfg/weights pair to a Keras .h5 model.
+    The anchors and the model summary are written next to output_path.
+    Parameters
+    ----------
+    v2: bool, YOLOv2 (region) model instead of YOLOv3 (yolo layers)
+    fully_convolutional: bool, set the input shape of YOLOv2 to
+        (None, None, 3)
+    """
     assert config_path.endswith('.cfg'), '{} is not a .cfg file'.format(
         config_path)
     assert weights_path.endswith(
         '.weights'), '{} is not a .weights file'.format(weights_path)
-
-    output_path = os.path.join(yolo_dir, 'data')
-    output_path = os.path.join(output_path, yolo_version + '.h5')
     assert output_path.endswith('.h5'), \
         'output path {} is not a .h5 file'.format(output_path)
     output_root = os.path.splitext(output_path)[0]
 
     # Load weights and config.
     print('Loading weights.')
-    weights_file = open(weights_path, 'rb')
-    if yolo_version.endswith('v2'):
-        weights_header = np.ndarray(
-            shape=(4, ), dtype='int32', buffer=weights_file.read(16))
-        print('Weights Header: ', weights_header)
-    else:
-        major, minor, revision = np.ndarray(
-            shape=(3,), dtype='int32', buffer=weights_file.read(12))
-        if (major * 10 + minor) >= 2 and major < 1000 and minor < 1000:
-            seen = np.ndarray(shape=(1,), dtype='int64',
-                              buffer=weights_file.read(8))
-        else:
-            seen = np.ndarray(shape=(1,), dtype='int32',
-                              buffer=weights_file.read(4))
-        print('Weights Header: ', major, minor, revision, seen)
-
+    weights_file = DarknetWeights(weights_path, legacy_header=v2)
+    print('Weights Header: ', *weights_file.header)
 
     print('Parsing Darknet config.')
     unique_config_file = unique_config_sections(config_path)
@@ -132,14 +308,14 @@ def _main(args):
     cfg_parser.read_file(unique_config_file)
 
     print('Creating Keras model.')
-    if args.fully_convolutional:
+    if fully_convolutional:
         image_height, image_width = None, None
     else:
         image_height = int(cfg_parser['net_0']['height'])
         image_width = int(cfg_parser['net_0']['width'])
 
 
-    if yolo_version.endswith('v2'):
+    if v2:
         prev_layer = Input(shape=(image_height, image_width, 3))
         all_layers = [prev_layer]
     else:
@@ -150,7 +326,6 @@ def _main(args):
 
     weight_decay = float(cfg_parser['net_0']['decay']
                          ) if 'net_0' in cfg_parser.sections() else 5e-4
-    count = 0
     for section in cfg_parser.sections():
         print('Parsing section {}'.format(section))
         if section.startswith('convolutional'):
@@ -161,38 +336,28 @@ def _main(args):
             activation = cfg_parser[section]['activation']
             batch_normalize = 'batch_normalize' in cfg_parser[section]
 
-            if yolo_version.endswith('v2'):
+            if v2:
                 # padding='same' is equivalent to Darknet pad=1
                 padding = 'same' if pad == 1 else 'valid'
             else:
                 padding = 'same' if pad == 1 and stride == 1 else 'valid'
 
             # Setting weights.
-            # Darknet serializes convolutional weights as:
-            # [bias/beta, [gamma, mean, variance], conv_weights]
             prev_layer_shape = K.int_shape(prev_layer)
 
             # TODO: This assumes channel last dim_ordering.
             weights_shape = (size, size, prev_layer_shape[-1], filters)
-            darknet_w_shape = (filters, weights_shape[2], size, size)
-            weights_size = np.product(weights_shape)
 
             print('conv2d', 'bn'
                   if batch_normalize else '  ', activation, weights_shape)
 
-            conv_bias = np.ndarray(
-                shape=(filters, ),
-                dtype='float32',
-                buffer=weights_file.read(filters * 4))
-            count += filters
+            # Views on the weights file, conv kernel already transposed to
+            # Tensorflow order (height, width, in_dim, out_dim).
+            # TODO: Add check for Theano dim ordering.
+            conv_bias, bn_weights, conv_weights = weights_file.read_conv(
+                filters, prev_layer_shape[-1], size, batch_normalize)
 
             if batch_normalize:
-                bn_weights = np.ndarray(
-                    shape=(3, filters),
-                    dtype='float32',
-                    buffer=weights_file.read(filters * 12))
-                count += 3 * filters
-
                 # TODO: Keras BatchNormalization mistakenly refers to var
                 # as std.
                 bn_weight_list = [
@@ -202,18 +367,6 @@ def _main(args):
                     bn_weights[2]  # running var
                 ]
 
-            conv_weights = np.ndarray(
-                shape=darknet_w_shape,
-                dtype='float32',
-                buffer=weights_file.read(weights_size * 4))
-            count += weights_size
-
-            # DarkNet conv_weights are serialized Caffe-style:
-            # (out_dim, in_dim, height, width)
-            # We would like to set these to Tensorflow order:
-            # (height, width, in_dim, out_dim)
-            # TODO: Add check for Theano dim ordering.
-            conv_weights = np.transpose(conv_weights, [2, 3, 1, 0])
             conv_weights = [conv_weights] if batch_normalize else [
                 conv_weights, conv_bias
             ]
@@ -321,7 +474,7 @@ def _main(args):
                 'Unsupported section header type: {}'.format(section))
 
     # Create and save model.
-    if yolo_version.endswith('v2'):
+    if v2:
         model = Model(inputs=all_layers[0], outputs=all_layers[-1])
     else:
         if len(out_index) == 0: out_index.append(len(all_layers) - 1)
@@ -336,7 +489,8 @@ def _main(args):
     model.save('{}'.format(output_path))
     print('Saved Keras model to {}'.format(output_path))
     # Check to see if all weights have been read.
-    remaining_weights = len(weights_file.read()) / 4
+    count = weights_file.count
+    remaining_weights = weights_file.remaining
     weights_file.close()
     print('Read {} of {} from Darknet weights.'.format(count, count +
                                                        remaining_weights))
@@ -0,0 +1,184 @@
+"""Tests for the YOLO version detection and the conversion cache of
+convert_yad2k.py, the conversion itself is replaced by a fake."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import convert_yad2k
+from convert_yad2k import cached_convert, conversion_key, is_yolov2_config
+
+YOLOV2_CFG = """[net]
+width=32
+height=32
+
+[convolutional]
+filters=4
+size=3
+stride=1
+pad=1
+activation=leaky
+
+[region]
+anchors=1,1, 2,2
+"""
+YOLOV3_CFG = YOLOV2_CFG.replace('[region]', '[yolo]\nmask=0,1')
+CLASSIFIER_CFG = YOLOV2_CFG.replace('[region]', '[softmax]')
+
+
+class VersionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_cfg(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as fid:
+            fid.write(content)
+        return path
+
+    def test_from_content(self):
+        for name in ('yolov2.cfg', 'yolov2-voc.cfg', 'yolov2-tiny.cfg',
+                     'custom.cfg'):
+            self.assertTrue(is_yolov2_config(self.write_cfg(name,
+                                                            YOLOV2_CFG)))
+        for name in ('yolov3.cfg', 'yolov3-tiny.cfg', 'yolov2.cfg'):
+            self.assertFalse(is_yolov2_config(self.write_cfg(name,
+                                                             YOLOV3_CFG)))
+
+    def test_fallback_to_name(self):
+        path = self.write_cfg('darknet19.cfg', CLASSIFIER_CFG)
+        self.assertTrue(is_yolov2_config(path, 'darknet19-v2'))
+        self.assertFalse(is_yolov2_config(path, 'darknet19'))
+
+
+class CachedConvertTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cfg = os.path.join(self.tmp_dir, 'yolov3.cfg')
+        with open(self.cfg, 'w') as fid:
+            fid.write(YOLOV3_CFG)
+        self.weights = self.write_weights(np.arange(8))
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.output_path = os.path.join(self.tmp_dir, 'data', 'yolov3.h5')
+        os.makedirs(os.path.dirname(self.output_path))
+        self.conversions = []
+        self.freezes = []
+        self._convert = convert_yad2k.convert
+        self._freeze = convert_yad2k.freeze
+        convert_yad2k.convert = self.fake_convert
+        convert_yad2k.freeze = self.fake_freeze
+
+    def tearDown(self):
+        convert_yad2k.convert = self._convert
+        convert_yad2k.freeze = self._freeze
+        shutil.rmtree(self.tmp_dir)
+
+    def write_weights(self, weights, name='yolov3.weights'):
+        # Header (major, minor, revision, seen) and the weights.
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as fid:
+            fid.write(np.array([0, 2, 0], dtype='int32').tobytes())
+            fid.write(np.array([0], dtype='int64').tobytes())
+            fid.write(np.asarray(weights, dtype='float32').tobytes())
+        return path
+
+    def fake_convert(self, config_path, weights_path, output_path, **options):
+        self.conversions.append(options)
+        output_root = os.path.splitext(output_path)[0]
+        with open(weights_path, 'rb') as fid:
+            content = fid.read()
+        for suffix, data in (('.h5', content), ('_anchors.txt', b'1,1')):
+            with open(output_root + suffix, 'wb') as fid:
+                fid.write(data)
+
+    def fake_freeze(self, model_root, nms):
+        self.freezes.append(nms)
+        with open('{}_{}.pb'.format(model_root, nms), 'w') as fid:
+            fid.write(nms)
+
+    def convert(self, weights=None, **options):
+        options.setdefault('v2', False)
+        return cached_convert(self.cfg, weights or self.weights,
+                              self.output_path, self.cache_dir, **options)
+
+    def test_key(self):
+        key = conversion_key(self.cfg, self.weights, v2=False)
+        self.assertEqual(len(key), 64)
+        # Same content under another name, same key.
+        copy = os.path.join(self.tmp_dir, 'copy.weights')
+        shutil.copyfile(self.weights, copy)
+        self.assertEqual(conversion_key(self.cfg, copy, v2=False), key)
+        self.assertNotEqual(conversion_key(self.cfg, self.weights, v2=True),
+                            key)
+        other = self.write_weights(np.arange(8) + 1, 'other.weights')
+        self.assertNotEqual(conversion_key(self.cfg, other, v2=False), key)
+
+    def test_skip(self):
+        self.convert()
+        self.assertEqual(self.conversions, [{'v2': False}])
+        key = conversion_key(self.cfg, self.weights, v2=False)
+        with open(os.path.splitext(self.output_path)[0] + '.sha256') as fid:
+            self.assertEqual(fid.read(), key)
+        with open(self.output_path, 'rb') as fid:
+            converted = fid.read()
+
+        # Converted once, the output is not copied again either.
+        mtime = os.path.getmtime(self.output_path)
+        os.utime(self.output_path, (mtime - 10, mtime - 10))
+        self.convert()
+        self.assertEqual(len(self.conversions), 1)
+        self.assertEqual(os.path.getmtime(self.output_path), mtime - 10)
+
+        # A deleted output is copied from the cache, not converted.
+        os.remove(self.output_path)
+        self.convert()
+        self.assertEqual(len(self.conversions), 1)
+        with open(self.output_path, 'rb') as fid:
+            self.assertEqual(fid.read(), converted)
+
+    def test_changes(self):
+        self.convert()
+        # Other weights or options are another conversion.
+        other = self.write_weights(np.arange(8) + 1, 'other.weights')
+        self.convert(other)
+        self.convert(fully_convolutional=True)
+        self.assertEqual(len(self.conversions), 3)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+        # The output follows the last conversion.
+        with open(self.output_path, 'rb') as fid, \
+                open(self.weights, 'rb') as weights:
+            self.assertEqual(fid.read(), weights.read())
+
+    def test_frozen(self):
+        pb_path = os.path.splitext(self.output_path)[0] + '.pb'
+        self.convert(frozen=True, nms='offset')
+        # One graph per NMS mode, from the same conversion.
+        self.convert(frozen=True, nms='per_class')
+        self.assertEqual(len(self.conversions), 1)
+        self.assertEqual(self.freezes, ['offset', 'per_class'])
+        with open(pb_path) as fid:
+            self.assertEqual(fid.read(), 'per_class')
+        # Both graphs are cached, the output follows the requested mode.
+        self.convert(frozen=True, nms='offset')
+        self.assertEqual(len(self.freezes), 2)
+        with open(pb_path) as fid:
+            self.assertEqual(fid.read(), 'offset')
+
+    def test_force(self):
+        self.convert()
+        self.convert(force=True)
+        self.assertEqual(len(self.conversions), 2)
+        # The entry is replaced, no temporary directory is left.
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
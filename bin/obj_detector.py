@@ -1,9 +1,13 @@
 import argparse
 import json
 from time import time as timer
+from obj_track.detection.parallel import ParallelDetector
+from obj_track.detection.session import read_session_params
 from obj_track.detection.tf_objdetector_api import tfapi
 from obj_track.detection.yolo_v2_objdetector import yolo_v2
 from obj_track.detection.yolo_v3_objdetector import YOLO, yolo_v3
+from obj_track.tracking.trackers import TRACKERS
+from obj_track.video.buffer import POLICIES, QUEUE_SIZE
 
 if __name__ == "__main__":
     """
@@ -15,17 +19,51 @@ if __name__ == "__main__":
     OPTIONS
     -------
     -v, --video : specify the path to the video source, 0 for webcam, url for 
-    streaming or complete file for video store locally. 
+    streaming or complete file for video store locally. Repeat it to run one 
+    loaded model over several video feeds (tfapi and yolov3). 
+    --sources : text file with one video source per line, alternative to 
+    repeating --video. 
     -d, --detector : choose which of the detectors is used to create bounding 
     boxes, tfapi for tensorflow, yolov2 or yolov3 for YOLO. 
     -s, --save : specify the path where the predictions are stored.
     -c, --config : path to the config file used by the tensorflow api. 
+    -b, --batch-size : number of frames stacked in a single inference call 
+    (yolov3 only).
+    -p, --postprocess : decode the yolov3 outputs in the TF graph (graph) or 
+    with NumPy (numpy). 
+    --nms : per_class builds one NMS op per class, offset a single class 
+    aware NMS op (yolov3 graph postprocess). 
+    --frozen : load the frozen graph written by convert_yad2k.py --freeze 
+    instead of the Keras model (yolov3 only), --nms must be the one it was 
+    frozen with. 
+    -k, --detect-every : run the network every k frames and shift the boxes 
+    with optical flow in between (yolo, tfapi reads num_frames from config).
+    -t, --tracker : track the detections, centroid or iou. 
+    --queue-size : number of decoded frames buffered ahead of the detector, 
+    overrides the tfapi config. 
+    --queue-policy : what to do when the frame buffer is full, block to wait 
+    for the detector or drop_oldest to stay real time, drop_oldest for live 
+    feeds and block for files by default, overrides the tfapi config. 
+    --writer-policy : what to do when the output video queue is full, 
+    drop_oldest for live feeds and block for files by default, overrides 
+    the tfapi config.
+    --timings : export the per stage latencies (p50/p95/p99) to this .json 
+    or .csv file. 
+    --timings-every : seconds between two exports of the latencies. 
+    --timings-warmup : number of first frames left out of the latencies. 
+    --workers : run yolov3 in this many processes, each pinned to its own 
+    cores, 0 or 1 for a single model in this process. 
+    --session-config : JSON file whose "session" entry sets the TF threads, 
+    XLA and Grappler options, see obj_track.detection.session (tfapi 
+    defaults to the one of --config). 
     """
     parser = argparse.ArgumentParser(
         description="object tracking module")
-    parser.add_argument("-v", "--video", type=str, required=True,
+    parser.add_argument("-v", "--video", type=str, action="append",
                         help="path to input video file, 0 if webcam, url if "
-                             "streaming")
+                             "streaming, repeat for several feeds")
+    parser.add_argument("--sources", type=str,
+                        help="file with one video source per line")
     parser.add_argument("-d", "--detector", type=str, default="yolov2",
                         help="object detector type, options: tfapi or yolov2")
     parser.add_argument("-s", "--save", type=str, help="save option, give a "
@@ -33,9 +71,62 @@ if __name__ == "__main__":
                                                        "results")
     parser.add_argument("-c", "--config", type=str,
                         help="path to the configuration of tfapi")
+    parser.add_argument("-b", "--batch-size", type=int, default=1,
+                        help="number of frames per inference call, yolov3 "
+                             "only")
+    parser.add_argument("-p", "--postprocess", type=str, default="graph",
+                        choices=["graph", "numpy"],
+                        help="yolov3 box decoding and NMS backend")
+    parser.add_argument("--nms", type=str, default="per_class",
+                        choices=["per_class", "offset"],
+                        help="yolov3 NMS mode of the graph postprocess")
+    parser.add_argument("--frozen", action="store_true",
+                        help="run the frozen yolov3 graph, without Keras")
+    parser.add_argument("-k", "--detect-every", type=int, default=1,
+                        help="run the detector every k frames, yolo only")
+    parser.add_argument("-t", "--tracker", type=str, choices=TRACKERS,
+                        help="multi-object tracker run after the detector")
+    parser.add_argument("--queue-size", type=int,
+                        help="number of decoded frames buffered ahead of the "
+                             "detector, {} if not given".format(QUEUE_SIZE))
+    parser.add_argument("--queue-policy", type=str, choices=POLICIES,
+                        help="policy when the frame buffer is full, by "
+                             "source type if not given")
+    parser.add_argument("--writer-policy", type=str, choices=POLICIES,
+                        help="policy when the output video queue is full, "
+                             "by source type if not given")
+    parser.add_argument("--timings", type=str,
+                        help="JSON or CSV file the stage latencies are "
+                             "exported to")
+    parser.add_argument("--timings-every", type=float, default=10.,
+                        help="seconds between two exports of the latencies")
+    parser.add_argument("--timings-warmup", type=int, default=0,
+                        help="first frames left out of the latencies")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="yolov3 worker processes pinned to core sets")
+    parser.add_argument("--session-config", type=str,
+                        help="JSON file with the TF session settings")
 
 
     args = parser.parse_args()
+    videos = list(args.video or [])
+    if args.sources:
+        with open(args.sources, 'r') as f:
+            videos += [line.strip() for line in f
+                       if line.strip() and not line.startswith('#')]
+    if not videos:
+        parser.error("at least one video source must be given with --video "
+                     "or --sources")
+    if args.detect_every < 1:
+        parser.error("--detect-every must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.workers > 1 and args.detector != "yolov3":
+        parser.error("--workers is only supported by yolov3")
+    args.session_params = read_session_params(args.session_config) \
+        if args.session_config else None
+    # A single source keeps the original single feed behaviour.
+    args.video = videos[0] if len(videos) == 1 else videos
     start_time = timer()
     if args.detector == "tfapi":
         # todo-paola: implement save option in tf_api
@@ -44,13 +135,36 @@ if __name__ == "__main__":
         with open(args.config, 'r') as f:
             tf_params = json.load(f)
         tf_params['video'] = args.video
+        # The command line wins over the config.
+        for key in ('queue_size', 'queue_policy', 'writer_policy'):
+            if getattr(args, key) is not None:
+                tf_params[key] = getattr(args, key)
+        tf_params.setdefault('tracker', args.tracker)
+        tf_params.setdefault('timings', args.timings)
+        tf_params.setdefault('timings_every', args.timings_every)
+        tf_params.setdefault('timings_warmup', args.timings_warmup)
+        if args.session_params is not None:
+            tf_params['session'] = args.session_params
         tfapi(tf_params)
     elif args.detector.startswith("yolo"):
+        if args.queue_size is None:
+            args.queue_size = QUEUE_SIZE
         #todo-paola: change args from Namespace to
         if args.detector.endswith('v2'):
+            if isinstance(args.video, list):
+                raise ValueError("yolov2 supports a single video source")
             yolo_v2(args)
         else:
-            yolo_v3(YOLO(**vars(args)), args.video, args.save)
+            if args.workers > 1:
+                yolo = ParallelDetector(args.workers, vars(args))
+            else:
+                yolo = YOLO(**vars(args))
+            yolo_v3(yolo, args.video, args.save,
+                    queue_size=args.queue_size,
+                    queue_policy=args.queue_policy,
+                    writer_policy=args.writer_policy,
+                    tracker=args.tracker,
+                    detect_every=args.detect_every)
     else:
         raise ValueError("Object detector type not valid. Valid options: "
                          "tfapi or yolov2")
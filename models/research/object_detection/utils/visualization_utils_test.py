@@ -85,6 +85,42 @@ class VisualizationUtilsTest(tf.test.TestCase):
     self.assertEqual(width_original, width_final)
     self.assertEqual(height_original, height_final)
 
+  def test_draw_bounding_box_on_image_array_cv2(self):
+    test_image = self.create_colorful_test_image()
+    expected_image = test_image.copy()
+    visualization_utils.draw_bounding_box_on_image_array(
+        expected_image, 0.25, 0.4, 0.75, 0.6)
+
+    visualization_utils.draw_bounding_box_on_image_array_cv2(
+        test_image, 0.25, 0.4, 0.75, 0.6)
+
+    self.assertEqual(expected_image.shape, test_image.shape)
+    # Left edge of the box in the default color, red.
+    self.assertAllEqual(test_image[50, 80], [255, 0, 0])
+    self.assertAllEqual(test_image[50, 80], expected_image[50, 80])
+
+  def test_visualize_boxes_and_labels_on_image_array_backends(self):
+    boxes = np.array([[0.25, 0.4, 0.75, 0.6], [0.1, 0.1, 0.9, 0.9]])
+    classes = np.array([1, 2])
+    scores = np.array([0.9, 0.8])
+    category_index = {1: {'id': 1, 'name': 'dog'},
+                      2: {'id': 2, 'name': 'cat'}}
+    for backend in visualization_utils.BACKENDS:
+      test_image = self.create_colorful_test_image()
+      original_image = test_image.copy()
+      result = visualization_utils.visualize_boxes_and_labels_on_image_array(
+          test_image, boxes, classes, scores, category_index,
+          use_normalized_coordinates=True, backend=backend)
+      self.assertIs(result, test_image)
+      self.assertEqual(original_image.shape, test_image.shape)
+      self.assertTrue(np.any(original_image != test_image))
+
+  def test_visualize_boxes_and_labels_on_image_array_bad_backend(self):
+    with self.assertRaises(ValueError):
+      visualization_utils.visualize_boxes_and_labels_on_image_array(
+          self.create_colorful_test_image(), np.zeros((0, 4)),
+          np.zeros(0), np.zeros(0), {}, backend='matplotlib')
+
   def test_draw_bounding_boxes_on_image(self):
     test_image = self.create_colorful_test_image()
     test_image = Image.fromarray(test_image)
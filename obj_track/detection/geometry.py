@@ -0,0 +1,78 @@
+"""
+Letterbox geometry cached per source and model resolution.
+
+For a fixed camera the placement of the frame inside the model input and the
+transform that maps the detected boxes back to the frame never change, they
+are computed once per (source resolution, model resolution) pair and shared
+by the preprocessing and the box rescaling.
+"""
+
+import numpy as np
+
+_GEOMETRIES = {}
+
+
+class LetterboxGeometry(object):
+    """
+    Placement of a source frame inside the model input and its inverse.
+
+    Parameters
+    ----------
+    :param image_shape: tuple, (height, width) of the source frame.
+    :param model_image_size: tuple, (height, width) of the model input.
+    :param letterbox: bool, keep the aspect ratio and pad with gray like
+    letterbox_image_cv (YOLOv3), otherwise stretch to the model size like
+    preprocess_image (YOLOv2).
+    """
+    def __init__(self, image_shape, model_image_size, letterbox=True):
+        ih, iw = self.image_shape = tuple(image_shape)
+        h, w = self.model_image_size = tuple(model_image_size)
+        self.letterbox = letterbox
+
+        # Resized frame size and top left corner, as in letterbox_image_cv.
+        if letterbox:
+            resize = min(w / iw, h / ih)
+            self.nw, self.nh = int(iw * resize), int(ih * resize)
+        else:
+            self.nw, self.nh = w, h
+        self.dx = (w - self.nw) // 2
+        self.dy = (h - self.nh) // 2
+
+        # Inverse transform of the boxes, as in yolo_correct_boxes:
+        # (box - offset) * scale maps boxes relative to the model input to
+        # (top, left, bottom, right) pixels of the source frame.
+        input_shape = np.array(model_image_size, dtype='float32')
+        source_shape = np.array(image_shape, dtype='float32')
+        if letterbox:
+            new_shape = np.round(source_shape * np.min(input_shape /
+                                                       source_shape))
+        else:
+            new_shape = input_shape
+        offset = (input_shape - new_shape) / 2. / input_shape
+        scale = input_shape / new_shape * source_shape
+        self.offset = np.tile(offset, 2)
+        self.scale = np.tile(scale, 2)
+
+    def unproject(self, boxes):
+        """
+        Map boxes relative to the model input back to the source frame.
+
+        :param boxes: array, shape=(n, 4), (y_min, x_min, y_max, x_max) in
+        [0, 1] of the model input.
+        :return: array, shape=(n, 4), (top, left, bottom, right) in pixels of
+        the source frame.
+        """
+        boxes = np.asarray(boxes, dtype='float32').reshape(-1, 4)
+        return ((boxes - self.offset) * self.scale).astype('float32')
+
+
+def get_geometry(image_shape, model_image_size, letterbox=True):
+    """
+    Return the LetterboxGeometry of a source and model resolution, built on
+    the first call and cached afterwards.
+    """
+    key = (tuple(image_shape[:2]), tuple(model_image_size), letterbox)
+    geometry = _GEOMETRIES.get(key)
+    if geometry is None:
+        geometry = _GEOMETRIES[key] = LetterboxGeometry(*key)
+    return geometry
@@ -0,0 +1,78 @@
+"""Tests for obj_track.detection.geometry."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.detection.geometry import LetterboxGeometry, get_geometry
+
+MODEL_IMAGE_SIZE = (416, 416)
+IMAGE_SHAPES = [(480, 640), (720, 1280), (640, 360), (416, 416), (333, 517)]
+
+
+def random_boxes(image_shape, n=20, seed=0):
+    """(top, left, bottom, right) pixel boxes inside the frame."""
+    rng = np.random.RandomState(seed)
+    height, width = image_shape
+    corners = rng.uniform(0, 1, size=(n, 2, 2)) * [height, width]
+    return np.concatenate([corners.min(axis=1), corners.max(axis=1)],
+                          axis=-1).astype('float32')
+
+
+def project(geometry, boxes):
+    """Pixel boxes of the frame to [0, 1] of the model input, through the
+    placement of the resized frame (nw, nh, dx, dy)."""
+    ih, iw = geometry.image_shape
+    h, w = geometry.model_image_size
+    scale = np.array([geometry.nh / ih, geometry.nw / iw] * 2)
+    offset = np.array([geometry.dy, geometry.dx] * 2)
+    return (boxes * scale + offset) / [h, w, h, w]
+
+
+class LetterboxGeometryTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for letterbox in (True, False):
+            for k, shape in enumerate(IMAGE_SHAPES):
+                geometry = LetterboxGeometry(shape, MODEL_IMAGE_SIZE,
+                                             letterbox)
+                boxes = random_boxes(shape, seed=k)
+                unprojected = geometry.unproject(project(geometry, boxes))
+                self.assertEqual(unprojected.dtype, np.float32)
+                # The placement rounds the resized frame to whole model
+                # pixels, about one model pixel in frame pixels.
+                tolerance = 1.5 * max(shape[0] / float(geometry.nh),
+                                      shape[1] / float(geometry.nw))
+                np.testing.assert_allclose(unprojected, boxes,
+                                           atol=tolerance)
+
+    def test_placement(self):
+        geometry = LetterboxGeometry((480, 640), MODEL_IMAGE_SIZE)
+        self.assertEqual((geometry.nw, geometry.nh), (416, 312))
+        self.assertEqual((geometry.dx, geometry.dy), (0, 52))
+        # Corners of the model input outside the ribbon are the frame
+        # corners.
+        np.testing.assert_allclose(
+            geometry.unproject([[52. / 416, 0., 364. / 416, 1.]]),
+            [[0., 0., 480., 640.]], atol=1e-3)
+        stretched = LetterboxGeometry((480, 640), MODEL_IMAGE_SIZE,
+                                      letterbox=False)
+        self.assertEqual((stretched.dx, stretched.dy), (0, 0))
+        np.testing.assert_allclose(stretched.unproject([[0., 0., 1., 1.]]),
+                                   [[0., 0., 480., 640.]], atol=1e-3)
+
+    def test_cache(self):
+        geometry = get_geometry((480, 640, 3), MODEL_IMAGE_SIZE)
+        # Same source resolution, with or without channels.
+        self.assertIs(get_geometry((480, 640), MODEL_IMAGE_SIZE), geometry)
+        self.assertIs(get_geometry([480, 640], list(MODEL_IMAGE_SIZE)),
+                      geometry)
+        self.assertIsNot(get_geometry((720, 1280), MODEL_IMAGE_SIZE),
+                         geometry)
+        self.assertIsNot(get_geometry((480, 640), MODEL_IMAGE_SIZE,
+                                      letterbox=False), geometry)
+        self.assertIsNot(get_geometry((480, 640), (608, 608)), geometry)
+
+
+if __name__ == '__main__':
+    unittest.main()
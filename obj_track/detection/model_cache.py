@@ -0,0 +1,189 @@
+"""
+Local cache of the TensorFlow object detection models.
+
+The model archive is downloaded and its frozen graph extracted only once, in
+``<cache_dir>/<model_name>-<checksum>/`` where checksum is the sha256 of the
+archive. Later starts find the graph there from the model name alone, or from
+the name and the expected checksum, which skips the download and the
+extraction. Every process still reads and parses the frozen graph once; the
+parsed GraphDef is only kept in memory for the other detectors of that same
+process.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import urllib.request
+
+import tensorflow as tf
+
+from .const import DOWNLOAD_BASE
+
+GRAPH_NAME = 'frozen_inference_graph.pb'
+DEFAULT_CACHE_DIR = os.environ.get(
+    'OBJ_TRACK_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'obj_track'))
+# Parsed graphs of this process, by (model name, checksum).
+_GRAPH_DEFS = {}
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fid:
+        for chunk in iter(lambda: fid.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def url_fetcher(url, filename):
+    """Download url to filename."""
+    with urllib.request.urlopen(url) as response, \
+            open(filename, 'wb') as fid:
+        shutil.copyfileobj(response, fid)
+
+
+class ModelCache(object):
+    """
+    Download, extract and parse the frozen graph of a model once.
+
+    Parameters
+    ----------
+    :param cache_dir: str, directory of the cache, DEFAULT_CACHE_DIR
+    (~/.cache/obj_track or $OBJ_TRACK_CACHE) if None.
+    :param download_base: str, URL the <model_name>.tar.gz archives are
+    downloaded from.
+    :param fetcher: callable(url, filename) downloading an archive, e.g. to
+    copy it from a local mirror.
+    """
+    def __init__(self, cache_dir=None, download_base=DOWNLOAD_BASE,
+                 fetcher=url_fetcher):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.download_base = download_base
+        self.fetcher = fetcher
+
+    def _entry_dir(self, model_name, checksum):
+        return os.path.join(self.cache_dir,
+                            '{}-{}'.format(model_name, checksum[:16]))
+
+    def _pointer(self, model_name):
+        # Checksum of the last archive downloaded for a model name.
+        return os.path.join(self.cache_dir, model_name + '.json')
+
+    def lookup(self, model_name, checksum=None):
+        """
+        Return the manifest of a cached model, None if it is not cached.
+
+        :param checksum: str, sha256 of the archive, the last downloaded
+        version of the model if None.
+        """
+        if checksum is None:
+            try:
+                with open(self._pointer(model_name)) as fid:
+                    checksum = json.load(fid)['checksum']
+            except (IOError, ValueError, KeyError):
+                return None
+        entry = self._entry_dir(model_name, checksum)
+        try:
+            with open(os.path.join(entry, 'manifest.json')) as fid:
+                manifest = json.load(fid)
+        except (IOError, ValueError):
+            return None
+        graph_path = os.path.join(entry, GRAPH_NAME)
+        # A cheap check of the extracted graph, not a full hash.
+        if manifest.get('checksum') != checksum or \
+                not os.path.isfile(graph_path) or \
+                os.path.getsize(graph_path) != manifest.get('graph_size'):
+            return None
+        manifest['graph_path'] = graph_path
+        return manifest
+
+    def fetch(self, model_name, checksum=None):
+        """
+        Download the archive of a model and extract its frozen graph into
+        the cache.
+
+        :raises ValueError: if checksum is given and the downloaded archive
+        does not match it.
+        :return: dict, manifest of the cached model.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        url = self.download_base + model_name + '.tar.gz'
+        print('Downloading {}'.format(url))
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            archive = os.path.join(tmp_dir, model_name + '.tar.gz')
+            self.fetcher(url, archive)
+            archive_checksum = file_checksum(archive)
+            if checksum is not None and archive_checksum != checksum:
+                raise ValueError('Checksum of {} is {}, expected {}'.format(
+                    url, archive_checksum, checksum))
+
+            with tarfile.open(archive) as tar_file:
+                members = [member for member in tar_file.getmembers()
+                           if os.path.basename(member.name) == GRAPH_NAME]
+                if not members:
+                    raise ValueError('No {} in {}'.format(GRAPH_NAME, url))
+                with tar_file.extractfile(members[0]) as src, \
+                        open(os.path.join(tmp_dir, GRAPH_NAME), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(archive)
+
+            manifest = {
+                'model_name': model_name,
+                'checksum': archive_checksum,
+                'url': url,
+                'graph_size': os.path.getsize(
+                    os.path.join(tmp_dir, GRAPH_NAME))}
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as fid:
+                json.dump(manifest, fid)
+
+            # Publish the complete entry at once, then point the model to it.
+            entry = self._entry_dir(model_name, archive_checksum)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.rename(tmp_dir, entry)
+            with open(self._pointer(model_name), 'w') as fid:
+                json.dump({'checksum': archive_checksum}, fid)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir)
+
+        manifest['graph_path'] = os.path.join(entry, GRAPH_NAME)
+        return manifest
+
+    def graph_path(self, model_name, checksum=None):
+        """Path of the frozen graph of a model, downloaded if not cached."""
+        manifest = self.lookup(model_name, checksum)
+        if manifest is None:
+            manifest = self.fetch(model_name, checksum)
+        return manifest['graph_path']
+
+    def load_graph_def(self, model_name, checksum=None):
+        """
+        Return the parsed GraphDef of a model. The graph is read and parsed
+        at the first call of every process, later calls of the same process
+        reuse it.
+        """
+        manifest = self.lookup(model_name, checksum)
+        if manifest is None:
+            manifest = self.fetch(model_name, checksum)
+        key = (model_name, manifest['checksum'])
+        if key not in _GRAPH_DEFS:
+            graph_def = tf.GraphDef()
+            # Bytes, not every protobuf version parses from an mmap.
+            with open(manifest['graph_path'], 'rb') as fid:
+                graph_def.ParseFromString(fid.read())
+            _GRAPH_DEFS[key] = graph_def
+        return _GRAPH_DEFS[key]
+
+    def load_graph(self, model_name, checksum=None):
+        """Return a new tf.Graph with the frozen graph of a model."""
+        graph_def = self.load_graph_def(model_name, checksum)
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        return graph
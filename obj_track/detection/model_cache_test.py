@@ -0,0 +1,162 @@
+"""Tests for obj_track.detection.model_cache, offline."""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import tensorflow as tf
+
+from obj_track.detection.model_cache import ModelCache, file_checksum, \
+    GRAPH_NAME
+
+MODEL_NAME = 'tiny_model'
+
+
+def graph_bytes(value):
+    """Serialized GraphDef holding one constant."""
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.constant(value, name='value')
+    return graph.as_graph_def().SerializeToString()
+
+
+class FakeFetcher(object):
+    """Write a model archive instead of downloading it, count the calls."""
+
+    def __init__(self, graph=None, member=GRAPH_NAME):
+        self.graph = graph if graph is not None else graph_bytes(1.)
+        self.member = member
+        self.urls = []
+
+    def __call__(self, url, filename):
+        self.urls.append(url)
+        # No name nor timestamp, the same graph gives the same archive.
+        with open(filename, 'wb') as fid, \
+                gzip.GzipFile('', 'wb', fileobj=fid, mtime=0) as gz_file, \
+                tarfile.open(fileobj=gz_file, mode='w') as tar_file:
+            info = tarfile.TarInfo(MODEL_NAME + '/' + self.member)
+            info.size = len(self.graph)
+            tar_file.addfile(info, io.BytesIO(self.graph))
+
+    def checksum(self, tmp_dir):
+        """sha256 of the archive the fetcher writes."""
+        filename = os.path.join(tmp_dir, 'archive.tar.gz')
+        self(None, filename)
+        self.urls.pop()
+        return file_checksum(filename)
+
+
+class ModelCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def cache(self, fetcher):
+        return ModelCache(self.cache_dir, download_base='http://mirror/',
+                          fetcher=fetcher)
+
+    def pointer(self):
+        with open(os.path.join(self.cache_dir, MODEL_NAME + '.json')) as fid:
+            return json.load(fid)
+
+    def test_second_start_skips_fetch(self):
+        fetcher = FakeFetcher()
+        graph_path = self.cache(fetcher).graph_path(MODEL_NAME)
+        self.assertEqual(fetcher.urls, ['http://mirror/tiny_model.tar.gz'])
+        with open(graph_path, 'rb') as fid:
+            self.assertEqual(fid.read(), fetcher.graph)
+        # Only the graph, the manifest and the pointer are kept.
+        entry = os.path.dirname(graph_path)
+        self.assertEqual(sorted(os.listdir(entry)),
+                         [GRAPH_NAME, 'manifest.json'])
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         sorted([os.path.basename(entry),
+                                 MODEL_NAME + '.json']))
+
+        # A new process finds it from the name, or the name and checksum.
+        checksum = self.pointer()['checksum']
+        fetcher = FakeFetcher()
+        cache = self.cache(fetcher)
+        self.assertEqual(cache.graph_path(MODEL_NAME), graph_path)
+        self.assertEqual(cache.graph_path(MODEL_NAME, checksum), graph_path)
+        self.assertEqual(fetcher.urls, [])
+
+    def test_checksum_mismatch_refetches(self):
+        self.cache(FakeFetcher()).graph_path(MODEL_NAME)
+        old_checksum = self.pointer()['checksum']
+
+        # A new version of the archive is expected.
+        fetcher = FakeFetcher(graph_bytes(2.))
+        cache = self.cache(fetcher)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            new_checksum = fetcher.checksum(tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertIsNone(cache.lookup(MODEL_NAME, new_checksum))
+        graph_path = cache.graph_path(MODEL_NAME, new_checksum)
+        self.assertEqual(len(fetcher.urls), 1)
+        with open(graph_path, 'rb') as fid:
+            self.assertEqual(fid.read(), fetcher.graph)
+        # The pointer follows the last download, the old entry stays.
+        self.assertEqual(self.pointer(), {'checksum': new_checksum})
+        self.assertIsNotNone(cache.lookup(MODEL_NAME, old_checksum))
+
+        # The downloaded archive does not match the expected checksum.
+        with self.assertRaises(ValueError):
+            self.cache(FakeFetcher(graph_bytes(3.))).graph_path(
+                MODEL_NAME, old_checksum[::-1])
+        self.assertEqual(self.pointer(), {'checksum': new_checksum})
+
+    def test_pointer(self):
+        cache = self.cache(FakeFetcher())
+        # Nothing cached yet.
+        self.assertIsNone(cache.lookup(MODEL_NAME))
+        manifest = cache.fetch(MODEL_NAME)
+        self.assertEqual(self.pointer(), {'checksum': manifest['checksum']})
+        self.assertEqual(cache.lookup(MODEL_NAME)['graph_path'],
+                         manifest['graph_path'])
+
+        # A corrupt pointer is a cache miss, fetching writes it again.
+        with open(os.path.join(self.cache_dir, MODEL_NAME + '.json'),
+                  'w') as fid:
+            fid.write('{"check')
+        self.assertIsNone(cache.lookup(MODEL_NAME))
+        cache.graph_path(MODEL_NAME)
+        self.assertEqual(self.pointer(), {'checksum': manifest['checksum']})
+
+        # A truncated graph is a cache miss as well.
+        with open(manifest['graph_path'], 'wb') as fid:
+            fid.write(b'\0')
+        self.assertIsNone(cache.lookup(MODEL_NAME))
+        fetcher = FakeFetcher()
+        self.cache(fetcher).graph_path(MODEL_NAME)
+        self.assertEqual(len(fetcher.urls), 1)
+
+    def test_missing_graph(self):
+        cache = self.cache(FakeFetcher(member='model.ckpt'))
+        with self.assertRaises(ValueError):
+            cache.fetch(MODEL_NAME)
+        # No partial entry or pointer left behind.
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_load_graph_def(self):
+        cache = self.cache(FakeFetcher())
+        graph_def = cache.load_graph_def(MODEL_NAME)
+        self.assertEqual([node.name for node in graph_def.node], ['value'])
+        # Parsed once per process.
+        self.assertIs(cache.load_graph_def(MODEL_NAME), graph_def)
+        graph = cache.load_graph(MODEL_NAME)
+        self.assertIsNotNone(graph.get_tensor_by_name('value:0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+"""
+Fan-out of the YOLOv3 inference over several processes.
+
+A single TF session does not keep a large CPU busy. ParallelDetector runs N
+worker processes instead, each pinned to its own set of cores with
+``os.sched_setaffinity`` and holding its own model and session, with
+``intra_op_parallelism_threads`` set to the size of that set. Frames are
+copied once into a ring of shared memory slots (multiprocessing.RawArray),
+only their index, slot and shape go through the task queue, and the
+detections are put back in frame order. The workers only see the slots they
+were started with, a frame larger than the slots restarts them with larger
+ones.
+"""
+
+import multiprocessing
+import os
+import queue
+import traceback
+
+import numpy as np
+
+from .render import BoxRenderer
+from .timing import StageTimer
+
+
+def core_sets(workers, cores=None):
+    """
+    Split cores into workers contiguous sets, the cores this process may run
+    on if None. With more workers than cores the sets are single cores
+    shared by several workers.
+    """
+    if cores is None:
+        if hasattr(os, 'sched_getaffinity'):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count()))
+    if workers >= len(cores):
+        return [[cores[rank % len(cores)]] for rank in range(workers)]
+    return [cores[rank * len(cores) // workers:
+                  (rank + 1) * len(cores) // workers]
+            for rank in range(workers)]
+
+
+def _worker(rank, cores, start_dir, yolo_kwargs, slots, tasks, results):
+    """Load a YOLO pinned to cores and detect the frames of the tasks."""
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        # YOLO._set_paths resolves the models from the working directory,
+        # the one the detector was created in.
+        os.chdir(start_dir)
+        # Imported once pinned, the TF thread pools inherit the affinity.
+        from .yolo_v3_objdetector import YOLO
+
+        # Threads for the cores of this worker, XLA and Grappler as
+        # configured.
+        session_params = dict(yolo_kwargs.get('session_params') or {},
+                              intra_op_threads=len(cores),
+                              inter_op_threads=1)
+        yolo = YOLO(**dict(yolo_kwargs, session_params=session_params))
+    except Exception:
+        results.put(('error', rank, traceback.format_exc()))
+        return
+    results.put(('ready', rank, yolo.class_names, yolo.colors))
+
+    views = [np.frombuffer(slot, dtype='uint8') for slot in slots]
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        index, slot, shape = task
+        frame = views[slot][:int(np.prod(shape))].reshape(shape)
+        try:
+            detections = yolo.detect(frame)
+        except Exception:
+            results.put(('error', rank, traceback.format_exc()))
+            break
+        results.put(('done', index, slot) + tuple(detections))
+    yolo.close_session()
+
+
+class ParallelDetector(object):
+    """
+    YOLO look-alike running the detections in worker processes, usable as
+    the yolo argument of yolo_v3.
+
+    The workers are started with the first frame, the ring slots are sized
+    for the largest of that frame, max_frame_shape and the reserved shapes.
+    A larger frame later on restarts the workers with larger slots.
+
+    Parameters
+    ----------
+    :param workers: int, number of worker processes.
+    :param yolo_kwargs: dict, arguments of the YOLO of every worker.
+    :param cores: list of int, cores split between the workers, all the
+    cores available to this process if None.
+    :param ring_size: int, number of frame slots, 2 per worker if None.
+    :param max_frame_shape: tuple, shape of the largest frame, the shape of
+    the first frame if None.
+    :param timeout: float, seconds to wait for a result before checking
+    that the workers are still alive.
+    :param target: function run by the worker processes, with the arguments
+    and messages of _worker.
+    """
+    def __init__(self, workers, yolo_kwargs, cores=None, ring_size=None,
+                 max_frame_shape=None, timeout=1., target=_worker):
+        if workers < 1:
+            raise ValueError('At least one worker is needed')
+        self.workers = workers
+        self.yolo_kwargs = dict(yolo_kwargs)
+        # Latencies measured in this process, the workers keep quiet.
+        self.timings = self.yolo_kwargs.get('timings')
+        self.timer = StageTimer(self.timings,
+                                self.yolo_kwargs.get('timings_every', 10.),
+                                warmup=self.yolo_kwargs.get('timings_warmup',
+                                                            0))
+        self.yolo_kwargs['timings'] = None
+        # One frame per worker at least in every yolo_v3 batch.
+        self.batch_size = max(self.yolo_kwargs.get('batch_size', 1), workers)
+        self.yolo_kwargs['batch_size'] = 1
+        self.ring_size = ring_size or 2 * workers
+        self.core_sets = core_sets(workers, cores)
+        self.max_frame_bytes = int(np.prod(max_frame_shape)) \
+            if max_frame_shape is not None else 0
+        self.timeout = timeout
+        self.target = target
+        # The workers resolve their paths from it, the working directory of
+        # this process is left alone.
+        self.start_dir = os.path.abspath(os.getcwd())
+        # TF is not fork safe.
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self.slot_size = None
+        self.renderer = None
+        self.done = {}
+        self.next_index = 0
+
+    def reserve(self, frame_shape):
+        """Size the ring slots for frames of frame_shape at least, e.g. the
+        shape reported by every source before the first frame."""
+        self.max_frame_bytes = max(self.max_frame_bytes,
+                                   int(np.prod(frame_shape)))
+
+    def _start(self, slot_size):
+        self.slot_size = slot_size
+        self.slots = [self.context.RawArray('B', self.slot_size)
+                      for _ in range(self.ring_size)]
+        self.views = [np.frombuffer(slot, dtype='uint8')
+                      for slot in self.slots]
+        self.free = list(range(self.ring_size))
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        for rank, cores in enumerate(self.core_sets):
+            process = self.context.Process(
+                target=self.target,
+                args=(rank, cores, self.start_dir, self.yolo_kwargs,
+                      self.slots, self.tasks, self.results),
+                daemon=True)
+            process.start()
+            self.processes.append(process)
+
+        for _ in self.processes:
+            message = self._get()
+            if message[0] != 'ready':
+                raise RuntimeError('Worker {} failed:\n{}'.format(
+                    message[1], message[2]))
+            class_names, colors = message[2:]
+        self.class_names = class_names
+        self.colors = colors
+        self.renderer = BoxRenderer(class_names, colors)
+
+    def _grow(self, slot_size):
+        # Wait for the frames in flight, their detections are kept, and
+        # restart the workers on larger slots.
+        while len(self.free) < self.ring_size:
+            self._collect()
+        self.close_session()
+        print('Restarting the workers for frames of {} bytes'.format(
+            slot_size))
+        self.max_frame_bytes = max(self.max_frame_bytes, slot_size)
+        self._start(self.max_frame_bytes)
+
+    def _get(self):
+        while True:
+            try:
+                return self.results.get(timeout=self.timeout)
+            except queue.Empty:
+                dead = [p.pid for p in self.processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError('Worker processes {} died'.format(dead))
+
+    def _collect(self):
+        # One result, its slot can be reused.
+        message = self._get()
+        if message[0] == 'error':
+            raise RuntimeError('Worker {} failed:\n{}'.format(message[1],
+                                                             message[2]))
+        _, index, slot = message[:3]
+        self.free.append(slot)
+        self.done[index] = message[3:]
+
+    def submit(self, frame):
+        """Copy a frame into a free slot and queue it, return its index."""
+        if self.slot_size is None:
+            self._start(max(frame.nbytes, self.max_frame_bytes))
+        elif frame.nbytes > self.slot_size:
+            self._grow(frame.nbytes)
+        while not self.free:
+            self._collect()
+        slot = self.free.pop()
+        self.views[slot][:frame.nbytes] = \
+            np.ascontiguousarray(frame).reshape(-1)
+        index = self.next_index
+        self.next_index += 1
+        self.tasks.put((index, slot, frame.shape))
+        return index
+
+    def result(self, index):
+        """Detections of a submitted frame, waiting for them if needed."""
+        while index not in self.done:
+            self._collect()
+        return self.done.pop(index)
+
+    def detect_batch(self, frames):
+        """Detect frames on all the workers, detections in frame order."""
+        with self.timer.stage('inference'):
+            indices = [self.submit(frame) for frame in frames]
+            return [self.result(index) for index in indices]
+
+    def detect(self, image):
+        return self.detect_batch([image])[0]
+
+    def draw(self, image, out_boxes, out_scores, out_classes):
+        return self.renderer(image, out_boxes, out_scores, out_classes)
+
+    def close_session(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
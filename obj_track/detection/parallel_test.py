@@ -0,0 +1,112 @@
+"""Tests for obj_track.detection.parallel, the ring and the reordering are
+run with a stub worker instead of YOLO."""
+
+import os
+import time
+import unittest
+
+import numpy as np
+
+from obj_track.detection.parallel import ParallelDetector, core_sets
+
+# Pixel value of the frames the stub worker fails on.
+FAIL_VALUE = 255
+
+
+def stub_worker(rank, cores, start_dir, yolo_kwargs, slots, tasks, results):
+    """Echo the sum and shape of the frames, the first pixel gives the
+    hundredths of a second to wait before answering."""
+    results.put(('ready', rank, ['object'], [(0, 255, 0)]))
+    views = [np.frombuffer(slot, dtype='uint8') for slot in slots]
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        index, slot, shape = task
+        frame = views[slot][:int(np.prod(shape))].reshape(shape)
+        if frame[0, 0, 0] == FAIL_VALUE:
+            results.put(('error', rank, 'frame {} failed'.format(index)))
+            break
+        time.sleep(frame[0, 0, 0] / 100.)
+        results.put(('done', index, slot, int(frame.sum()), frame.shape))
+
+
+def make_frame(value, shape=(12, 16, 3)):
+    return np.full(shape, value, dtype='uint8')
+
+
+class CoreSetsTest(unittest.TestCase):
+
+    def test_contiguous_sets(self):
+        self.assertEqual(core_sets(3, list(range(8))),
+                         [[0, 1], [2, 3, 4], [5, 6, 7]])
+        self.assertEqual(core_sets(1, [2, 3]), [[2, 3]])
+
+    def test_more_workers_than_cores(self):
+        self.assertEqual(core_sets(4, [0, 1]), [[0], [1], [0], [1]])
+
+
+class ParallelDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.detector = None
+
+    def tearDown(self):
+        if self.detector is not None:
+            self.detector.close_session()
+
+    def create(self, workers=2, **kwargs):
+        self.detector = ParallelDetector(workers, {}, cores=[0],
+                                         target=stub_worker, **kwargs)
+        return self.detector
+
+    def check(self, detections, frames):
+        self.assertEqual(detections, [(int(frame.sum()), frame.shape)
+                                      for frame in frames])
+
+    def test_frame_order(self):
+        detector = self.create()
+        self.assertEqual(os.getcwd(), self.cwd)
+        self.assertEqual(detector.start_dir, self.cwd)
+        self.assertEqual(detector.batch_size, 2)
+        # The first frames take the longest, later ones finish first.
+        frames = [make_frame(value) for value in (30, 20, 0, 1, 10, 0)]
+        self.check(detector.detect_batch(frames), frames)
+        self.assertEqual(detector.class_names, ['object'])
+        self.check([detector.detect(frames[1])], frames[1:2])
+
+    def test_slot_reuse(self):
+        detector = self.create(ring_size=2)
+        frames = [make_frame(value) for value in range(1, 8)]
+        self.check(detector.detect_batch(frames), frames)
+        self.assertEqual(sorted(detector.free), [0, 1])
+        self.assertFalse(detector.done)
+
+    def test_reserved_shape(self):
+        detector = self.create(max_frame_shape=(12, 16, 3))
+        detector.reserve((24, 32, 3))
+        detector.reserve((6, 8, 3))
+        frames = [make_frame(1), make_frame(2, (24, 32, 3))]
+        self.check(detector.detect_batch(frames), frames)
+        self.assertEqual(detector.slot_size, 24 * 32 * 3)
+
+    def test_larger_frame(self):
+        detector = self.create(ring_size=3)
+        frames = [make_frame(5), make_frame(1), make_frame(2, (24, 32, 3)),
+                  make_frame(3)]
+        # The frames in flight are detected before the workers restart on
+        # larger slots.
+        self.check(detector.detect_batch(frames), frames)
+        self.assertEqual(detector.slot_size, 24 * 32 * 3)
+        self.assertEqual(len(detector.processes), 2)
+        self.check(detector.detect_batch(frames[::-1]), frames[::-1])
+
+    def test_worker_error(self):
+        detector = self.create()
+        with self.assertRaisesRegex(RuntimeError, 'frame 1 failed'):
+            detector.detect_batch([make_frame(1), make_frame(FAIL_VALUE)])
+
+
+if __name__ == '__main__':
+    unittest.main()
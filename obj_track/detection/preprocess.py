@@ -0,0 +1,88 @@
+"""
+Allocation free frame preprocessing for the YOLO detectors.
+
+Same output as letterbox_image_cv (YOLOv3) or preprocess_image (YOLOv2)
+followed by the /255 scaling and the batch dimension, but written into
+input buffers that are allocated once and reused for every frame.
+"""
+
+import cv2
+import numpy as np
+
+from .geometry import get_geometry
+
+
+class FramePreprocessor(object):
+    """
+    Resize frames into a preallocated, already normalized model input.
+
+    The input buffer holds up to max_batch images of the model size and is
+    filled with the gray (128) ribbon once. Every frame is resized with
+    ``cv2.resize`` into a uint8 buffer kept per source resolution and
+    scaled by 1/255 straight into its slot of the input buffer, so after the
+    first frame of a resolution no memory is allocated.
+
+    Parameters
+    ----------
+    :param model_image_size: tuple, (height, width) of the model input.
+    :param letterbox: bool, keep the aspect ratio and pad with gray like
+    letterbox_image_cv (YOLOv3), otherwise stretch to the model size like
+    preprocess_image (YOLOv2).
+    :param max_batch: int, number of images the input buffer holds, grown
+    on demand.
+    """
+    def __init__(self, model_image_size, letterbox=True, max_batch=1):
+        self.height, self.width = model_image_size
+        self.letterbox = letterbox
+        self.resized = {}
+        self.input = None
+        self._allocate(max_batch)
+
+    def _allocate(self, max_batch):
+        self.input = np.empty((max_batch, self.height, self.width, 3),
+                              dtype='float32')
+        self.input.fill(128. / 255.)
+        # Resolution of the image last written in every slot.
+        self.slots = [None] * max_batch
+
+    def __call__(self, image, slot=0):
+        """
+        Preprocess a BGR frame into a slot of the input buffer.
+
+        :param image: numpy array, uint8 frame.
+        :param slot: int, index of the image in the batch.
+        :return: numpy array, view of the input buffer with shape
+        (1, height, width, 3), valid until the slot is overwritten.
+        """
+        if slot >= len(self.slots):
+            self._allocate(max(slot + 1, 2 * len(self.slots)))
+        image_shape = image.shape[:2]
+        geometry = get_geometry(image_shape, (self.height, self.width),
+                                self.letterbox)
+        nw, nh, dx, dy = geometry.nw, geometry.nh, geometry.dx, geometry.dy
+        if image_shape not in self.resized:
+            self.resized[image_shape] = np.empty((nh, nw, 3), dtype='uint8')
+        resized = self.resized[image_shape]
+        if self.slots[slot] != image_shape:
+            # Another resolution was here, restore the gray ribbon.
+            self.input[slot].fill(128. / 255.)
+            self.slots[slot] = image_shape
+
+        cv2.resize(image, (nw, nh), dst=resized,
+                   interpolation=cv2.INTER_CUBIC)
+        np.divide(resized, np.float32(255.),
+                  out=self.input[slot, dy:dy + nh, dx:dx + nw],
+                  dtype='float32', casting='unsafe')
+        return self.input[slot:slot + 1]
+
+    def batch(self, frames):
+        """
+        Preprocess several frames into consecutive slots.
+
+        :return: numpy array, view of the input buffer with shape
+        (len(frames), height, width, 3).
+        """
+        # Highest slot first, a too small buffer is grown before it is used.
+        for slot in reversed(range(len(frames))):
+            self(frames[slot], slot)
+        return self.input[:len(frames)]
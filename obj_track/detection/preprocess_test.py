@@ -0,0 +1,71 @@
+"""Tests for obj_track.detection.preprocess."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.detection.preprocess import FramePreprocessor
+from obj_track.yad2k.utils.utils_yolo_v3 import letterbox_image_cv
+
+MODEL_IMAGE_SIZE = (416, 416)
+# (height, width) of landscape, portrait, square and odd sized frames.
+IMAGE_SHAPES = [(480, 640), (720, 1280), (640, 360), (416, 416), (333, 517)]
+
+
+def random_frame(shape, seed=0):
+    rng = np.random.RandomState(seed)
+    return rng.randint(0, 256, size=shape + (3,)).astype('uint8')
+
+
+class FramePreprocessorTest(unittest.TestCase):
+
+    def test_letterbox_parity(self):
+        preprocessor = FramePreprocessor(MODEL_IMAGE_SIZE)
+        for k, shape in enumerate(IMAGE_SHAPES):
+            frame = random_frame(shape, seed=k)
+            expected = letterbox_image_cv(frame, MODEL_IMAGE_SIZE[::-1]) / 255.
+            output = preprocessor(frame)
+            self.assertEqual(output.shape, (1,) + MODEL_IMAGE_SIZE + (3,))
+            self.assertEqual(output.dtype, np.float32)
+            # Bit equal, the ribbon of the previous resolution included.
+            np.testing.assert_array_equal(output[0], expected)
+
+    def test_batch_parity(self):
+        preprocessor = FramePreprocessor(MODEL_IMAGE_SIZE)
+        frames = [random_frame(shape, seed=k)
+                  for k, shape in enumerate(IMAGE_SHAPES)]
+        batch = preprocessor.batch(frames)
+        self.assertEqual(batch.shape, (len(frames),) + MODEL_IMAGE_SIZE +
+                         (3,))
+        for frame, output in zip(frames, batch):
+            np.testing.assert_array_equal(
+                output, letterbox_image_cv(frame, MODEL_IMAGE_SIZE[::-1]) /
+                255.)
+
+    def test_stretch(self):
+        preprocessor = FramePreprocessor(MODEL_IMAGE_SIZE, letterbox=False)
+        output = preprocessor(random_frame((480, 640)))
+        # No ribbon, the frame covers the whole input.
+        self.assertEqual(output.shape, (1,) + MODEL_IMAGE_SIZE + (3,))
+        self.assertFalse(np.all(output[0, 0] == np.float32(128. / 255.)))
+
+    def test_buffers_reused(self):
+        preprocessor = FramePreprocessor(MODEL_IMAGE_SIZE, max_batch=2)
+        input_buffer = preprocessor.input
+        first = preprocessor(random_frame((480, 640), seed=0))
+        resized = preprocessor.resized[(480, 640)]
+        second = preprocessor(random_frame((480, 640), seed=1))
+        self.assertIs(preprocessor.input, input_buffer)
+        self.assertIs(preprocessor.resized[(480, 640)], resized)
+        self.assertTrue(np.shares_memory(first, input_buffer))
+        self.assertTrue(np.shares_memory(second, input_buffer))
+        preprocessor.batch([random_frame((480, 640))] * 2)
+        self.assertIs(preprocessor.input, input_buffer)
+        # A larger batch grows the buffer once.
+        preprocessor.batch([random_frame((480, 640))] * 3)
+        self.assertIsNot(preprocessor.input, input_buffer)
+        self.assertEqual(len(preprocessor.input), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
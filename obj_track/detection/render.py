@@ -0,0 +1,126 @@
+"""
+Overlay of the detections on the frames.
+
+Replaces the per box loops of draw_boxes and YOLO.draw: all the boxes are
+rounded and clipped in one NumPy step and the labels are pre-rendered
+sprites blended onto the frame instead of a ``cv2.putText`` for every box.
+"""
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class BoxRenderer(object):
+    """
+    Draw boxes and labels on frames, same look as the former draw_boxes.
+
+    Parameters
+    ----------
+    :param class_names: list, name of every class.
+    :param colors: list, color of every class.
+    :param score_step: float, scores are rounded to a multiple of
+    score_step in the labels, one label sprite is cached per class and step.
+    :param max_sprites: int, the cache of label sprites is emptied when it
+    grows larger than this.
+    """
+    def __init__(self, class_names, colors, score_step=0.01,
+                 max_sprites=4096):
+        self.class_names = class_names
+        self.colors = np.array(colors, dtype='uint8').reshape(-1, 3)
+        self.color_tuples = [tuple(int(v) for v in color)
+                           for color in self.colors]
+        self.score_step = score_step
+        self.max_sprites = max_sprites
+        self.frame_shape = None
+        self.font_size = None
+        self.thickness = None
+        self.sprites = {}
+
+    def _style(self, frame_shape):
+        # Font size and thickness only depend on the frame size, the label
+        # sprites drawn with the previous ones are dropped.
+        if frame_shape != self.frame_shape:
+            self.frame_shape = frame_shape
+            self.font_size = 1e-3 * frame_shape[0]
+            self.thickness = max(1, int((frame_shape[1] + frame_shape[0])
+                                        // 300))
+            self.sprites = {}
+
+    def _sprite(self, c, bucket):
+        """
+        Return the label of a class and score bucket as a premultiplied
+        sprite, its inverse coverage and the position of the text origin
+        inside it.
+        """
+        key = (c, bucket)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            if len(self.sprites) >= self.max_sprites:
+                self.sprites = {}
+            label = '{} {:.2f}'.format(self.class_names[c],
+                                       bucket * self.score_step)
+            (width, height), baseline = cv2.getTextSize(
+                label, FONT, self.font_size, self.thickness)
+            pad = self.thickness
+            shape = (height + baseline + 2 * pad, width + 2 * pad, 3)
+            # Label on black, i.e. the color premultiplied by the coverage,
+            # and 255 - coverage to attenuate the frame underneath.
+            image = np.zeros(shape, dtype='uint8')
+            cv2.putText(image, label, (pad, pad + height), FONT,
+                        self.font_size, self.color_tuples[c], self.thickness)
+            alpha = np.zeros(shape, dtype='uint8')
+            cv2.putText(alpha, label, (pad, pad + height), FONT,
+                        self.font_size, (255, 255, 255), self.thickness)
+            # Keep only the pixels the text covers.
+            x, y, w, h = cv2.boundingRect(alpha[..., 0])
+            sprite = self.sprites[key] = (image[y:y + h, x:x + w],
+                                          255 - alpha[y:y + h, x:x + w],
+                                          pad + height - y, pad - x)
+        return sprite
+
+    def __call__(self, image, out_boxes, out_scores, out_classes):
+        """
+        Draw the detections on the image in place.
+
+        :param image: numpy array, BGR frame.
+        :param out_boxes: array, shape=(n, 4), (top, left, bottom, right) in
+        pixels as returned by the detectors.
+        :param out_scores: array, shape=(n,)
+        :param out_classes: array, shape=(n,)
+        :return: the image.
+        """
+        height, width = image.shape[:2]
+        self._style((height, width))
+        classes = np.asarray(out_classes, dtype='int64').reshape(-1)
+        if len(classes) == 0:
+            return image
+
+        boxes = np.floor(np.asarray(out_boxes, dtype='float32').reshape(-1, 4)
+                         + 0.5).astype('int32')
+        np.clip(boxes, 0, [height, width, height, width], out=boxes)
+        buckets = np.round(np.asarray(out_scores, dtype='float64').reshape(-1)
+                           / self.score_step).astype('int64')
+
+        # First detection drawn last, on top, as before.
+        for c, bucket, (top, left, bottom, right) in zip(
+                classes[::-1].tolist(), buckets[::-1].tolist(),
+                boxes[::-1].tolist()):
+            cv2.rectangle(image, (left, top), (right, bottom),
+                          self.color_tuples[c], self.thickness)
+
+            sprite, inverse, text_y, text_x = self._sprite(c, bucket)
+            # Text origin 12 pixels above the box, as cv2.putText did.
+            y0 = top - 12 - text_y
+            x0 = left - text_x
+            y1 = min(y0 + sprite.shape[0], height)
+            x1 = min(x0 + sprite.shape[1], width)
+            if y1 <= 0 or x1 <= 0:
+                continue
+            my, mx = max(0, -y0), max(0, -x0)
+            region = image[y0 + my:y1, x0 + mx:x1]
+            cv2.multiply(region, inverse[my:y1 - y0, mx:x1 - x0],
+                         dst=region, scale=1. / 255.)
+            cv2.add(region, sprite[my:y1 - y0, mx:x1 - x0], dst=region)
+        return image
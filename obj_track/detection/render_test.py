@@ -0,0 +1,75 @@
+"""Tests for obj_track.detection.render."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.detection.render import BoxRenderer
+
+CLASS_NAMES = ['person', 'car']
+COLORS = [(0, 0, 255), (0, 255, 0)]
+
+
+class BoxRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = BoxRenderer(CLASS_NAMES, COLORS)
+
+    def test_no_detection(self):
+        image = np.zeros((100, 120, 3), dtype='uint8')
+        output = self.renderer(image, np.empty((0, 4)), [], [])
+        self.assertIs(output, image)
+        self.assertFalse(image.any())
+        self.assertEqual(self.renderer.sprites, {})
+
+    def test_box(self):
+        image = np.zeros((200, 300, 3), dtype='uint8')
+        self.renderer(image, [[50, 40, 150, 200]], [.9], [1])
+        # Box outline in the color of the class, label above it.
+        np.testing.assert_array_equal(image[100, 40], COLORS[1])
+        np.testing.assert_array_equal(image[50, 120], COLORS[1])
+        self.assertTrue(image[20:50, 40:200].any())
+        self.assertFalse(image[100, 100].any())
+
+    def test_clipped_boxes(self):
+        image = np.zeros((100, 120, 3), dtype='uint8')
+        boxes = [[-20, -30, 50, 60],  # top left corner outside
+                 [50, 80, 200, 300],  # bottom right corner outside
+                 [0, 120, 100, 150],  # starts on the right border
+                 [-50, -50, -10, -10],  # fully outside
+                 [95, 0, 140, 20]]  # label below the box top only
+        self.renderer(image, boxes, [.9, .8, .7, .6, .5], [0, 1, 0, 1, 0])
+        # Outlines drawn on the first row and column of the frame.
+        np.testing.assert_array_equal(image[25, 0], COLORS[0])
+        np.testing.assert_array_equal(image[0, 30], COLORS[0])
+        np.testing.assert_array_equal(image[75, 80], COLORS[1])
+
+    def test_sprite_cache(self):
+        image = np.zeros((200, 300, 3), dtype='uint8')
+        boxes = [[50, 40, 150, 200]]
+        self.renderer(image, boxes, [.901], [0])
+        sprite = self.renderer.sprites[(0, 90)]
+        # Same class and score bucket, the sprite is reused.
+        self.renderer(image, boxes, [.904], [0])
+        self.assertIs(self.renderer.sprites[(0, 90)], sprite)
+        self.assertEqual(len(self.renderer.sprites), 1)
+        # Another class or bucket gets its own sprite.
+        self.renderer(image, boxes * 2, [.904, .91], [1, 0])
+        self.assertEqual(sorted(self.renderer.sprites),
+                         [(0, 90), (0, 91), (1, 90)])
+        # Font size depends on the frame size, sprites are drawn again.
+        self.renderer(np.zeros((400, 600, 3), dtype='uint8'), boxes, [.904],
+                      [0])
+        self.assertEqual(list(self.renderer.sprites), [(0, 90)])
+        self.assertIsNot(self.renderer.sprites[(0, 90)], sprite)
+
+    def test_max_sprites(self):
+        renderer = BoxRenderer(CLASS_NAMES, COLORS, max_sprites=3)
+        image = np.zeros((200, 300, 3), dtype='uint8')
+        for score in (.1, .2, .3, .4):
+            renderer(image, [[50, 40, 150, 200]], [score], [0])
+        self.assertEqual(list(renderer.sprites), [(0, 40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+TF sessions of the detectors, built from the "session" entry of a JSON config.
+
+Example entry, e.g. in configs/cfg.json::
+
+    "session": {
+        "intra_op_threads": 4,
+        "inter_op_threads": 1,
+        "xla": true,
+        "grappler": {"arithmetic_optimization": "aggressive",
+                     "layout_optimizer": "off"}
+    }
+
+Thread counts of 0 let TF pick (one per core). The grappler entries are
+fields of ``RewriterConfig``: toggles take on/off/aggressive, other enums
+their value name and boolean fields true/false.
+"""
+
+import json
+
+import tensorflow as tf
+from tensorflow.core.protobuf import rewriter_config_pb2
+
+SESSION_DEFAULTS = {
+    "intra_op_threads": 0,
+    "inter_op_threads": 0,
+    "xla": False,
+    "grappler": {},
+}
+
+
+def session_params(params=None):
+    """
+    Complete session settings with the defaults.
+
+    :param params: dict, the "session" entry of a config, None for the
+    defaults.
+    :return: dict with every key of SESSION_DEFAULTS.
+    """
+    params = dict(params or {})
+    unknown = set(params) - set(SESSION_DEFAULTS)
+    if unknown:
+        raise ValueError('Unknown session settings {}, valid ones: {}'.format(
+            sorted(unknown), sorted(SESSION_DEFAULTS)))
+    return dict(SESSION_DEFAULTS, **params)
+
+
+def read_session_params(config_path):
+    """Session settings of the "session" entry of a JSON config file."""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    return session_params(config.get('session'))
+
+
+def config_proto(params=None):
+    """
+    tf.ConfigProto of the session settings.
+
+    :param params: dict, session settings, see session_params.
+    :return: tf.ConfigProto
+    """
+    params = session_params(params)
+    # Keras creates its default session with soft placement as well.
+    config = tf.ConfigProto(
+        intra_op_parallelism_threads=params['intra_op_threads'],
+        inter_op_parallelism_threads=params['inter_op_threads'],
+        allow_soft_placement=True)
+    graph_options = config.graph_options
+    if params['xla']:
+        graph_options.optimizer_options.global_jit_level = \
+            tf.OptimizerOptions.ON_1
+    rewrite_options = graph_options.rewrite_options
+    fields = rewriter_config_pb2.RewriterConfig.DESCRIPTOR.fields_by_name
+    for name, value in params['grappler'].items():
+        field = fields.get(name)
+        if field is None:
+            raise ValueError('Unknown Grappler option {}'.format(name))
+        if field.enum_type is not None:
+            enum_value = field.enum_type.values_by_name.get(str(value).upper())
+            if enum_value is None:
+                raise ValueError('Grappler option {} takes one of {}'.format(
+                    name, [v.lower() for v in field.enum_type.values_by_name]))
+            value = enum_value.number
+        setattr(rewrite_options, name, value)
+    return config
+
+
+def create_session(params=None, graph=None):
+    """tf.Session of graph (the default graph if None) with the session
+    settings."""
+    return tf.Session(graph=graph, config=config_proto(params))
+
+
+def set_keras_session(params=None):
+    """Create a session with the session settings and make it the Keras
+    session, return it."""
+    from keras import backend as K
+
+    session = create_session(params)
+    K.set_session(session)
+    return session
@@ -0,0 +1,52 @@
+"""Tests for obj_track.detection.session."""
+
+import unittest
+
+import tensorflow as tf
+from tensorflow.core.protobuf import rewriter_config_pb2
+
+from obj_track.detection.session import config_proto, session_params
+
+RewriterConfig = rewriter_config_pb2.RewriterConfig
+
+
+class SessionTest(unittest.TestCase):
+
+    def test_defaults(self):
+        config = config_proto()
+        self.assertEqual(config.intra_op_parallelism_threads, 0)
+        self.assertEqual(config.inter_op_parallelism_threads, 0)
+        self.assertTrue(config.allow_soft_placement)
+        self.assertEqual(
+            config.graph_options.optimizer_options.global_jit_level,
+            tf.OptimizerOptions.DEFAULT)
+
+    def test_settings(self):
+        config = config_proto({
+            'intra_op_threads': 4, 'inter_op_threads': 1, 'xla': True,
+            'grappler': {'arithmetic_optimization': 'aggressive',
+                         'layout_optimizer': 'off',
+                         'disable_model_pruning': True}})
+        self.assertEqual(config.intra_op_parallelism_threads, 4)
+        self.assertEqual(config.inter_op_parallelism_threads, 1)
+        self.assertEqual(
+            config.graph_options.optimizer_options.global_jit_level,
+            tf.OptimizerOptions.ON_1)
+        rewrite_options = config.graph_options.rewrite_options
+        self.assertEqual(rewrite_options.arithmetic_optimization,
+                         RewriterConfig.AGGRESSIVE)
+        self.assertEqual(rewrite_options.layout_optimizer,
+                         RewriterConfig.OFF)
+        self.assertTrue(rewrite_options.disable_model_pruning)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            session_params({'intra_threads': 2})
+        with self.assertRaises(ValueError):
+            config_proto({'grappler': {'no_such_optimizer': 'on'}})
+        with self.assertRaises(ValueError):
+            config_proto({'grappler': {'constant_folding': 'sometimes'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
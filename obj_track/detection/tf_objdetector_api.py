@@ -1,12 +1,9 @@
 import numpy as np
 import os
-import six.moves.urllib as urllib
 import sys
-import tarfile
 import tensorflow as tf
 import zipfile
 import cv2
-from time import time as timer
 import json
 
 from distutils.version import StrictVersion
@@ -24,29 +21,18 @@ if StrictVersion(tf.__version__) < StrictVersion('1.9.0'):
 from models.research.object_detection.utils import label_map_util
 from models.research.object_detection.utils import visualization_utils as \
     vis_util
-from obj_track.detection.const import DATASETS, DOWNLOAD_BASE
-
-
-
-def get_video_props(capture, file):
-    fps = 30
-    h = 600
-    w = 800
-    if file == 0:
-        num_frames = 120
-        start = timer()
-        for i in range(num_frames):
-            _, frame = capture.read()
-            h, w, _ = frame.shape
-        end = timer() - start
-        fps = round(num_frames / end)
-        if fps < 1:
-            fps = 1
-    else:
-        fps = round(capture.get(cv2.CAP_PROP_FPS))
-        _, frame = capture.read()
-        h, w, _ = frame.shape
-    return fps, h, w
+from obj_track.detection.const import DATASETS
+from obj_track.detection.model_cache import ModelCache
+from obj_track.detection.session import create_session
+from obj_track.detection.timing import StageTimer
+from obj_track.detection.utils import draw_tracks
+from obj_track.tracking.flow import BoxPropagator
+from obj_track.tracking.trackers import create_tracker
+from obj_track.video.props import VideoProps
+from obj_track.video.buffer import QUEUE_SIZE, source_policy
+from obj_track.video.reader import MultiFrameReader
+from obj_track.video.writer import AsyncVideoWriter
+
 
 
 def tfapi(params):
@@ -61,29 +47,12 @@ def tfapi(params):
     DATASET_LABEL_MAP = DATASETS[params['dataset']]
     PATH_TO_LABELS = os.path.join(BASE_DIR, DATASET_LABEL_MAP)
     MODEL_NAME = params['model_name']
-    MODEL_FILE = MODEL_NAME + '.tar.gz'
-
-    # Path to frozen detection graph. This is the actual model that is used
-    # for the object detection.
-    PATH_TO_FROZEN_GRAPH = MODEL_NAME + '/frozen_inference_graph.pb'
-
-    # Download model
-    opener = urllib.request.URLopener()
-    opener.retrieve(DOWNLOAD_BASE + MODEL_FILE, MODEL_FILE)
-    tar_file = tarfile.open(MODEL_FILE)
-    for member in tar_file.getmembers():
-        file_name = os.path.basename(member.name)
-        if 'frozen_inference_graph.pb' in file_name:
-            tar_file.extract(member, os.getcwd())
-
-    # Load a (frozen) TensorFlow model into memory
-    detection_graph = tf.Graph()
-    with detection_graph.as_default():
-        od_graph_def = tf.GraphDef()
-        with tf.gfile.GFile(PATH_TO_FROZEN_GRAPH, 'rb') as fid:
-            serialized_graph = fid.read()
-            od_graph_def.ParseFromString(serialized_graph)
-            tf.import_graph_def(od_graph_def, name='')
+
+    # Load a (frozen) TensorFlow model into memory, downloaded and parsed
+    # only the first time.
+    model_cache = ModelCache(params.get('cache_dir'))
+    detection_graph = model_cache.load_graph(MODEL_NAME,
+                                             params.get('model_checksum'))
 
     category_index = label_map_util.create_category_index_from_labelmap(
         PATH_TO_LABELS, use_display_name=True)
@@ -93,37 +62,52 @@ def tfapi(params):
     # -----------------------------------------------------------------------#
     #                  Video Settings, opencv-python                         #
     # -----------------------------------------------------------------------#
-    file = params['video']
+    # params['video'] is one source or a list of sources sharing the model.
+    files = params['video']
+    if not isinstance(files, list):
+        files = [files]
+    files = [0 if file == "0" else file for file in files]
     save = params['save']
-    if file == "0":
-        file = 0
 
-
-    cap = cv2.VideoCapture(file)
+    cap = MultiFrameReader(files,
+                           queue_size=params.get('queue_size', QUEUE_SIZE),
+                           policy=params.get('queue_policy')).start()
 
     print('Press [q] to quit demo')
 
     #if url is not reachable assertion error will be raised
-    assert cap.isOpened(), \
-        'Cannot capture source'
-
-    # Get video properties
-    fps, height, width = get_video_props(cap, file)
+    for reader in cap.readers:
+        assert reader.isOpened(), \
+            'Cannot capture source {}'.format(reader.source)
 
     if save:
         # Create the output dir if doesn't exist
         os.makedirs(params['out'], exist_ok=True)
-        video_filename = params['out'] + params['filename']
-        # Define the codec and create VideoWriter object
+        # Define the codec and create VideoWriter object per source
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(video_filename, fourcc, fps, (width, height))
+        outs = []
+        # Frame rate measured on the first frames if the source does not
+        # report it, the writers wait for it.
+        props = [VideoProps(reader) for reader in cap.readers]
+        for i in range(len(files)):
+            video_filename = params['out'] + params['filename']
+            if len(files) > 1:
+                root, ext = os.path.splitext(video_filename)
+                video_filename = '{}_{}{}'.format(root, i, ext)
+            outs.append(AsyncVideoWriter(
+                video_filename, fourcc, props[i].get_fps,
+                policy=source_policy(files[i],
+                                     params.get('writer_policy'))))
+
+    # One tracker per source if asked.
+    trackers = [create_tracker(params['tracker']) for _ in files] \
+        if params.get('tracker') else []
 
     show = params['show']
     if show:
-        cv2.namedWindow('demo', 0)
-        _, frame = cap.read()
-        height, width, _ = frame.shape
-        cv2.resizeWindow('demo', 640, 480)
+        for i in range(len(files)):
+            cv2.namedWindow('demo {}'.format(i), 0)
+            cv2.resizeWindow('demo {}'.format(i), 640, 480)
     # -----------------------------------------------------------------------#
     # -----------------------------------------------------------------------#
 
@@ -133,52 +117,92 @@ def tfapi(params):
     #       tensorflow configuration, run the prediction session             #
     # -----------------------------------------------------------------------#
     print('Prediction running')
-    elapsed = int()
+    # Keyframe mode, the network runs on one frame out of num_frames per
+    # source and the boxes are shifted with optical flow in between.
+    detect_every = params['num_frames']
+    propagators = [BoxPropagator() for _ in files]
+    elapsed = [int()] * len(files)
+    timer = StageTimer(params.get('timings'), params.get('timings_every', 10.),
+                       warmup=params.get('timings_warmup', 0))
+    stage = timer.stage
     # Running the tensorFlow session
     with detection_graph.as_default():
-        with tf.Session(graph=detection_graph) as sess:
+        with create_session(params.get('session'),
+                            graph=detection_graph) as sess:
+            image_tensor = detection_graph.get_tensor_by_name(
+                'image_tensor:0')
+            # Each box represents a part of the image where a particular object was detected.
+            boxes = detection_graph.get_tensor_by_name('detection_boxes:0')
+            # Each score represent how level of confidence for each of the objects.
+            # Score is shown on the result image, together with the class label.
+            scores = detection_graph.get_tensor_by_name('detection_scores:0')
+            classes = detection_graph.get_tensor_by_name(
+                'detection_classes:0')
+            num_detections = detection_graph.get_tensor_by_name(
+                'num_detections:0')
             while cap.isOpened():
-                ret, image_np = cap.read()
-                if image_np is None:
+                # Frames of every source come in turn.
+                with stage('capture'):
+                    batch = cap.read_batch(1)
+                if not batch:
                     print('\nEnd of Video')
                     break
-                elapsed += 1
-                if elapsed % params['num_frames'] ==0:
+                i, image_np = batch[0]
+                height, width, _ = image_np.shape
+                if elapsed[i] % detect_every == 0:
                     # Expand dimensions since the model expects images to have shape: [1, None, None, 3]
-                    image_np_expanded = np.expand_dims(image_np, axis=0)
-                    image_tensor = detection_graph.get_tensor_by_name(
-                        'image_tensor:0')
-                    # Each box represents a part of the image where a particular object was detected.
-                    boxes = detection_graph.get_tensor_by_name('detection_boxes:0')
-                    # Each score represent how level of confidence for each of the objects.
-                    # Score is shown on the result image, together with the class label.
-                    scores = detection_graph.get_tensor_by_name('detection_scores:0')
-                    classes = detection_graph.get_tensor_by_name(
-                        'detection_classes:0')
-                    num_detections = detection_graph.get_tensor_by_name(
-                        'num_detections:0')
+                    with stage('preprocess'):
+                        image_np_expanded = np.expand_dims(image_np, axis=0)
                     # Actual detection.
-                    (boxes, scores, classes, num_detections) = sess.run(
-                        [boxes, scores, classes, num_detections],
-                        feed_dict={image_tensor: image_np_expanded})
-                    # Visualization of the results of a detection.
-                    image_np = vis_util.visualize_boxes_and_labels_on_image_array(
-                        image_np,
-                        np.squeeze(boxes),
-                        np.squeeze(classes).astype(np.int32),
-                        np.squeeze(scores),
-                        category_index,
-                        use_normalized_coordinates=True,
-                        line_thickness=8, min_score_thresh=params['threshold'])
-                    # font = cv2.FONT_HERSHEY_SIMPLEX
-                    # font_size = 1e-3 * height
-                    # font_color = (255,255,255)
-                    # image_np = cv2.putText(image_np,json.dumps(json_out),
-                    #                        (10, 20), font, font_size, font_color, 2)
-                    if save:
-                        out.write(image_np)
+                    with stage('inference'):
+                        (out_boxes, out_scores, out_classes, _) = sess.run(
+                            [boxes, scores, classes, num_detections],
+                            feed_dict={image_tensor: image_np_expanded})
+                    # Keep the boxes above threshold, in pixels like yolo_eval.
+                    with stage('postprocess'):
+                        out_scores = np.squeeze(out_scores)
+                        keep = out_scores >= params['threshold']
+                        out_boxes = np.squeeze(out_boxes)[keep] * \
+                            [height, width, height, width]
+                        out_scores = out_scores[keep]
+                        out_classes = np.squeeze(out_classes)[keep].astype(
+                            np.int32)
+                    if detect_every > 1:
+                        propagators[i].reset(image_np, out_boxes, out_scores,
+                                             out_classes)
+                else:
+                    out_boxes, out_scores, out_classes = \
+                        propagators[i].propagate(image_np)
+                elapsed[i] += 1
+                # Visualization of the results of a detection.
+                with stage('draw'):
+                    image_np = \
+                        vis_util.visualize_boxes_and_labels_on_image_array(
+                            image_np,
+                            out_boxes,
+                            out_classes,
+                            out_scores,
+                            category_index,
+                            use_normalized_coordinates=False,
+                            line_thickness=8,
+                            min_score_thresh=params['threshold'],
+                            backend=params.get('vis_backend', 'cv2'))
+                if trackers:
+                    ids, track_boxes, _, _ = trackers[i].update(
+                        out_boxes, out_scores, out_classes)
+                    draw_tracks(image_np, ids, track_boxes)
+                # font = cv2.FONT_HERSHEY_SIMPLEX
+                # font_size = 1e-3 * height
+                # font_color = (255,255,255)
+                # image_np = cv2.putText(image_np,json.dumps(json_out),
+                #                        (10, 20), font, font_size, font_color, 2)
+                if save:
+                    props[i].update(image_np)
+                    with stage('write'):
+                        outs[i].write(image_np)
+                timer.frame()
                 if show:
-                    cv2.imshow('demo', image_np)
+                    cv2.imshow('demo {}'.format(i), image_np)
                     if cv2.waitKey(25) & 0xFF == ord('q'):
                         cv2.destroyAllWindows()
                         cap.release()
@@ -188,6 +212,11 @@ def tfapi(params):
     print('Job finished')
     cap.release()
     if save:
-        out.release()
+        for out in outs:
+            out.release()
+            print('Writer stats: {}'.format(out.stats()))
+    if params.get('timings'):
+        timer.export()
+    print('Stage latencies: {}'.format(timer))
     if show:
         cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Per stage latency of the detection pipelines.
+
+Every stage of the frame loop (capture, preprocess, inference, postprocess,
+draw, write) is timed with ``time.perf_counter`` into a rolling window of
+the last samples, summarized as p50/p95/p99 and exported periodically to a
+JSON (latest snapshot) or CSV (one row per stage and export) file.
+"""
+
+import collections
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+STAGES = ('capture', 'preprocess', 'inference', 'postprocess', 'draw',
+          'write')
+PERCENTILES = (50, 95, 99)
+CSV_FIELDS = ['time', 'elapsed', 'frames', 'fps', 'stage', 'count',
+              'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']
+
+
+class Stage(object):
+    """
+    Latencies of one stage, a context manager timing its block.
+
+    :param window: int, number of latest samples the percentiles are
+    computed on.
+    """
+    __slots__ = ('samples', 'count', 'start')
+
+    def __init__(self, window):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.add(time.perf_counter() - self.start)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """Count of samples and mean and percentiles of the window in ms."""
+        summary = {'count': self.count}
+        samples = 1000. * np.array(self.samples)
+        summary['mean_ms'] = float(samples.mean()) if len(samples) else None
+        for p in PERCENTILES:
+            summary['p{}_ms'.format(p)] = \
+                float(np.percentile(samples, p)) if len(samples) else None
+        return summary
+
+
+class StageTimer(object):
+    """
+    Rolling latency statistics of the stages of a frame loop.
+
+    Usage::
+
+        timer = StageTimer('timings.json')
+        with timer.stage('inference'):
+            sess.run(...)
+        timer.frame()  # once per frame, exports every export_every seconds
+
+    Parameters
+    ----------
+    :param path: str, file the statistics are exported to, .csv for CSV and
+    JSON otherwise, None to only keep them in memory.
+    :param export_every: float, seconds between two exports.
+    :param window: int, number of latest samples per stage.
+    :param stages: names of the stages, in the order they are reported.
+    Other names are added on first use.
+    :param warmup: int, number of first frames left out of the statistics
+    (graph optimization, allocations, first reads).
+    """
+    def __init__(self, path=None, export_every=10., window=1000,
+                 stages=STAGES, warmup=0):
+        self.path = path
+        self.export_every = export_every
+        self.window = window
+        self.warmup = warmup
+        self.warmup_end = None
+        self.reset(stages)
+        self.last_export = self.started
+
+    def reset(self, stages=None):
+        """Drop the frames and samples recorded so far."""
+        if stages is None:
+            stages = list(self.stages)
+        self.stages = collections.OrderedDict(
+            (name, Stage(self.window)) for name in stages)
+        self.frames = 0
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        """Return the Stage called name, to be used in a with statement."""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(self.window)
+        return stage
+
+    def add(self, name, seconds):
+        """Record a latency measured by the caller."""
+        self.stage(name).add(seconds)
+
+    def frame(self, count=1):
+        """Count processed frames and export if it is time to."""
+        self.frames += count
+        if self.warmup and self.warmup_end is None and \
+                self.frames >= self.warmup:
+            # Steady state from now on.
+            self.warmup_end = time.time()
+            self.reset()
+        if self.path and time.perf_counter() - self.last_export >= \
+                self.export_every:
+            self.export()
+
+    def summary(self):
+        """
+        :return: dict with the frames processed, the average frame rate and
+        the statistics of every stage used so far.
+        """
+        elapsed = time.perf_counter() - self.started
+        return {'time': time.time(),
+                'elapsed': elapsed,
+                'frames': self.frames,
+                'fps': self.frames / elapsed if elapsed > 0 else 0.,
+                'warmup_frames': self.warmup,
+                'warmup_end': self.warmup_end,
+                'stages': collections.OrderedDict(
+                    (name, stage.summary())
+                    for name, stage in self.stages.items() if stage.count)}
+
+    def export(self, path=None):
+        """Write the summary to path, self.path if None."""
+        path = path or self.path
+        self.last_export = time.perf_counter()
+        summary = self.summary()
+        if path.endswith('.csv'):
+            new_file = not os.path.isfile(path)
+            with open(path, 'a', newline='') as fid:
+                writer = csv.DictWriter(fid, fieldnames=CSV_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                for name, stage in summary['stages'].items():
+                    row = {key: summary[key] for key in CSV_FIELDS[:4]}
+                    row['stage'] = name
+                    row.update(stage)
+                    writer.writerow(row)
+        else:
+            # Replaced at once, readers never see a partial snapshot.
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as fid:
+                json.dump(summary, fid, indent=2)
+            os.replace(tmp_path, path)
+        return summary
+
+    def __str__(self):
+        summary = self.summary()
+        lines = ['{} frames, {:.1f} FPS'.format(summary['frames'],
+                                                 summary['fps'])]
+        for name, stage in summary['stages'].items():
+            lines.append('{:>12}: p50 {:.2f} ms, p95 {:.2f} ms, p99 {:.2f} '
+                         'ms'.format(name, stage['p50_ms'], stage['p95_ms'],
+                                     stage['p99_ms']))
+        return '\n'.join(lines)
@@ -0,0 +1,73 @@
+"""Tests for obj_track.detection.timing."""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from obj_track.detection.timing import StageTimer
+
+
+class StageTimerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rolling_percentiles(self):
+        timer = StageTimer(window=100)
+        for ms in range(1, 201):
+            timer.add('inference', ms / 1000.)
+        with timer.stage('draw'):
+            pass
+        summary = timer.summary()['stages']
+        # Only the last 100 samples, 101 to 200 ms.
+        self.assertEqual(summary['inference']['count'], 200)
+        self.assertAlmostEqual(summary['inference']['p50_ms'], 150.5)
+        self.assertAlmostEqual(summary['inference']['p99_ms'], 199.01)
+        self.assertEqual(list(summary), ['inference', 'draw'])
+        self.assertNotIn('capture', summary)
+
+    def test_warmup(self):
+        timer = StageTimer(warmup=2)
+        for ms in (100, 50, 1, 2):
+            timer.add('inference', ms / 1000.)
+            timer.frame()
+        summary = timer.summary()
+        self.assertEqual(summary['frames'], 2)
+        self.assertIsNotNone(summary['warmup_end'])
+        self.assertEqual(summary['stages']['inference']['count'], 2)
+        self.assertAlmostEqual(summary['stages']['inference']['p50_ms'], 1.5)
+
+    def test_json_export(self):
+        path = os.path.join(self.tmp_dir, 'timings.json')
+        timer = StageTimer(path, export_every=0.)
+        timer.add('capture', .01)
+        timer.frame()
+        with open(path) as fid:
+            summary = json.load(fid)
+        self.assertEqual(summary['frames'], 1)
+        self.assertAlmostEqual(summary['stages']['capture']['p95_ms'], 10.)
+
+    def test_csv_export(self):
+        path = os.path.join(self.tmp_dir, 'timings.csv')
+        timer = StageTimer(path, export_every=3600.)
+        timer.add('capture', .01)
+        timer.add('write', .002)
+        timer.frame()
+        self.assertFalse(os.path.exists(path))
+        timer.export()
+        timer.export()
+        with open(path) as fid:
+            rows = list(csv.DictReader(fid))
+        self.assertEqual([row['stage'] for row in rows],
+                         ['capture', 'write', 'capture', 'write'])
+        self.assertAlmostEqual(float(rows[1]['p50_ms']), 2.)
+
+
+if __name__ == '__main__':
+    unittest.main()
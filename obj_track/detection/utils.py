@@ -3,29 +3,10 @@ import random
 import colorsys
 import imghdr
 from PIL import Image, ImageDraw, ImageFont
-from time import time as timer
 import cv2
 
+from ..tracking.assignment import box_centroids
 
-def get_video_props(capture, file):
-    fps = 30
-    h = 600
-    w = 800
-    if file == 0:
-        num_frames = 120
-        start = timer()
-        for i in range(num_frames):
-            _, frame = capture.read()
-            h, w, _ = frame.shape
-        end = timer() - start
-        fps = round(num_frames / end)
-        if fps < 1:
-            fps = 1
-    else:
-        fps = round(capture.get(cv2.CAP_PROP_FPS))
-        _, frame = capture.read()
-        h, w, _ = frame.shape
-    return fps, h, w
 
 def read_classes(classes_path):
     with open(classes_path) as f:
@@ -73,25 +54,15 @@ def preprocess_image(image, model_image_size, fixed_size):
     return image, image_data
 
 
-def draw_boxes(image, out_scores, out_boxes, out_classes, class_names, colors):
+def draw_tracks(image, ids, boxes, color=(0, 255, 0)):
+    """Draw the id and the centroid of every track on the image."""
     font = 0
     fontSize = 1e-3 * image.shape[0]
-    thickness = int((image.shape[1] + image.shape[0]) // 300)
-
-    for i, c in reversed(list(enumerate(out_classes))):
-        predicted_class = class_names[c]
-        box = out_boxes[i]
-        score = out_scores[i]
-
-        label = '{} {:.2f}'.format(predicted_class, score)
-
-        top, left, bottom, right = box
-        top = max(0, np.floor(top + 0.5).astype('int32'))
-        left = max(0, np.floor(left + 0.5).astype('int32'))
-        bottom = min(image.shape[0], np.floor(bottom + 0.5).astype('int32'))
-        right = min(image.shape[1], np.floor(right + 0.5).astype('int32'))
+    thickness = max(1, int((image.shape[1] + image.shape[0]) // 600))
+    centroids = box_centroids(boxes).astype('int32')
 
-        cv2.rectangle(image, (left, top), (right, bottom),
-                      colors[c], thickness)
-        cv2.putText(image, label, (left, top - 12), font, fontSize,
-                    colors[c], thickness)
\ No newline at end of file
+    for track_id, (x, y) in zip(ids, centroids):
+        cv2.putText(image, 'ID {}'.format(track_id), (x - 10, y - 10), font,
+                    fontSize, color, thickness)
+        cv2.circle(image, (x, y), 4, color, -1)
+    return image
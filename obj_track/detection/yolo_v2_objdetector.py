@@ -12,7 +12,17 @@ from keras.models import load_model
 
 from ..yad2k.models.keras_yolov2 import yolo_eval_v2, yolo_head_v2
 from .utils import read_classes, read_anchors, generate_colors, \
-    preprocess_image, draw_boxes, get_video_props
+    preprocess_image, draw_tracks
+from .preprocess import FramePreprocessor
+from .render import BoxRenderer
+from .session import set_keras_session
+from .timing import StageTimer
+from ..tracking.flow import BoxPropagator
+from ..tracking.trackers import create_tracker
+from ..video.buffer import source_policy
+from ..video.props import VideoProps
+from ..video.reader import FrameReader
+from ..video.writer import AsyncVideoWriter
 
 def yolo_v2(params):
     """
@@ -65,10 +75,12 @@ def yolo_v2(params):
     #           Configure TF session, load model and get properties          #
     # -----------------------------------------------------------------------#
     # Create TF session, generate classes and colors
-    sess = K.get_session()  # TODO: Remove dependence on Tensorflow session.
+    # TODO: Remove dependence on Tensorflow session.
+    sess = set_keras_session(getattr(params, 'session_params', None))
     class_names = read_classes(classes_path)
     anchors = read_anchors(anchors_path)
     colors = generate_colors(class_names)
+    renderer = BoxRenderer(class_names, colors)
 
     yolo_model = load_model(model_path)
 
@@ -86,6 +98,9 @@ def yolo_v2(params):
     # Check if model is fully convolutional, assuming channel last order.
     model_image_size = yolo_model.layers[0].input_shape[1:3]
     is_fixed_size = model_image_size != (None, None)
+    # Fixed size inputs reuse the same buffers for every frame.
+    if is_fixed_size:
+        preprocessor = FramePreprocessor(model_image_size, letterbox=False)
 
     # Generate output tensor targets for filtered bounding boxes.
     # TODO: Wrap these backend operations with Keras layers.
@@ -106,7 +121,8 @@ def yolo_v2(params):
     if file == '0':
         file = 0
 
-    cap = cv2.VideoCapture(file)
+    cap = FrameReader(file, queue_size=params.queue_size,
+                      policy=params.queue_policy).start()
 
     # if http address is not reachable assertion error will be raised
     assert cap.isOpened(), 'Cannot capture source'
@@ -120,40 +136,73 @@ def yolo_v2(params):
         height, width, _ = frame.shape
         cv2.resizeWindow('demo', 640, 480)
 
-    # Get video properties
-    fps, height, width = get_video_props(cap, file)
+    # Frame rate measured on the first frames if the source does not report
+    # it, the writer waits for it.
+    props = VideoProps(cap)
 
     if params.save:
         # Define the codec and create VideoWriter object
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
         video_filename = output_path + '/output.avi'
-        out = cv2.VideoWriter(video_filename, fourcc, fps, (width, height))
+        out = AsyncVideoWriter(
+            video_filename, fourcc, props.get_fps,
+            policy=source_policy(file, getattr(params, 'writer_policy',
+                                               None)))
+
+    # Track the detections if asked.
+    tracker = create_tracker(params.tracker) if params.tracker else None
+    # Keyframe mode, boxes are propagated on the frames between detections.
+    detect_every = params.detect_every
+    propagator = BoxPropagator() if detect_every > 1 else None
+    elapsed = int()
+    timer = StageTimer(params.timings, params.timings_every,
+                       warmup=params.timings_warmup)
+    stage = timer.stage
 
     # -----------------------------------------------------------------------#
     #                           Run detection with YOLOv2                    #
     # -----------------------------------------------------------------------#
     while cap.isOpened():
-        ret, image = cap.read()
+        with stage('capture'):
+            ret, image = cap.read()
         if image is None:
             print('\nEnd of Video')
             break
-        image, image_data = preprocess_image(image, model_image_size,
-                                             is_fixed_size)
-
-        # Run the session, do prediction.
-        out_boxes, out_scores, out_classes = sess.run(
-            [boxes, scores, classes],
-            feed_dict={
-                yolo_model.input: image_data,
-                input_image_shape: [image.shape[0], image.shape[1]],
-                K.learning_phase(): 0
-            })
-        #print('Found {} boxes for video'.format(len(out_boxes)))
-
-        draw_boxes(image, out_scores, out_boxes, out_classes, class_names,
-                   colors)
+        if elapsed % detect_every == 0:
+            with stage('preprocess'):
+                if is_fixed_size:
+                    image_data = preprocessor(image)
+                else:
+                    image, image_data = preprocess_image(
+                        image, model_image_size, is_fixed_size)
+
+            # Run the session, do prediction, postprocess in the graph.
+            with stage('inference'):
+                out_boxes, out_scores, out_classes = sess.run(
+                    [boxes, scores, classes],
+                    feed_dict={
+                        yolo_model.input: image_data,
+                        input_image_shape: [image.shape[0], image.shape[1]],
+                        K.learning_phase(): 0
+                    })
+            #print('Found {} boxes for video'.format(len(out_boxes)))
+            if propagator:
+                propagator.reset(image, out_boxes, out_scores, out_classes)
+        else:
+            out_boxes, out_scores, out_classes = propagator.propagate(image)
+        elapsed += 1
+
+        with stage('draw'):
+            renderer(image, out_boxes, out_scores, out_classes)
+        if tracker:
+            ids, track_boxes, _, _ = tracker.update(out_boxes, out_scores,
+                                                    out_classes)
+            draw_tracks(image, ids, track_boxes)
         if params.save:
-            out.write(image)
+            props.update(image)
+            with stage('write'):
+                out.write(image)
+        timer.frame()
         if show:
             cv2.imshow('demo', image)
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -166,4 +215,8 @@ def yolo_v2(params):
     if show:
         cv2.destroyAllWindows()
     if params.save:
-        out.release()
\ No newline at end of file
+        out.release()
+        print('Writer stats: {}'.format(out.stats()))
+    if params.timings:
+        timer.export()
+    print('Stage latencies: {}'.format(timer))
\ No newline at end of file
@@ -12,13 +12,28 @@ from keras.models import load_model
 from keras.layers import Input
 from PIL import Image, ImageFont, ImageDraw
 
-from ..yad2k.models.keras_yolov3 import  yolo_eval, yolo_body, tiny_yolo_body
-from ..yad2k.utils.utils_yolo_v3 import letterbox_image, letterbox_image_cv
+from ..yad2k.models.keras_yolov3 import  yolo_eval, yolo_eval_batch, \
+    yolo_body, tiny_yolo_body
+from ..yad2k.models.numpy_yolov3 import yolo_eval_np, yolo_eval_batch_np
+from ..yad2k.models.frozen_yolov3 import load_frozen_yolo, INPUT_NAME, \
+    IMAGE_SHAPE_NAME, SCORE_THRESHOLD_NAME, IOU_THRESHOLD_NAME
+from ..yad2k.utils.utils_yolo_v3 import letterbox_image
 import os
 from keras.utils import multi_gpu_model
 import cv2
 
-from .utils import get_video_props
+from .geometry import get_geometry
+from .preprocess import FramePreprocessor
+from .render import BoxRenderer
+from .session import set_keras_session
+from .timing import StageTimer
+from .utils import draw_tracks
+from ..tracking.flow import BoxPropagator
+from ..tracking.trackers import create_tracker
+from ..video.buffer import QUEUE_SIZE, source_policy
+from ..video.props import VideoProps, capture_frame_shape
+from ..video.reader import MultiFrameReader
+from ..video.writer import AsyncVideoWriter
 
 class YOLO(object):
     _defaults = {
@@ -28,6 +43,14 @@ class YOLO(object):
         "iou" : 0.5,
         "model_image_size" : (416, 416),
         "gpu_num" : 1,
+        "batch_size" : 1,
+        "postprocess" : "graph",
+        "nms" : "per_class",
+        "frozen" : False,
+        "timings" : None,
+        "timings_every" : 10.,
+        "timings_warmup" : 0,
+        "session_params" : None,
     }
 
     @classmethod
@@ -43,8 +66,12 @@ class YOLO(object):
         self._set_paths()
         self.class_names = self._get_class()
         self.anchors = self._get_anchors()
-        self.sess = K.get_session()
+        # Threads, XLA and Grappler of obj_track.detection.session.
+        self.sess = set_keras_session(self.session_params)
         self.boxes, self.scores, self.classes = self.generate()
+        # Latency of every stage, see obj_track.detection.timing.
+        self.timer = StageTimer(self.timings, self.timings_every,
+                                warmup=self.timings_warmup)
 
     def _get_class(self):
         classes_path = os.path.expanduser(self.classes_path)
@@ -73,7 +100,8 @@ class YOLO(object):
         assert files, 'There are no files in yolo/data directory, ' \
                       'run convert_yad2k.py first'
         yolo_version = self.detector
-        model_name = yolo_version + '.h5'
+        # Frozen graph written by convert_yad2k.py --freeze.
+        model_name = yolo_version + ('.pb' if self.frozen else '.h5')
         anchors_name = yolo_version + '_anchors.txt'
         for file in files:
             if file == model_name:
@@ -83,7 +111,8 @@ class YOLO(object):
             if file == anchors_name:
                 anchors_path = os.path.join(yolo_data_dir, file)
 
-        assert model_path.endswith('.h5'), 'Keras model must be a .h5 file.'
+        assert model_path, 'No {} in yolo/data directory, run ' \
+                           'convert_yad2k.py first'.format(model_name)
         assert anchors_path.endswith(
             'anchors.txt'), 'An *_anchors.txt file must ' \
                             'be provided'
@@ -105,6 +134,21 @@ class YOLO(object):
         return np.array(anchors).reshape(-1, 2)
 
     def generate(self):
+        # Generate colors for drawing bounding boxes.
+        hsv_tuples = [(x / len(self.class_names), 1., 1.)
+                      for x in range(len(self.class_names))]
+        self.colors = list(map(lambda x: colorsys.hsv_to_rgb(*x), hsv_tuples))
+        self.colors = list(
+            map(lambda x: (int(x[0] * 255), int(x[1] * 255), int(x[2] * 255)),
+                self.colors))
+        np.random.seed(10101)  # Fixed seed for consistent colors across runs.
+        np.random.shuffle(self.colors)  # Shuffle colors to decorrelate adjacent classes.
+        np.random.seed(None)  # Reset seed to default.
+        self.renderer = BoxRenderer(self.class_names, self.colors)
+
+        if self.frozen:
+            return self._load_frozen()
+
         model_path = os.path.expanduser(self.model_path)
         assert model_path.endswith('.h5'), \
             'Keras model or weights must be a .h5 file.'
@@ -128,132 +172,312 @@ class YOLO(object):
 
         print('{} model, anchors, and classes loaded.'.format(model_path))
 
-        # Generate colors for drawing bounding boxes.
-        hsv_tuples = [(x / len(self.class_names), 1., 1.)
-                      for x in range(len(self.class_names))]
-        self.colors = list(map(lambda x: colorsys.hsv_to_rgb(*x), hsv_tuples))
-        self.colors = list(
-            map(lambda x: (int(x[0] * 255), int(x[1] * 255), int(x[2] * 255)),
-                self.colors))
-        np.random.seed(10101)  # Fixed seed for consistent colors across runs.
-        np.random.shuffle(self.colors)  # Shuffle colors to decorrelate adjacent classes.
-        np.random.seed(None)  # Reset seed to default.
-
         # Generate output tensor targets for filtered bounding boxes.
         self.input_image_shape = K.placeholder(shape=(2, ))
         if self.gpu_num>=2:
             self.yolo_model = multi_gpu_model(self.yolo_model,
                                               gpus=self.gpu_num)
-        boxes, scores, classes = yolo_eval(self.yolo_model.output, self.anchors,
+        self.input = self.yolo_model.input
+        self.outputs = self.yolo_model.output
+        self.feed = {K.learning_phase(): 0}
+        if self.postprocess == 'numpy':
+            # Decoded outside of the graph, see yolo_eval_np.
+            return None, None, None
+        boxes, scores, classes = yolo_eval(self.outputs, self.anchors,
                 len(self.class_names), self.input_image_shape,
-                score_threshold=self.score, iou_threshold=self.iou)
+                score_threshold=self.score, iou_threshold=self.iou,
+                nms=self.nms)
         return boxes, scores, classes
 
-    def detect_image(self, image):
-        start = timer()
-
+    def _load_frozen(self):
+        # Graph with folded batch normalization and yolo_eval, no Keras
+        # model. The NMS mode is baked in, it must be the requested one.
+        tensors = load_frozen_yolo(os.path.expanduser(self.model_path),
+                                   self.sess.graph)
+        if tensors['nms'] != self.nms:
+            raise ValueError(
+                '{} was frozen with the {} NMS, not {}. Use --nms {} or '
+                'freeze it again with convert_yad2k.py --freeze --nms '
+                '{}'.format(self.model_path, tensors['nms'], self.nms,
+                            tensors['nms'], self.nms))
+        self.input = tensors[INPUT_NAME]
+        self.outputs = tensors['yolo_outputs']
+        self.input_image_shape = tensors[IMAGE_SHAPE_NAME]
+        self.feed = {tensors[SCORE_THRESHOLD_NAME]: self.score,
+                     tensors[IOU_THRESHOLD_NAME]: self.iou}
+        print('{} frozen graph, anchors, and classes loaded.'.format(
+            self.model_path))
+        if self.postprocess == 'numpy':
+            return None, None, None
+        return tensors['boxes'], tensors['scores'], tensors['classes']
+
+    def _generate_batch(self):
+        # Per image shapes and detections, built on the first detect_batch.
+        self.input_image_shapes = K.placeholder(shape=(None, 2))
+        self.batch_boxes, self.batch_scores, self.batch_classes, \
+            self.batch_index = yolo_eval_batch(
+                self.outputs, self.anchors, len(self.class_names),
+                self.input_image_shapes, score_threshold=self.score,
+                iou_threshold=self.iou, nms=self.nms)
+
+    def _feed(self, image_data, extra=None):
+        feed_dict = dict(self.feed)
+        feed_dict[self.input] = image_data
+        if extra:
+            feed_dict.update(extra)
+        return feed_dict
+
+    def preprocess(self, frames):
+        """
+        Letterbox and normalize frames into a model input batch.
+
+        With a fixed model_image_size the frames are written into the
+        reusable buffers of a FramePreprocessor, the returned array is only
+        valid until the next call.
+        """
         if self.model_image_size != (None, None):
-            assert self.model_image_size[0]%32 == 0, 'Multiples of 32 required'
-            assert self.model_image_size[1]%32 == 0, 'Multiples of 32 required'
-            boxed_image = letterbox_image_cv(image, tuple(reversed(
-                self.model_image_size)))
-        else:
+            if not hasattr(self, 'preprocessor'):
+                assert self.model_image_size[0]%32 == 0, \
+                    'Multiples of 32 required'
+                assert self.model_image_size[1]%32 == 0, \
+                    'Multiples of 32 required'
+                self.preprocessor = FramePreprocessor(
+                    self.model_image_size, max_batch=self.batch_size)
+            return self.preprocessor.batch(frames)
+
+        image_data = []
+        for image in frames:
             height, width, _ = image.shape
             new_image_size = (width - (width % 32), height - (height % 32))
             boxed_image = letterbox_image(image, new_image_size)
-        image_data = np.array(boxed_image, dtype='float32')
-
-        image_data /= 255.
-        image_data = np.expand_dims(image_data, 0)  # Add batch dimension.
-
-        out_boxes, out_scores, out_classes = self.sess.run(
-            [self.boxes, self.scores, self.classes],
-            feed_dict={
-                self.yolo_model.input: image_data,
-                self.input_image_shape: [image.shape[0], image.shape[1]],
-                K.learning_phase(): 0
-            })
-
-        font = 0
-        fontSize = 1e-3 * image.shape[0]
-        thickness = int((image.shape[1] + image.shape[0]) // 300)
-
-        for i, c in reversed(list(enumerate(out_classes))):
-            predicted_class = self.class_names[c]
-            box = out_boxes[i]
-            score = out_scores[i]
-
-            label = '{} {:.2f}'.format(predicted_class, score)
-
-            top, left, bottom, right = box
-            top = max(0, np.floor(top + 0.5).astype('int32'))
-            left = max(0, np.floor(left + 0.5).astype('int32'))
-            bottom = min(image.shape[0], np.floor(bottom + 0.5).astype('int32'))
-            right = min(image.shape[1], np.floor(right + 0.5).astype('int32'))
-
-            cv2.rectangle(image, (left, top), (right, bottom),
-                              self.colors[c], thickness)
-            cv2.putText(image, label, (left, top - 12), font, fontSize,
-                        self.colors[c], thickness)
-        return image
+            image_data.append(np.array(boxed_image, dtype='float32') / 255.)
+        return np.stack(image_data)
+
+    def detect(self, image):
+        """
+        Run the detection on a single frame.
+
+        :return: (out_boxes, out_scores, out_classes), boxes as (top, left,
+        bottom, right) in pixels of image.
+        """
+        with self.timer.stage('preprocess'):
+            image_data = self.preprocess([image])
+
+        if self.postprocess == 'numpy':
+            with self.timer.stage('inference'):
+                yolo_outputs = self.sess.run(self.outputs,
+                                             feed_dict=self._feed(image_data))
+            with self.timer.stage('postprocess'):
+                out_boxes, out_scores, out_classes = yolo_eval_np(
+                    yolo_outputs, self.anchors, len(self.class_names), None,
+                    score_threshold=self.score, iou_threshold=self.iou)
+                geometry = get_geometry(image.shape[:2],
+                                        image_data.shape[1:3])
+                return geometry.unproject(out_boxes), out_scores, out_classes
+
+        # The graph postprocess runs within the session call.
+        with self.timer.stage('inference'):
+            return self.sess.run(
+                [self.boxes, self.scores, self.classes],
+                feed_dict=self._feed(image_data, {
+                    self.input_image_shape: [image.shape[0], image.shape[1]]
+                }))
+
+    def detect_image(self, image):
+        return self.draw(image, *self.detect(image))
+
+    def detect_batch(self, frames):
+        """
+        Run the detection on several frames with a single session call.
+
+        Parameters
+        ----------
+        :param frames: list of numpy arrays, BGR frames. With a variable
+        model_image_size all the frames must have the same shape.
+        :return: list with one (out_boxes, out_scores, out_classes) tuple per
+        frame, in the same order as frames.
+        """
+        with self.timer.stage('preprocess'):
+            image_data = self.preprocess(frames)
+        image_shapes = [frame.shape[:2] for frame in frames]
+
+        if self.postprocess == 'numpy':
+            with self.timer.stage('inference'):
+                yolo_outputs = self.sess.run(self.outputs,
+                                             feed_dict=self._feed(image_data))
+            with self.timer.stage('postprocess'):
+                detections = yolo_eval_batch_np(
+                    yolo_outputs, self.anchors, len(self.class_names), None,
+                    score_threshold=self.score, iou_threshold=self.iou)
+                return [(get_geometry(image_shape,
+                                      image_data.shape[1:3]).unproject(boxes),
+                         scores, classes)
+                        for image_shape, (boxes, scores, classes)
+                        in zip(image_shapes, detections)]
+
+        if not hasattr(self, 'batch_boxes'):
+            self._generate_batch()
+
+        with self.timer.stage('inference'):
+            out_boxes, out_scores, out_classes, out_index = self.sess.run(
+                [self.batch_boxes, self.batch_scores, self.batch_classes,
+                 self.batch_index],
+                feed_dict=self._feed(image_data, {
+                    self.input_image_shapes: image_shapes
+                }))
+
+        # Split the detections back per frame.
+        with self.timer.stage('postprocess'):
+            detections = []
+            for b in range(len(frames)):
+                mask = out_index == b
+                detections.append((out_boxes[mask], out_scores[mask],
+                                   out_classes[mask]))
+        return detections
+
+    def draw(self, image, out_boxes, out_scores, out_classes):
+        return self.renderer(image, out_boxes, out_scores, out_classes)
 
     def close_session(self):
         self.sess.close()
 
-def yolo_v3(yolo, video_path, output_path=""):
+def yolo_v3(yolo, video_path, output_path="", queue_size=QUEUE_SIZE,
+            queue_policy=None, tracker=None, detect_every=1,
+            writer_policy=None):
+    """
+    Run YOLOv3 on one or several video feeds with a single loaded model.
+
+    Parameters
+    ----------
+    :param yolo: YOLO, the detector shared by all the feeds.
+    :param video_path: str or list of str, 0 for webcam, url for streaming or
+    path to a video file. Frames of several feeds are read round-robin and
+    grouped in batches of yolo.batch_size frames.
+    :param output_path: str, directory where the annotated videos are stored,
+    output.avi for one feed or output_<i>.avi for the i-th of several feeds.
+    :param queue_size: int, frames buffered per feed.
+    :param queue_policy: str, overflow policy of the frame buffers, None
+    for drop_oldest on live feeds and block on files.
+    :param tracker: str, type of tracker run after the detection on every
+    feed (see obj_track.tracking.trackers.TRACKERS), None to only detect.
+    :param detect_every: int, run the network on one frame out of
+    detect_every per feed and shift the boxes with optical flow in between.
+    :param writer_policy: str, overflow policy of the output video queues,
+    None for drop_oldest on live feeds and block on files.
+    """
     import cv2
     # -----------------------------------------------------------------------#
     #                          Configure OpenCV                              #
     # ------------------------------------------q-----------------------------#
-    if video_path == '0':
-        video_path = 0
+    video_paths = video_path if isinstance(video_path, list) else [video_path]
+    video_paths = [0 if path == '0' else path for path in video_paths]
 
-    vid = cv2.VideoCapture(video_path)
+    vid = MultiFrameReader(video_paths, queue_size=queue_size,
+                           policy=queue_policy).start()
 
     # todo-paola: add show option to parser
     show = False
 
     # if http address is not reachable assertion error will be raised
-    assert vid.isOpened(), "Couldn't open video source"
+    for reader in vid.readers:
+        assert reader.isOpened(), "Couldn't open video source {}".format(
+            reader.source)
+
+    # A ParallelDetector sizes its shared frame slots for the largest feed.
+    if hasattr(yolo, 'reserve'):
+        for reader in vid.readers:
+            frame_shape = capture_frame_shape(reader)
+            if frame_shape is not None:
+                yolo.reserve(frame_shape)
+
+    trackers = [create_tracker(tracker) for _ in vid.readers] \
+        if tracker else []
+    # Keyframe mode, boxes are propagated on the frames between detections.
+    frame_counts = [0] * len(vid)
+    propagators = [BoxPropagator() for _ in vid.readers] \
+        if detect_every > 1 else []
 
     video_FourCC = cv2.VideoWriter_fourcc(*'XVID')
-    video_fps = vid.get(cv2.CAP_PROP_FPS)
-    video_size = (int(vid.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                  int(vid.get(cv2.CAP_PROP_FRAME_HEIGHT)))
-    isOutput = True if output_path != "" else False
+    isOutput = True if output_path else False
+    outs = []
     if isOutput:
-        # print("!!! TYPE:", type(output_path), type(video_FourCC),
-        #       type(video_fps), type(video_size))
-        out = cv2.VideoWriter(output_path+"/output.avi", video_FourCC,
-                              video_fps, video_size)
+        # Frame rate measured on the first frames if the source does not
+        # report it, the writers wait for it.
+        props = [VideoProps(reader) for reader in vid.readers]
+        for i, reader in enumerate(vid.readers):
+            video_filename = "/output.avi" if len(vid) == 1 else \
+                "/output_{}.avi".format(i)
+            outs.append(AsyncVideoWriter(
+                output_path + video_filename, video_FourCC, props[i].get_fps,
+                policy=source_policy(reader.source, writer_policy)))
     accum_time = 0
     curr_fps = 0
     fps = "FPS: ??"
     prev_time = timer()
-    while vid.isOpened():
-        return_value, frame = vid.read()
-        if frame is None:
+    stop = False
+    stage = yolo.timer.stage
+    while vid.isOpened() and not stop:
+        # Gather up to batch_size frames, the last batch may be shorter.
+        with stage('capture'):
+            batch = vid.read_batch(yolo.batch_size)
+        if not batch:
             print('\nEnd of Video')
             break
-        image = yolo.detect_image(frame)
-        curr_time = timer()
-        exec_time = curr_time - prev_time
-        prev_time = curr_time
-        accum_time = accum_time + exec_time
-        curr_fps = curr_fps + 1
-        if accum_time > 1:
-            accum_time = accum_time - 1
-            fps = "FPS: " + str(curr_fps)
-            curr_fps = 0
-        cv2.putText(image, text=fps, org=(3, 15),
-                    fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.50,
-                    color=(255, 0, 0), thickness=2)
-        if show:
-            cv2.namedWindow("result", cv2.WINDOW_NORMAL)
-            cv2.imshow("result", image)
-        if isOutput:
-            out.write(image)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        indices, frames = zip(*batch)
+        # Only the keyframes of every feed go through the network.
+        is_keyframe = []
+        for i in indices:
+            is_keyframe.append(frame_counts[i] % detect_every == 0)
+            frame_counts[i] += 1
+        keyframes = [frame for frame, key in zip(frames, is_keyframe) if key]
+        if len(keyframes) > 1:
+            detections = iter(yolo.detect_batch(keyframes))
+        else:
+            detections = iter([yolo.detect(frame) for frame in keyframes])
+        for i, frame, key in zip(indices, frames, is_keyframe):
+            if key:
+                out_boxes, out_scores, out_classes = next(detections)
+                if propagators:
+                    propagators[i].reset(frame, out_boxes, out_scores,
+                                         out_classes)
+            else:
+                out_boxes, out_scores, out_classes = \
+                    propagators[i].propagate(frame)
+            with stage('draw'):
+                image = yolo.draw(frame, out_boxes, out_scores, out_classes)
+            if trackers:
+                ids, track_boxes, _, _ = trackers[i].update(
+                    out_boxes, out_scores, out_classes)
+                draw_tracks(image, ids, track_boxes)
+            curr_time = timer()
+            exec_time = curr_time - prev_time
+            prev_time = curr_time
+            accum_time = accum_time + exec_time
+            curr_fps = curr_fps + 1
+            if accum_time > 1:
+                accum_time = accum_time - 1
+                fps = "FPS: " + str(curr_fps)
+                curr_fps = 0
+            cv2.putText(image, text=fps, org=(3, 15),
+                        fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.50,
+                        color=(255, 0, 0), thickness=2)
+            if show:
+                cv2.namedWindow("result {}".format(i), cv2.WINDOW_NORMAL)
+                cv2.imshow("result {}".format(i), image)
+            if isOutput:
+                props[i].update(image)
+                with stage('write'):
+                    outs[i].write(image)
+            yolo.timer.frame()
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                stop = True
+                break
+    vid.release()
+    for out in outs:
+        out.release()
+        print('Writer stats: {}'.format(out.stats()))
+    if yolo.timings:
+        yolo.timer.export()
+    print('Stage latencies: {}'.format(yolo.timer))
     yolo.close_session()
-    print('Job finished')
\ No newline at end of file
+    print('Job finished')
@@ -0,0 +1 @@
+name = "tracking"
\ No newline at end of file
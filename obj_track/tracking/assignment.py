@@ -0,0 +1,96 @@
+"""
+Vectorized association of tracks and detections.
+
+Boxes follow the convention of ``yolo_eval``: one row per box with the
+corners (top, left, bottom, right) in pixels.
+"""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Cost given to forbidden pairs, linear_sum_assignment does not accept inf.
+_LARGE_COST = 1e9
+
+
+def box_centroids(boxes):
+    """Return the (x, y) centre of every box, shape=(n, 2)."""
+    boxes = np.asarray(boxes, dtype='float32').reshape(-1, 4)
+    return np.stack([(boxes[:, 1] + boxes[:, 3]) / 2.,
+                     (boxes[:, 0] + boxes[:, 2]) / 2.], axis=-1)
+
+
+def pairwise_distance(boxes_a, boxes_b):
+    """Euclidean distance between the centroids of every pair of boxes.
+
+    :return: array, shape=(len(boxes_a), len(boxes_b))
+    """
+    centroids_a = box_centroids(boxes_a)
+    centroids_b = box_centroids(boxes_b)
+    diff = centroids_a[:, None, :] - centroids_b[None, :, :]
+    return np.sqrt(np.sum(diff * diff, axis=-1))
+
+
+def pairwise_iou(boxes_a, boxes_b):
+    """Intersection over union of every pair of boxes.
+
+    :return: array, shape=(len(boxes_a), len(boxes_b))
+    """
+    boxes_a = np.asarray(boxes_a, dtype='float32').reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype='float32').reshape(-1, 4)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    intersect_hw = np.maximum(np.minimum(a[..., 2:4], b[..., 2:4]) -
+                              np.maximum(a[..., 0:2], b[..., 0:2]), 0.)
+    intersect_area = intersect_hw[..., 0] * intersect_hw[..., 1]
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union_area = area_a + area_b - intersect_area
+    return np.where(union_area > 0,
+                    intersect_area / np.maximum(union_area, 1e-9), 0.)
+
+
+def hungarian_assignment(cost, max_cost):
+    """Optimal one to one assignment minimizing the total cost.
+
+    :param cost: array, shape=(n, m), inf marks forbidden pairs.
+    :param max_cost: float, pairs costing more are left unmatched.
+    :return: (rows, cols) arrays of the matched pairs.
+    """
+    if cost.size == 0:
+        return np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+    # Gated before solving, an optimal assignment made of pairs over
+    # max_cost must not hide the pairs under it.
+    rows, cols = linear_sum_assignment(
+        np.where(cost > max_cost, _LARGE_COST, cost))
+    keep = cost[rows, cols] <= max_cost
+    return rows[keep], cols[keep]
+
+
+def greedy_assignment(cost, max_cost):
+    """Repeatedly match the cheapest remaining pair.
+
+    Cheaper than the hungarian method and usually as good when objects are
+    well separated. Every iteration is one O(n*m) array operation.
+
+    :param cost: array, shape=(n, m), inf marks forbidden pairs.
+    :param max_cost: float, pairs costing more are left unmatched.
+    :return: (rows, cols) arrays of the matched pairs.
+    """
+    cost = np.array(cost, dtype='float64')
+    cost[cost > max_cost] = np.inf
+    rows = []
+    cols = []
+    for _ in range(min(cost.shape)):
+        index = np.argmin(cost)
+        row, col = np.unravel_index(index, cost.shape)
+        if not np.isfinite(cost[row, col]):
+            break
+        rows.append(row)
+        cols.append(col)
+        cost[row, :] = np.inf
+        cost[:, col] = np.inf
+    return np.array(rows, dtype='int64'), np.array(cols, dtype='int64')
+
+
+ASSIGNMENTS = {'hungarian': hungarian_assignment,
+               'greedy': greedy_assignment}
@@ -0,0 +1,53 @@
+"""Tests for obj_track.tracking.assignment."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.tracking.assignment import greedy_assignment, \
+    hungarian_assignment, pairwise_distance, pairwise_iou
+
+# Greedy takes the cheapest pair (0, 0) first and is left with (1, 1),
+# 1 + 100, the optimal assignment is (0, 1) and (1, 0), 2 + 2.
+COST = np.array([[1., 2.], [2., 100.]])
+
+
+class AssignmentTest(unittest.TestCase):
+
+    def test_hungarian_vs_greedy(self):
+        rows, cols = hungarian_assignment(COST, 1000.)
+        self.assertEqual(sorted(zip(rows, cols)), [(0, 1), (1, 0)])
+        rows, cols = greedy_assignment(COST, 1000.)
+        self.assertEqual(sorted(zip(rows, cols)), [(0, 0), (1, 1)])
+
+    def test_max_cost(self):
+        for assign in (hungarian_assignment, greedy_assignment):
+            rows, cols = assign(COST, 1.5)
+            self.assertEqual(list(zip(rows, cols)), [(0, 0)])
+
+    def test_forbidden_pairs(self):
+        cost = np.array([[np.inf, 1.], [np.inf, 2.]])
+        for assign in (hungarian_assignment, greedy_assignment):
+            rows, cols = assign(cost, 10.)
+            self.assertEqual(list(zip(rows, cols)), [(0, 1)])
+
+    def test_empty(self):
+        for assign in (hungarian_assignment, greedy_assignment):
+            for shape in ((0, 3), (3, 0), (0, 0)):
+                rows, cols = assign(np.zeros(shape), 1.)
+                self.assertEqual(len(rows), 0)
+                self.assertEqual(len(cols), 0)
+
+    def test_pairwise(self):
+        boxes_a = np.array([[0, 0, 10, 10]])
+        boxes_b = np.array([[0, 0, 10, 10], [0, 5, 10, 15], [20, 20, 30, 40]])
+        np.testing.assert_allclose(pairwise_iou(boxes_a, boxes_b),
+                                   [[1., 1. / 3., 0.]], rtol=1e-6)
+        np.testing.assert_allclose(pairwise_distance(boxes_a, boxes_b),
+                                   [[0., 5., np.hypot(25., 20.)]], rtol=1e-6)
+        self.assertEqual(pairwise_iou(boxes_a, np.empty((0, 4))).shape,
+                         (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
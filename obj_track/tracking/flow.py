@@ -0,0 +1,93 @@
+"""
+Cheap box propagation between keyframes.
+
+The detector only runs every K frames. On the frames in between the boxes of
+the last keyframe are shifted by the median optical flow of a grid of points
+sampled inside every box, all boxes in one ``cv2.calcOpticalFlowPyrLK`` call.
+"""
+
+import warnings
+
+import cv2
+import numpy as np
+
+
+class BoxPropagator(object):
+    """
+    Shift the detections of the last keyframe to the following frames with
+    sparse Lucas-Kanade optical flow.
+
+    Parameters
+    ----------
+    :param grid: int, the flow is tracked on grid x grid points per box.
+    :param max_width: int, frames wider than this are downscaled before
+    computing the flow.
+    """
+    def __init__(self, grid=4, max_width=480):
+        self.grid = grid
+        self.max_width = max_width
+        # Relative position of the sampled points, away from the box borders.
+        self.steps = np.linspace(0.2, 0.8, grid, dtype='float32')
+        self.prev_gray = None
+        self.scale = 1.
+        self.boxes = np.empty((0, 4), dtype='float32')
+        self.scores = np.empty(0, dtype='float32')
+        self.classes = np.empty(0, dtype='int32')
+
+    def _gray(self, frame):
+        height, width = frame.shape[:2]
+        self.scale = min(1., self.max_width / float(width))
+        if self.scale < 1.:
+            frame = cv2.resize(frame, (int(width * self.scale),
+                                       int(height * self.scale)),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _points(self):
+        # (n, grid * grid, 2) x, y points inside every box.
+        top, left, bottom, right = [self.boxes[:, k:k + 1] for k in range(4)]
+        xs = left + (right - left) * self.steps[None, :]
+        ys = top + (bottom - top) * self.steps[None, :]
+        xs = np.repeat(xs, self.grid, axis=1)
+        ys = np.tile(ys, (1, self.grid))
+        return np.stack([xs, ys], axis=-1) * self.scale
+
+    def reset(self, frame, out_boxes, out_scores, out_classes):
+        """Start from the detections of a keyframe."""
+        self.prev_gray = self._gray(frame)
+        self.boxes = np.asarray(out_boxes, dtype='float32').reshape(-1, 4)
+        self.scores = np.asarray(out_scores, dtype='float32').reshape(-1)
+        self.classes = np.asarray(out_classes, dtype='int32').reshape(-1)
+
+    def propagate(self, frame):
+        """
+        Move the boxes to a new frame.
+
+        :return: (out_boxes, out_scores, out_classes) in the format of
+        yolo_eval, scores and classes are the ones of the last keyframe.
+        """
+        gray = self._gray(frame)
+        if len(self.boxes) and self.prev_gray is not None:
+            points = self._points()
+            num_boxes, num_points, _ = points.shape
+            flat_points = points.reshape(-1, 1, 2)
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_gray, gray, flat_points, None, winSize=(15, 15),
+                maxLevel=2)
+            shift = (new_points - flat_points).reshape(num_boxes, num_points,
+                                                       2)
+            shift[status.reshape(num_boxes, num_points) == 0] = np.nan
+            # Median is robust to points on the background, boxes that lost
+            # all their points stay in place.
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                shift = np.nanmedian(shift, axis=1)
+            shift = np.nan_to_num(shift) / self.scale
+            dx = shift[:, 0:1]
+            dy = shift[:, 1:2]
+            self.boxes = self.boxes + np.concatenate([dy, dx, dy, dx], axis=1)
+            height, width = frame.shape[:2]
+            np.clip(self.boxes, 0, [height, width, height, width],
+                    out=self.boxes)
+        self.prev_gray = gray
+        return self.boxes, self.scores, self.classes
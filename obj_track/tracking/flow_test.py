@@ -0,0 +1,64 @@
+"""Tests for obj_track.tracking.flow."""
+
+import unittest
+
+import cv2
+import numpy as np
+
+from obj_track.tracking.flow import BoxPropagator
+
+BOXES = np.array([[40, 60, 120, 160], [150, 300, 220, 400]], dtype='float32')
+SCORES = np.array([.9, .7])
+CLASSES = np.array([2, 5])
+
+
+def textured_frame(height=300, width=500, seed=0):
+    """Smoothed noise, trackable everywhere by Lucas-Kanade."""
+    rng = np.random.RandomState(seed)
+    noise = rng.randint(0, 256, size=(height, width, 3)).astype('uint8')
+    return cv2.GaussianBlur(noise, (5, 5), 1.5)
+
+
+class BoxPropagatorTest(unittest.TestCase):
+
+    def check_shift(self, propagator, frame, dx, dy):
+        # Content moved by (dx, dy), the borders wrap around.
+        shifted = np.roll(frame, (dy, dx), axis=(0, 1))
+        propagator.reset(frame, BOXES, SCORES, CLASSES)
+        boxes, scores, classes = propagator.propagate(shifted)
+        np.testing.assert_allclose(boxes, BOXES + [dy, dx, dy, dx],
+                                   atol=0.5)
+        np.testing.assert_allclose(scores, SCORES)
+        np.testing.assert_array_equal(classes, CLASSES)
+
+    def test_known_shift(self):
+        frame = textured_frame()
+        self.check_shift(BoxPropagator(), frame, 6, -4)
+
+    def test_downscaled(self):
+        # Flow computed at half resolution, boxes still in pixels.
+        frame = cv2.resize(textured_frame(), (1000, 600))
+        self.check_shift(BoxPropagator(max_width=500), frame, 8, 6)
+
+    def test_clipped(self):
+        frame = textured_frame()
+        propagator = BoxPropagator()
+        propagator.reset(frame, [[0, 0, 50, 50]], [.5], [0])
+        boxes, _, _ = propagator.propagate(np.roll(frame, (-5, -5),
+                                                   axis=(0, 1)))
+        self.assertTrue((boxes >= 0).all())
+
+    def test_no_boxes(self):
+        frame = textured_frame()
+        propagator = BoxPropagator()
+        propagator.reset(frame, np.empty((0, 4)), [], [])
+        boxes, scores, classes = propagator.propagate(frame)
+        self.assertEqual(boxes.shape, (0, 4))
+        self.assertEqual(len(scores), 0)
+        # No keyframe yet, nothing to move.
+        boxes, _, _ = BoxPropagator().propagate(frame)
+        self.assertEqual(boxes.shape, (0, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
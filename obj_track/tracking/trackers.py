@@ -0,0 +1,139 @@
+"""
+Multi-object trackers fed with the output of the detectors.
+
+Idea taken from
+https://www.pyimagesearch.com/2018/07/23/simple-object-tracking-with-opencv/
+with the association between tracks and detections done on whole cost
+matrices instead of Python loops.
+"""
+
+import numpy as np
+
+from .assignment import ASSIGNMENTS, pairwise_distance, pairwise_iou
+
+
+class Tracker(object):
+    """
+    Base tracker keeping the state of all the tracks in NumPy arrays.
+
+    Subclasses only define the cost of matching every track with every
+    detection in ``cost`` and the largest acceptable cost in ``max_cost``.
+
+    Parameters
+    ----------
+    :param max_disappeared: int, number of consecutive frames a track may go
+    unmatched before it is deleted.
+    :param method: str, assignment method, hungarian or greedy.
+    :param class_aware: bool, only match detections of the same class.
+    """
+    max_cost = np.inf
+
+    def __init__(self, max_disappeared=50, method='hungarian',
+                 class_aware=True):
+        if method not in ASSIGNMENTS:
+            raise ValueError("Assignment method not valid. Valid options: "
+                             "{}".format(', '.join(ASSIGNMENTS)))
+        self.max_disappeared = max_disappeared
+        self.assign = ASSIGNMENTS[method]
+        self.class_aware = class_aware
+        self.next_id = 0
+        self.ids = np.empty(0, dtype='int64')
+        self.boxes = np.empty((0, 4), dtype='float32')
+        self.scores = np.empty(0, dtype='float32')
+        self.classes = np.empty(0, dtype='int32')
+        self.disappeared = np.empty(0, dtype='int32')
+
+    def cost(self, track_boxes, boxes):
+        raise NotImplementedError
+
+    def update(self, out_boxes, out_scores, out_classes):
+        """
+        Associate the detections of a new frame with the current tracks.
+
+        Parameters
+        ----------
+        :param out_boxes: array, shape=(n, 4), (top, left, bottom, right) as
+        returned by yolo_eval.
+        :param out_scores: array, shape=(n,)
+        :param out_classes: array, shape=(n,)
+        :return: (ids, boxes, scores, classes) of the tracks matched in this
+        frame.
+        """
+        boxes = np.asarray(out_boxes, dtype='float32').reshape(-1, 4)
+        scores = np.asarray(out_scores, dtype='float32').reshape(-1)
+        classes = np.asarray(out_classes, dtype='int32').reshape(-1)
+
+        cost = self.cost(self.boxes, boxes)
+        if self.class_aware:
+            cost[self.classes[:, None] != classes[None, :]] = np.inf
+        rows, cols = self.assign(cost, self.max_cost)
+
+        # Matched tracks take the new detection.
+        self.boxes[rows] = boxes[cols]
+        self.scores[rows] = scores[cols]
+        self.classes[rows] = classes[cols]
+        unmatched = np.ones(len(self.ids), dtype='bool')
+        unmatched[rows] = False
+        self.disappeared[unmatched] += 1
+        self.disappeared[rows] = 0
+
+        # Forget the tracks lost for too long.
+        keep = self.disappeared <= self.max_disappeared
+        # Unmatched detections start new tracks.
+        new = np.ones(len(boxes), dtype='bool')
+        new[cols] = False
+        num_new = int(np.count_nonzero(new))
+        new_ids = np.arange(self.next_id, self.next_id + num_new)
+        self.next_id += num_new
+
+        self.ids = np.concatenate([self.ids[keep], new_ids])
+        self.boxes = np.concatenate([self.boxes[keep], boxes[new]])
+        self.scores = np.concatenate([self.scores[keep], scores[new]])
+        self.classes = np.concatenate([self.classes[keep], classes[new]])
+        self.disappeared = np.concatenate(
+            [self.disappeared[keep], np.zeros(num_new, dtype='int32')])
+
+        visible = self.disappeared == 0
+        return (self.ids[visible], self.boxes[visible], self.scores[visible],
+                self.classes[visible])
+
+
+class CentroidTracker(Tracker):
+    """
+    Match tracks and detections by the distance between their centroids.
+
+    :param max_distance: float, largest distance in pixels between the
+    centroid of a track and the centroid of its next detection.
+    """
+    def __init__(self, max_distance=100., **kwargs):
+        super(CentroidTracker, self).__init__(**kwargs)
+        self.max_cost = max_distance
+
+    def cost(self, track_boxes, boxes):
+        return pairwise_distance(track_boxes, boxes)
+
+
+class IouTracker(Tracker):
+    """
+    Match tracks and detections by the overlap of their boxes.
+
+    :param min_iou: float, smallest intersection over union between a track
+    and its next detection.
+    """
+    def __init__(self, min_iou=0.3, **kwargs):
+        super(IouTracker, self).__init__(**kwargs)
+        self.max_cost = 1. - min_iou
+
+    def cost(self, track_boxes, boxes):
+        return 1. - pairwise_iou(track_boxes, boxes)
+
+
+TRACKERS = {'centroid': CentroidTracker, 'iou': IouTracker}
+
+
+def create_tracker(name, **kwargs):
+    """Return a new tracker of the given type, see TRACKERS."""
+    if name not in TRACKERS:
+        raise ValueError("Tracker type not valid. Valid options: "
+                         "{}".format(', '.join(TRACKERS)))
+    return TRACKERS[name](**kwargs)
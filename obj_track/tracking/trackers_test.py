@@ -0,0 +1,107 @@
+"""Tests for obj_track.tracking.trackers."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.tracking.trackers import CentroidTracker, IouTracker, \
+    create_tracker
+
+BOXES = np.array([[0, 0, 20, 20], [100, 100, 140, 160]], dtype='float32')
+SCORES = np.array([.9, .8])
+CLASSES = np.array([0, 1])
+NO_BOXES = np.empty((0, 4))
+NO_VALUES = np.empty(0)
+
+
+class TrackerTest(unittest.TestCase):
+
+    def test_ids_persist(self):
+        for name in ('centroid', 'iou'):
+            tracker = create_tracker(name)
+            ids, _, _, _ = tracker.update(BOXES, SCORES, CLASSES)
+            self.assertEqual(list(ids), [0, 1])
+            # Same objects moved a little, detected in the other order.
+            ids, boxes, _, classes = tracker.update(BOXES[::-1] + 2,
+                                                    SCORES[::-1],
+                                                    CLASSES[::-1])
+            self.assertEqual(list(ids), [0, 1])
+            np.testing.assert_array_equal(boxes, BOXES + 2)
+            self.assertEqual(list(classes), [0, 1])
+
+    def test_max_disappeared(self):
+        tracker = CentroidTracker(max_disappeared=2)
+        tracker.update(BOXES, SCORES, CLASSES)
+        for _ in range(2):
+            ids, _, _, _ = tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+            self.assertEqual(list(ids), [0])
+            # Track 1 is not visible but still kept.
+            self.assertEqual(list(tracker.ids), [0, 1])
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        self.assertEqual(list(tracker.ids), [0])
+        # A track kept while unmatched is found again.
+        tracker = CentroidTracker(max_disappeared=2)
+        tracker.update(BOXES, SCORES, CLASSES)
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        ids, _, _, _ = tracker.update(BOXES, SCORES, CLASSES)
+        self.assertEqual(list(ids), [0, 1])
+
+    def test_max_distance(self):
+        tracker = CentroidTracker(max_distance=10.)
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        ids, _, _, _ = tracker.update(BOXES[:1] + 5, SCORES[:1],
+                                      CLASSES[:1])
+        self.assertEqual(list(ids), [0])
+        # Centroid moved by 20 * sqrt(2), a new object.
+        ids, _, _, _ = tracker.update(BOXES[:1] + 25, SCORES[:1],
+                                      CLASSES[:1])
+        self.assertEqual(list(ids), [1])
+
+    def test_min_iou(self):
+        tracker = IouTracker(min_iou=0.5)
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        # IoU of 20 x 18 over 20 x 22, matched.
+        ids, _, _, _ = tracker.update(BOXES[:1] + [0, 2, 0, 2], SCORES[:1],
+                                      CLASSES[:1])
+        self.assertEqual(list(ids), [0])
+        # IoU of 20 x 8 over 20 x 32, new track.
+        ids, _, _, _ = tracker.update(BOXES[:1] + [0, 14, 0, 14], SCORES[:1],
+                                      CLASSES[:1])
+        self.assertEqual(list(ids), [1])
+
+    def test_class_aware(self):
+        tracker = IouTracker()
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        ids, _, _, _ = tracker.update(BOXES[:1], SCORES[:1], [1])
+        self.assertEqual(list(ids), [1])
+        tracker = IouTracker(class_aware=False)
+        tracker.update(BOXES[:1], SCORES[:1], CLASSES[:1])
+        ids, _, _, classes = tracker.update(BOXES[:1], SCORES[:1], [1])
+        self.assertEqual(list(ids), [0])
+        self.assertEqual(list(classes), [1])
+
+    def test_empty_frames(self):
+        for name in ('centroid', 'iou'):
+            tracker = create_tracker(name)
+            # No track and no detection.
+            ids, boxes, scores, classes = tracker.update(NO_BOXES, NO_VALUES,
+                                                         NO_VALUES)
+            self.assertEqual(len(ids), 0)
+            self.assertEqual(boxes.shape, (0, 4))
+            # No track yet, every detection starts one.
+            ids, _, _, _ = tracker.update(BOXES, SCORES, CLASSES)
+            self.assertEqual(list(ids), [0, 1])
+            # Tracks but no detection.
+            ids, _, _, _ = tracker.update(NO_BOXES, NO_VALUES, NO_VALUES)
+            self.assertEqual(len(ids), 0)
+            self.assertEqual(list(tracker.disappeared), [1, 1])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            create_tracker('kalman')
+        with self.assertRaises(ValueError):
+            CentroidTracker(method='auction')
+
+
+if __name__ == '__main__':
+    unittest.main()
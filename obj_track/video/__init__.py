@@ -0,0 +1 @@
+name = "video"
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Bounded frame queues shared by the capture and writer stages."""
+
+import queue
+
+# Policies applied when a producer finds the queue full.
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+POLICIES = (BLOCK, DROP_OLDEST)
+# Decoded frames buffered per source by default. A few frames absorb the
+# decoding jitter; more only add lag on live feeds and memory per source.
+QUEUE_SIZE = 8
+
+
+def is_live(source):
+    """True for webcams (device index) and network streams, False for
+    video files."""
+    if isinstance(source, int) or str(source).isdigit():
+        return True
+    return '://' in str(source)
+
+
+def source_policy(source, policy=None):
+    """
+    Overflow policy for the frames of source, policy if given, otherwise
+    ``drop_oldest`` for live sources and ``block`` for files.
+    """
+    if policy is not None:
+        return policy
+    return DROP_OLDEST if is_live(source) else BLOCK
+
+
+class FrameQueue(queue.Queue):
+    """
+    Bounded FIFO of frames with a configurable overflow policy.
+
+    With ``block`` the producer waits until the consumer frees a slot, so no
+    frame is ever lost. With ``drop_oldest`` the oldest queued frame is
+    discarded to make room, which keeps live sources (webcams, streams)
+    close to real time when the consumer is slower than the producer.
+
+    Parameters
+    ----------
+    :param maxsize: int, maximum number of frames held in the queue.
+    :param policy: str, one of ``POLICIES``.
+    """
+    def __init__(self, maxsize=64, policy=BLOCK):
+        if policy not in POLICIES:
+            raise ValueError("Queue policy not valid. Valid options: "
+                             "{}".format(', '.join(POLICIES)))
+        if maxsize < 1:
+            raise ValueError("Queue size must be at least 1")
+        super(FrameQueue, self).__init__(maxsize=maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put_frame(self, frame, timeout=None):
+        """
+        Enqueue a frame following the overflow policy.
+
+        :param frame: item to enqueue (``None`` is used as end marker).
+        :param timeout: float, only used by the ``block`` policy. If given,
+        ``queue.Full`` is raised when no slot frees up in time.
+        """
+        if self.policy == BLOCK:
+            self.put(frame, timeout=timeout)
+        else:
+            while True:
+                try:
+                    self.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        self.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        self.max_depth = max(self.max_depth, self.qsize())
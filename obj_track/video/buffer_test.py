@@ -0,0 +1,52 @@
+"""Tests for obj_track.video.buffer."""
+
+import queue
+import unittest
+
+from obj_track.video.buffer import FrameQueue, BLOCK, DROP_OLDEST, \
+    source_policy
+
+
+class FrameQueueTest(unittest.TestCase):
+
+    def test_block(self):
+        frames = FrameQueue(maxsize=2, policy=BLOCK)
+        frames.put_frame(0)
+        frames.put_frame(1)
+        with self.assertRaises(queue.Full):
+            frames.put_frame(2, timeout=0.01)
+        self.assertEqual([frames.get(), frames.get()], [0, 1])
+        self.assertEqual(frames.dropped, 0)
+        self.assertEqual(frames.max_depth, 2)
+
+    def test_drop_oldest(self):
+        frames = FrameQueue(maxsize=2, policy=DROP_OLDEST)
+        for frame in range(5):
+            frames.put_frame(frame)
+        # The newest frames are kept.
+        self.assertEqual([frames.get(), frames.get()], [3, 4])
+        self.assertEqual(frames.dropped, 3)
+        self.assertEqual(frames.max_depth, 2)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            FrameQueue(policy='drop_newest')
+        with self.assertRaises(ValueError):
+            FrameQueue(maxsize=0)
+
+
+class SourcePolicyTest(unittest.TestCase):
+
+    def test_by_source(self):
+        for source in (0, '1', 'rtsp://camera/stream', 'http://host/feed'):
+            self.assertEqual(source_policy(source), DROP_OLDEST)
+        for source in ('video.mp4', '/data/clips/0.avi'):
+            self.assertEqual(source_policy(source), BLOCK)
+
+    def test_explicit(self):
+        self.assertEqual(source_policy(0, BLOCK), BLOCK)
+        self.assertEqual(source_policy('video.mp4', DROP_OLDEST), DROP_OLDEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
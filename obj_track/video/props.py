@@ -0,0 +1,85 @@
+"""
+Frame rate of a video source, known without reading frames ahead.
+
+Files and most cameras report their frame rate through ``CAP_PROP_FPS``. When
+that value is missing or absurd (0, NaN, the 90 kHz clock of some streams)
+the rate is measured on the first frames the pipeline actually processes, no
+frame is read and thrown away before the first detection.
+"""
+
+import math
+from timeit import default_timer as timer
+
+import cv2
+
+DEFAULT_FPS = 30.
+# Frame rates outside of this range are not trusted.
+MIN_FPS = 1.
+MAX_FPS = 240.
+
+
+def capture_fps(capture):
+    """
+    Frame rate reported by a capture (cv2.VideoCapture or FrameReader).
+
+    :return: float, None if the capture does not report a plausible value.
+    """
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    if fps is None or math.isnan(fps) or not MIN_FPS <= fps <= MAX_FPS:
+        return None
+    return float(fps)
+
+
+def capture_frame_shape(capture):
+    """
+    Shape of the BGR frames of a capture (cv2.VideoCapture or FrameReader).
+
+    :return: tuple (height, width, 3), None if the capture does not report
+    its frame size.
+    """
+    width = capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+    height = capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    if not all(size and size > 0 for size in (width, height)):
+        return None
+    return int(height), int(width), 3
+
+
+class VideoProps(object):
+    """
+    Frame rate and frame size of a source.
+
+    The frame rate comes from the capture when it is valid, otherwise it is
+    estimated from the times update() is called on the first num_frames
+    frames. The frame size is the one of the first frame.
+
+    Parameters
+    ----------
+    :param capture: cv2.VideoCapture or FrameReader, None to always measure.
+    :param num_frames: int, number of frame intervals the frame rate is
+    measured on.
+    """
+    def __init__(self, capture=None, num_frames=30):
+        self.num_frames = num_frames
+        self.fps = capture_fps(capture) if capture is not None else None
+        self.frame_size = None
+        self.count = 0
+        self.start = None
+
+    def update(self, frame):
+        """Record a processed frame, (width, height) from the first one."""
+        if self.frame_size is None:
+            self.frame_size = (frame.shape[1], frame.shape[0])
+        if self.fps is not None:
+            return
+        now = timer()
+        if self.start is None:
+            self.start = now
+        else:
+            self.count += 1
+            if self.count >= self.num_frames:
+                fps = self.count / max(now - self.start, 1e-6)
+                self.fps = min(MAX_FPS, max(MIN_FPS, fps))
+
+    def get_fps(self):
+        """Frame rate, None while it is being measured."""
+        return self.fps
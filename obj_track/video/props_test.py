@@ -0,0 +1,90 @@
+"""Tests for obj_track.video.props and the lazy AsyncVideoWriter."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+from obj_track.video.props import VideoProps, capture_fps, \
+    capture_frame_shape, DEFAULT_FPS
+from obj_track.video.writer import AsyncVideoWriter
+
+
+class FakeCapture(object):
+
+    def __init__(self, fps, width=0., height=0.):
+        self.props = {cv2.CAP_PROP_FPS: fps, cv2.CAP_PROP_FRAME_WIDTH: width,
+                      cv2.CAP_PROP_FRAME_HEIGHT: height}
+
+    def get(self, prop_id):
+        return self.props.get(prop_id, 0.)
+
+
+class VideoPropsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_capture_fps(self):
+        self.assertEqual(capture_fps(FakeCapture(25.)), 25.)
+        for fps in (0., float('nan'), 90000., -1.):
+            self.assertIsNone(capture_fps(FakeCapture(fps)))
+
+    def test_capture_frame_shape(self):
+        self.assertEqual(capture_frame_shape(FakeCapture(25., 640., 480.)),
+                         (480, 640, 3))
+        for width, height in ((0., 480.), (640., 0.), (float('nan'), 480.),
+                              (-1., -1.)):
+            self.assertIsNone(capture_frame_shape(
+                FakeCapture(25., width, height)))
+
+    def test_reported_fps(self):
+        props = VideoProps(FakeCapture(25.))
+        self.assertEqual(props.get_fps(), 25.)
+        props.update(np.zeros((48, 64, 3), dtype='uint8'))
+        self.assertEqual(props.frame_size, (64, 48))
+
+    def test_measured_fps(self):
+        props = VideoProps(FakeCapture(0.), num_frames=3)
+        frame = np.zeros((48, 64, 3), dtype='uint8')
+        for _ in range(3):
+            props.update(frame)
+            self.assertIsNone(props.get_fps())
+            time.sleep(0.05)
+        props.update(frame)
+        self.assertTrue(10. < props.get_fps() < 21.)
+
+    def test_lazy_writer(self):
+        path = os.path.join(self.tmp_dir, 'out.avi')
+        props = VideoProps(num_frames=2)
+        writer = AsyncVideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'),
+                                  props.get_fps)
+        frame = np.zeros((48, 64, 3), dtype='uint8')
+        for _ in range(5):
+            props.update(frame)
+            writer.write(frame)
+        writer.release()
+        self.assertEqual(writer.stats()['written'], 5)
+        capture = cv2.VideoCapture(path)
+        self.assertEqual(capture.get(cv2.CAP_PROP_FRAME_WIDTH), 64)
+        self.assertEqual(capture.get(cv2.CAP_PROP_FRAME_COUNT), 5)
+
+    def test_writer_released_before_fps(self):
+        path = os.path.join(self.tmp_dir, 'out.avi')
+        writer = AsyncVideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'),
+                                  lambda: None)
+        writer.write(np.zeros((48, 64, 3), dtype='uint8'))
+        writer.release()
+        capture = cv2.VideoCapture(path)
+        self.assertEqual(capture.get(cv2.CAP_PROP_FPS), DEFAULT_FPS)
+
+
+if __name__ == '__main__':
+    unittest.main()
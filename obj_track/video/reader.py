@@ -0,0 +1,182 @@
+"""
+Threaded frame capture. Decoding runs on a background thread so that it
+overlaps with inference instead of serializing with it.
+"""
+
+import queue
+import threading
+
+import cv2
+
+from .buffer import FrameQueue, QUEUE_SIZE, source_policy
+
+# Properties of the source read before decoding starts, cv2.VideoCapture is
+# not thread safe and is only used by the decoding thread afterwards.
+PROPS = (cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_WIDTH,
+         cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FRAME_COUNT)
+
+
+class FrameReader(object):
+    """
+    Read frames from a ``cv2.VideoCapture`` source on a background thread
+    into a bounded queue.
+
+    The reader mimics the subset of the ``cv2.VideoCapture`` interface used by
+    the detectors (``isOpened``, ``read``, ``get`` and ``release``), so it can
+    be dropped in place of a capture object.
+
+    Parameters
+    ----------
+    :param source: int or str, 0 for webcam, url for streaming or path to a
+    video file.
+    :param queue_size: int, maximum number of decoded frames kept in memory.
+    :param policy: str, ``block`` to pause decoding while the queue is full
+    (no frame is lost, use it for files) or ``drop_oldest`` to discard the
+    oldest frame (stay real time, use it for live sources). None picks it
+    from the source, see ``source_policy``.
+    """
+    def __init__(self, source, queue_size=QUEUE_SIZE, policy=None):
+        self.source = source
+        self.capture = cv2.VideoCapture(source)
+        self.props = {prop_id: self.capture.get(prop_id)
+                      for prop_id in PROPS}
+        self.frames = FrameQueue(maxsize=queue_size,
+                                 policy=source_policy(source, policy))
+        self.stopped = False
+        self.finished = False
+        self.thread = threading.Thread(target=self._update, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _update(self):
+        try:
+            while not self.stopped:
+                ret, frame = self.capture.read()
+                if not ret or frame is None:
+                    break
+                self._put(frame)
+        finally:
+            # End of the source or decoding error, wake up the consumer.
+            self._put(None)
+
+    def _put(self, frame):
+        # Do not block forever on a full queue once release() was called.
+        while not self.stopped:
+            try:
+                self.frames.put_frame(frame, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def isOpened(self):
+        return not self.finished and self.capture.isOpened()
+
+    def read(self, timeout=None):
+        """
+        Get the next decoded frame.
+
+        :param timeout: float, seconds to wait for a frame, None to wait
+        until one is decoded.
+        :return: (bool, numpy array) like ``cv2.VideoCapture.read``,
+        (False, None) at the end of the source.
+        :raise queue.Empty: no frame was decoded within timeout.
+        """
+        if self.finished:
+            return False, None
+        frame = self.frames.get(timeout=timeout)
+        if frame is None:
+            self.finished = True
+            return False, None
+        return True, frame
+
+    def get(self, prop_id):
+        """
+        Property of the source read when the reader was created.
+
+        :param prop_id: int, one of ``PROPS``.
+        :return: float, 0 for other properties like ``cv2.VideoCapture`` does
+        for the properties a source does not support.
+        """
+        return self.props.get(prop_id, 0.)
+
+    @property
+    def dropped(self):
+        return self.frames.dropped
+
+    def release(self):
+        self.stopped = True
+        if self.thread.is_alive():
+            self.thread.join()
+        self.capture.release()
+
+
+class MultiFrameReader(object):
+    """
+    Read frames from several sources, each one decoded on its own
+    ``FrameReader`` thread, and hand them out round-robin so that a single
+    detector can serve all the feeds.
+
+    Parameters
+    ----------
+    :param sources: list of sources accepted by ``FrameReader``.
+    :param queue_size: int, queue size of every ``FrameReader``.
+    :param policy: str, overflow policy of every ``FrameReader``, None to
+    pick it per source.
+    """
+    def __init__(self, sources, queue_size=QUEUE_SIZE, policy=None):
+        self.readers = [FrameReader(source, queue_size=queue_size,
+                                    policy=policy) for source in sources]
+        # Next source to read from, so no feed starves when the batch is
+        # smaller than the number of sources.
+        self.cursor = 0
+
+    def start(self):
+        for reader in self.readers:
+            reader.start()
+        return self
+
+    def __len__(self):
+        return len(self.readers)
+
+    def isOpened(self):
+        return any(reader.isOpened() for reader in self.readers)
+
+    def read_batch(self, batch_size, timeout=0.01):
+        """
+        Get up to batch_size frames, taking one frame per source in turn.
+
+        Sources without a decoded frame are skipped, so a stalled or slow
+        feed does not hold up the others. The call only waits when no source
+        has a frame ready, timeout seconds on each source in turn.
+
+        :return: list of (source index, frame) tuples, empty when all the
+        sources are exhausted.
+        """
+        batch = []
+        wait = 0.
+        while len(batch) < batch_size and self.isOpened():
+            progress = False
+            for _ in range(len(self.readers)):
+                if len(batch) >= batch_size:
+                    break
+                index = self.cursor
+                self.cursor = (self.cursor + 1) % len(self.readers)
+                reader = self.readers[index]
+                if not reader.isOpened():
+                    continue
+                try:
+                    ret, frame = reader.read(timeout=wait)
+                except queue.Empty:
+                    continue
+                progress = True
+                if ret:
+                    batch.append((index, frame))
+            # All the queues were empty, wait for the next frame.
+            wait = 0. if progress else timeout
+        return batch
+
+    def release(self):
+        for reader in self.readers:
+            reader.release()
@@ -0,0 +1,184 @@
+"""Tests for obj_track.video.reader."""
+
+import os
+import threading
+import shutil
+import tempfile
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+from obj_track.video.buffer import BLOCK, DROP_OLDEST, QUEUE_SIZE
+from obj_track.video.reader import FrameReader, MultiFrameReader
+
+NUM_FRAMES = 10
+
+
+def make_clip(path, num_frames=NUM_FRAMES, size=(64, 48)):
+    """Clip whose frame k is uniformly 20 * k grey."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25,
+                             size)
+    for k in range(num_frames):
+        writer.write(np.full((size[1], size[0], 3), 20 * k, dtype='uint8'))
+    writer.release()
+    return path
+
+
+class FailingCapture(object):
+    """Capture whose decoding raises after a few frames."""
+
+    def __init__(self, num_frames):
+        self.num_frames = num_frames
+
+    def read(self):
+        if not self.num_frames:
+            raise RuntimeError('decoding error')
+        self.num_frames -= 1
+        return True, np.zeros((48, 64, 3), dtype='uint8')
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class StalledCapture(object):
+    """Capture whose first read blocks until released."""
+
+    def __init__(self):
+        self.resume = threading.Event()
+
+    def read(self):
+        self.resume.wait()
+        return False, None
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        self.resume.set()
+
+
+class FrameReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.clip = make_clip(os.path.join(self.tmp_dir, 'clip.avi'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_all(self, reader, delay=0.):
+        frames = []
+        while reader.isOpened():
+            ret, frame = reader.read()
+            if not ret:
+                break
+            frames.append(frame)
+            time.sleep(delay)
+        return frames
+
+    def test_block(self):
+        reader = FrameReader(self.clip, queue_size=2, policy=BLOCK).start()
+        # The consumer is slower than the decoder, no frame is lost.
+        frames = self.read_all(reader, delay=0.01)
+        reader.release()
+        self.assertEqual(len(frames), NUM_FRAMES)
+        self.assertEqual([int(round(frame.mean() / 20.)) for frame in frames],
+                         list(range(NUM_FRAMES)))
+        self.assertEqual(reader.dropped, 0)
+
+    def test_drop_oldest(self):
+        reader = FrameReader(self.clip, queue_size=2,
+                             policy=DROP_OLDEST).start()
+        # Let the decoder run through the clip before reading.
+        reader.thread.join(timeout=5)
+        frames = self.read_all(reader)
+        reader.release()
+        self.assertGreater(reader.dropped, 0)
+        # Every frame is either read or counted as dropped.
+        self.assertEqual(len(frames) + reader.dropped, NUM_FRAMES)
+        self.assertEqual(int(round(frames[-1].mean() / 20.)), NUM_FRAMES - 1)
+
+    def test_defaults(self):
+        reader = FrameReader(self.clip)
+        self.assertEqual(reader.frames.maxsize, QUEUE_SIZE)
+        # Files do not lose frames.
+        self.assertEqual(reader.frames.policy, BLOCK)
+        reader.release()
+
+    def test_props(self):
+        reader = FrameReader(self.clip)
+        # Not asked to the capture while the decoding thread uses it.
+        reader.capture.release()
+        reader.capture = FailingCapture(3)
+        reader.start()
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_WIDTH), 64)
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_HEIGHT), 48)
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_COUNT), NUM_FRAMES)
+        self.assertEqual(reader.get(cv2.CAP_PROP_FPS), 25)
+        self.assertEqual(reader.get(cv2.CAP_PROP_POS_FRAMES), 0)
+        reader.release()
+
+    def test_end_of_stream(self):
+        reader = FrameReader(self.clip).start()
+        self.assertEqual(len(self.read_all(reader)), NUM_FRAMES)
+        self.assertEqual(reader.read(), (False, None))
+        self.assertFalse(reader.isOpened())
+        reader.release()
+
+    def test_decoding_error(self):
+        reader = FrameReader(self.clip)
+        reader.capture.release()
+        reader.capture = FailingCapture(3)
+        reader.start()
+        # The reader ends instead of blocking forever.
+        self.assertEqual(len(self.read_all(reader)), 3)
+        reader.release()
+
+
+class MultiFrameReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.clip = make_clip(os.path.join(self.tmp_dir, 'clip.avi'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_robin(self):
+        reader = MultiFrameReader([self.clip, self.clip]).start()
+        frames = []
+        while True:
+            batch = reader.read_batch(3)
+            if not batch:
+                break
+            frames += batch
+        reader.release()
+        self.assertEqual(len(frames), 2 * NUM_FRAMES)
+        for i in range(2):
+            self.assertEqual([int(round(frame.mean() / 20.))
+                              for index, frame in frames if index == i],
+                             list(range(NUM_FRAMES)))
+
+    def test_stalled_source(self):
+        reader = MultiFrameReader([self.clip, self.clip])
+        stalled = StalledCapture()
+        reader.readers[0].capture.release()
+        reader.readers[0].capture = stalled
+        reader.start()
+        # The frames of the other source keep coming.
+        frames = []
+        for _ in range(NUM_FRAMES):
+            frames += reader.read_batch(1)
+        self.assertEqual([index for index, _ in frames], [1] * NUM_FRAMES)
+        stalled.resume.set()
+        self.assertEqual(reader.read_batch(1), [])
+        reader.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
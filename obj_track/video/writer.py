@@ -0,0 +1,111 @@
+"""
+Asynchronous video sink. Encoding runs on a background thread so that long
+recordings do not eat into the detection frame rate.
+"""
+
+import threading
+import time
+
+import cv2
+
+from .buffer import FrameQueue, BLOCK
+from .props import DEFAULT_FPS
+
+
+class AsyncVideoWriter(object):
+    """
+    Encode frames with ``cv2.VideoWriter`` on a background thread fed by a
+    bounded queue.
+
+    The writer mimics the subset of the ``cv2.VideoWriter`` interface used by
+    the detectors (``isOpened``, ``write`` and ``release``). Frames are queued
+    by reference: the caller must not modify a frame after writing it.
+
+    Parameters
+    ----------
+    :param filename: str, path of the output video.
+    :param fourcc: int, codec as returned by ``cv2.VideoWriter_fourcc``.
+    :param fps: float, frame rate of the output video, or a callable
+    returning it, None while it is not known yet (see VideoProps.get_fps).
+    The frames are kept in the queue until it is known.
+    :param frame_size: tuple, (width, height) of the output video, None for
+    the size of the first frame.
+    :param queue_size: int, maximum number of frames waiting to be encoded.
+    :param policy: str, ``block`` to wait for the encoder when the queue is
+    full (lossless) or ``drop_oldest`` to discard the oldest pending frame
+    (never stalls the detector).
+    """
+    def __init__(self, filename, fourcc, fps=None, frame_size=None,
+                 queue_size=128, policy=BLOCK):
+        self.filename = filename
+        self.fourcc = fourcc
+        self.fps = fps
+        self.frame_size = frame_size
+        self.closing = False
+        # Opened by the encoding thread once the properties are known.
+        self.writer = None
+        if frame_size is not None and fps is not None and not callable(fps):
+            self.writer = cv2.VideoWriter(filename, fourcc, fps, frame_size)
+        self.frames = FrameQueue(maxsize=queue_size, policy=policy)
+        self.written = 0
+        self.thread = threading.Thread(target=self._update, daemon=True)
+        self.thread.start()
+
+    def _get_fps(self):
+        # Wait for a measured frame rate, the default one if the video is
+        # released before it is known.
+        while callable(self.fps):
+            fps = self.fps()
+            if fps is not None:
+                return fps
+            if self.closing:
+                return DEFAULT_FPS
+            time.sleep(0.01)
+        return self.fps or DEFAULT_FPS
+
+    def _open(self, frame):
+        frame_size = self.frame_size or (frame.shape[1], frame.shape[0])
+        self.writer = cv2.VideoWriter(self.filename, self.fourcc,
+                                      self._get_fps(), frame_size)
+
+    def _update(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                return
+            if self.writer is None:
+                self._open(frame)
+            self.writer.write(frame)
+            self.written += 1
+
+    def isOpened(self):
+        if self.writer is None:
+            return self.thread.is_alive()
+        return self.writer.isOpened()
+
+    def write(self, frame):
+        if self.thread.is_alive():
+            self.frames.put_frame(frame)
+
+    def stats(self):
+        """
+        Back-pressure metrics of the sink.
+
+        :return: dict with the current and maximum queue depth, the number of
+        frames encoded and the number of frames dropped because the encoder
+        could not keep up.
+        """
+        return {'queue_depth': self.frames.qsize(),
+                'max_queue_depth': self.frames.max_depth,
+                'written': self.written,
+                'dropped': self.frames.dropped}
+
+    def release(self):
+        """Flush the pending frames and close the output video."""
+        self.closing = True
+        if self.thread.is_alive():
+            # The end marker must not be dropped, wait for a free slot.
+            self.frames.put(None)
+            self.thread.join()
+        if self.writer is not None:
+            self.writer.release()
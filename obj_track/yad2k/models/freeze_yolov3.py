@@ -0,0 +1,162 @@
+"""Export a converted YOLO_v3 Keras model to a frozen inference graph.
+
+The BatchNormalization layers are folded into the preceding convolutions,
+yolo_eval is appended and all the variables are turned into constants, the
+resulting .pb is loaded without Keras by frozen_yolov3.load_frozen_yolo.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import tensorflow as tf
+from keras import backend as K
+from keras.models import Model, load_model
+
+from .frozen_yolov3 import INPUT_NAME, IMAGE_SHAPE_NAME, \
+    SCORE_THRESHOLD_NAME, IOU_THRESHOLD_NAME, OUTPUT_NAMES, YOLO_OUTPUT_NAME, \
+    NMS_MODE_NAME
+from .keras_yolov3 import yolo_eval
+
+
+def _folded_weights(conv_weights, bn_layer):
+    """Kernel and bias of a convolution followed by inference mode BN."""
+    kernel = conv_weights[0]
+    bias = conv_weights[1] if len(conv_weights) > 1 else \
+        np.zeros(kernel.shape[-1], dtype=kernel.dtype)
+    bn_weights = list(bn_layer.get_weights())
+    gamma = bn_weights.pop(0) if bn_layer.scale else 1.
+    beta = bn_weights.pop(0) if bn_layer.center else 0.
+    mean, variance = bn_weights
+    scale = gamma / np.sqrt(variance + bn_layer.epsilon)
+    return [kernel * scale, beta + (bias - mean) * scale]
+
+
+def fold_batch_norm(model, input_name=INPUT_NAME, custom_objects=None):
+    """Return a copy of a functional model without BatchNormalization.
+    Every BatchNormalization applied over the channels to the output of a
+    Conv2D nothing else uses is merged into that Conv2D, which gets a bias.
+    Parameters
+    ----------
+    model: keras Model with a single input
+    input_name: str, new name of the input layer, None to keep it
+    custom_objects: dict, passed to Model.from_config
+    Returns
+    -------
+    folded_model: keras Model with the same outputs for inference
+    """
+    config = model.get_config()
+    layers = {layer['name']: layer for layer in config['layers']}
+    consumers = defaultdict(int)
+    for layer in config['layers']:
+        for node in layer['inbound_nodes']:
+            for inbound in node:
+                consumers[inbound[0]] += 1
+    for output in config['output_layers']:
+        consumers[output[0]] += 1
+
+    # New name of every removed or renamed layer.
+    renamed = {}
+    bn_of_conv = {}
+    for layer in config['layers']:
+        if layer['class_name'] != 'BatchNormalization' or \
+                layer['config']['axis'] not in (-1, 3) or \
+                len(layer['inbound_nodes']) != 1 or \
+                len(layer['inbound_nodes'][0]) != 1:
+            continue
+        conv_name = layer['inbound_nodes'][0][0][0]
+        conv = layers[conv_name]
+        if conv['class_name'] != 'Conv2D' or consumers[conv_name] != 1:
+            continue
+        conv['config']['use_bias'] = True
+        renamed[layer['name']] = conv_name
+        bn_of_conv[conv_name] = layer['name']
+    config['layers'] = [layer for layer in config['layers']
+                        if layer['name'] not in renamed]
+
+    input_layer = config['input_layers'][0][0]
+    if input_name and input_name != input_layer:
+        renamed[input_layer] = input_name
+        layers[input_layer]['name'] = input_name
+        layers[input_layer]['config']['name'] = input_name
+    for layer in config['layers']:
+        for node in layer['inbound_nodes']:
+            for inbound in node:
+                inbound[0] = renamed.get(inbound[0], inbound[0])
+    for refs in (config['input_layers'], config['output_layers']):
+        for ref in refs:
+            ref[0] = renamed.get(ref[0], ref[0])
+
+    folded_model = Model.from_config(config, custom_objects=custom_objects)
+    original_names = {new: old for old, new in renamed.items()
+                      if old == input_layer}
+    for layer in folded_model.layers:
+        original = model.get_layer(original_names.get(layer.name, layer.name))
+        weights = original.get_weights()
+        if layer.name in bn_of_conv:
+            weights = _folded_weights(
+                weights, model.get_layer(bn_of_conv[layer.name]))
+        if weights:
+            layer.set_weights(weights)
+    return folded_model
+
+
+def freeze_yolo(model_path,
+                anchors,
+                output_path,
+                num_classes=None,
+                max_boxes=20,
+                score_threshold=.6,
+                iou_threshold=.5,
+                nms='per_class'):
+    """Write a frozen graph of a YOLO_v3 .h5 model and its post-processing.
+    The graph takes INPUT_NAME (batch of one letterboxed image) and
+    IMAGE_SHAPE_NAME (hw of the original image) and returns OUTPUT_NAMES
+    like yolo_eval, the thresholds can be fed through SCORE_THRESHOLD_NAME
+    and IOU_THRESHOLD_NAME, and the raw outputs of the model are kept as
+    YOLO_OUTPUT_NAME.
+    Parameters
+    ----------
+    anchors: array, shape=(N, 2), wh
+    num_classes: int, taken from the model outputs if None
+    nms: str, NMS mode of yolo_eval, baked into the graph and recorded as
+        NMS_MODE_NAME
+    """
+    K.clear_session()
+    K.set_learning_phase(0)
+    model = load_model(model_path, compile=False)
+    model = fold_batch_norm(model)
+    outputs = model.output if isinstance(model.output, list) else \
+        [model.output]
+    if num_classes is None:
+        anchors_per_layer = len(anchors) // len(outputs)
+        num_classes = K.int_shape(outputs[0])[-1] // anchors_per_layer - 5
+
+    outputs = [tf.identity(output, name=YOLO_OUTPUT_NAME.format(l))
+               for l, output in enumerate(outputs)]
+    image_shape = tf.placeholder(tf.float32, shape=(2, ),
+                                 name=IMAGE_SHAPE_NAME)
+    score_tensor = tf.placeholder_with_default(
+        np.float32(score_threshold), shape=(), name=SCORE_THRESHOLD_NAME)
+    iou_tensor = tf.placeholder_with_default(
+        np.float32(iou_threshold), shape=(), name=IOU_THRESHOLD_NAME)
+    detections = yolo_eval(outputs, anchors, num_classes, image_shape,
+                           max_boxes=max_boxes, score_threshold=score_tensor,
+                           iou_threshold=iou_tensor, nms=nms)
+    for tensor, name in zip(detections, OUTPUT_NAMES):
+        tf.identity(tensor, name=name)
+    tf.constant(nms, name=NMS_MODE_NAME)
+
+    sess = K.get_session()
+    output_names = OUTPUT_NAMES + [NMS_MODE_NAME] + \
+        [YOLO_OUTPUT_NAME.format(l) for l in range(len(outputs))]
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        sess, sess.graph.as_graph_def(), output_names)
+    # The named outputs are Identity ops, keep them.
+    graph_def = tf.graph_util.remove_training_nodes(
+        graph_def, protected_nodes=output_names)
+    with tf.gfile.GFile(output_path, 'wb') as fid:
+        fid.write(graph_def.SerializeToString())
+    print('Saved frozen graph with {} nodes to {}'.format(
+        len(graph_def.node), output_path))
+    K.clear_session()
+    return output_path
@@ -0,0 +1,126 @@
+"""Tests for the batch normalization folding of
+obj_track.yad2k.models.freeze_yolov3."""
+
+import unittest
+
+import numpy as np
+from keras import backend as K
+from keras.layers import BatchNormalization, Conv2D, Input, LeakyReLU
+from keras.models import Model
+
+from obj_track.yad2k.models.freeze_yolov3 import _folded_weights, \
+    fold_batch_norm
+from obj_track.yad2k.models.frozen_yolov3 import INPUT_NAME
+
+
+class FakeBatchNorm(object):
+    """Weights and options of a BatchNormalization layer."""
+
+    def __init__(self, weights, scale=True, center=True, epsilon=1e-3):
+        self.weights = weights
+        self.scale = scale
+        self.center = center
+        self.epsilon = epsilon
+
+    def get_weights(self):
+        return list(self.weights)
+
+
+def random_bn_weights(rng, channels, scale=True, center=True):
+    weights = []
+    if scale:
+        weights.append(rng.uniform(0.5, 2., channels))
+    if center:
+        weights.append(rng.normal(size=channels))
+    # Moving mean and variance.
+    weights += [rng.normal(size=channels), rng.uniform(0.1, 2., channels)]
+    return weights
+
+
+def batch_norm(x, weights, scale=True, center=True, epsilon=1e-3):
+    """Inference mode BatchNormalization over the last axis."""
+    weights = list(weights)
+    gamma = weights.pop(0) if scale else 1.
+    beta = weights.pop(0) if center else 0.
+    mean, variance = weights
+    return gamma * (x - mean) / np.sqrt(variance + epsilon) + beta
+
+
+class FoldedWeightsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+        # Patches of a 3x3 convolution from 5 to 4 channels.
+        self.patches = self.rng.normal(size=(32, 3, 3, 5))
+        self.kernel = self.rng.normal(size=(3, 3, 5, 4))
+
+    def conv(self, weights):
+        output = np.tensordot(self.patches, weights[0], axes=3)
+        if len(weights) > 1:
+            output = output + weights[1]
+        return output
+
+    def check(self, conv_weights, scale=True, center=True):
+        bn_weights = random_bn_weights(self.rng, 4, scale, center)
+        bn_layer = FakeBatchNorm(bn_weights, scale, center)
+        folded = _folded_weights(conv_weights, bn_layer)
+        self.assertEqual(folded[0].shape, self.kernel.shape)
+        self.assertEqual(folded[1].shape, (4,))
+        np.testing.assert_allclose(
+            self.conv(folded),
+            batch_norm(self.conv(conv_weights), bn_weights, scale, center),
+            rtol=1e-10, atol=1e-10)
+
+    def test_without_bias(self):
+        self.check([self.kernel])
+
+    def test_with_bias(self):
+        self.check([self.kernel, self.rng.normal(size=4)])
+
+    def test_without_scale_or_center(self):
+        for scale, center in ((False, True), (True, False), (False, False)):
+            self.check([self.kernel], scale, center)
+            self.check([self.kernel, self.rng.normal(size=4)], scale, center)
+
+    def test_dtype(self):
+        kernel = self.kernel.astype('float32')
+        bn_layer = FakeBatchNorm([w.astype('float32') for w in
+                                  random_bn_weights(self.rng, 4)])
+        kernel, bias = _folded_weights([kernel], bn_layer)
+        self.assertEqual(kernel.dtype, np.float32)
+        self.assertEqual(bias.dtype, np.float32)
+
+
+class FoldBatchNormTest(unittest.TestCase):
+
+    def tearDown(self):
+        K.clear_session()
+
+    def test_same_outputs(self):
+        rng = np.random.RandomState(0)
+        inputs = Input(shape=(8, 8, 3), name='image')
+        x = Conv2D(4, 3, padding='same', use_bias=False)(inputs)
+        x = BatchNormalization()(x)
+        x = LeakyReLU(alpha=0.1)(x)
+        x = Conv2D(2, 1)(x)
+        x = BatchNormalization(scale=False)(x)
+        model = Model(inputs, x)
+        for layer in model.layers:
+            if isinstance(layer, BatchNormalization):
+                channels = layer.get_weights()[0].shape[0]
+                layer.set_weights(random_bn_weights(rng, channels,
+                                                    layer.scale,
+                                                    layer.center))
+
+        folded_model = fold_batch_norm(model)
+        self.assertFalse(any(isinstance(layer, BatchNormalization)
+                             for layer in folded_model.layers))
+        self.assertEqual(folded_model.input_names, [INPUT_NAME])
+        images = rng.uniform(size=(2, 8, 8, 3)).astype('float32')
+        np.testing.assert_allclose(folded_model.predict(images),
+                                   model.predict(images),
+                                   rtol=1e-4, atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
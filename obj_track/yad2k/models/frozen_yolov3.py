@@ -0,0 +1,51 @@
+"""Load YOLO_v3 frozen inference graphs written by freeze_yolov3.
+
+Only needs TensorFlow, the Keras model and yolo_eval are part of the graph.
+"""
+
+import tensorflow as tf
+
+# Names of the tensors of the frozen graph.
+INPUT_NAME = 'input_image'
+IMAGE_SHAPE_NAME = 'input_image_shape'
+SCORE_THRESHOLD_NAME = 'score_threshold'
+IOU_THRESHOLD_NAME = 'iou_threshold'
+OUTPUT_NAMES = ['boxes', 'scores', 'classes']
+YOLO_OUTPUT_NAME = 'yolo_output_{}'
+# Constant holding the NMS mode of yolo_eval baked into the graph.
+NMS_MODE_NAME = 'nms_mode'
+
+
+def load_frozen_yolo(graph_path, graph=None):
+    """Import a graph written by freeze_yolo, a graph without the
+    NMS_MODE_NAME constant raises a ValueError.
+    Returns
+    -------
+    tensors: dict of the input, threshold, detection and raw output tensors
+        by name, yolo_outputs holds the list of raw outputs and nms the NMS
+        mode the graph was frozen with
+    """
+    graph = graph or tf.get_default_graph()
+    graph_def = tf.GraphDef()
+    with tf.gfile.GFile(graph_path, 'rb') as fid:
+        graph_def.ParseFromString(fid.read())
+    nms_modes = [node.attr['value'].tensor.string_val[0].decode()
+                 for node in graph_def.node if node.name == NMS_MODE_NAME]
+    if not nms_modes:
+        raise ValueError('{} has no {} constant, freeze it again with '
+                         'convert_yad2k.py --freeze'.format(graph_path,
+                                                            NMS_MODE_NAME))
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    names = [INPUT_NAME, IMAGE_SHAPE_NAME, SCORE_THRESHOLD_NAME,
+             IOU_THRESHOLD_NAME] + OUTPUT_NAMES
+    tensors = {name: graph.get_tensor_by_name(name + ':0') for name in names}
+    tensors['nms'] = nms_modes[0]
+    tensors['yolo_outputs'] = []
+    while True:
+        name = YOLO_OUTPUT_NAME.format(len(tensors['yolo_outputs']))
+        try:
+            tensors['yolo_outputs'].append(
+                graph.get_tensor_by_name(name + ':0'))
+        except KeyError:
+            return tensors
@@ -0,0 +1,63 @@
+"""Tests for load_frozen_yolo of obj_track.yad2k.models.frozen_yolov3."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import tensorflow as tf
+
+from obj_track.yad2k.models.frozen_yolov3 import load_frozen_yolo, \
+    INPUT_NAME, IMAGE_SHAPE_NAME, SCORE_THRESHOLD_NAME, IOU_THRESHOLD_NAME, \
+    OUTPUT_NAMES, YOLO_OUTPUT_NAME, NMS_MODE_NAME
+
+
+def write_graph(path, nms=None, num_outputs=2):
+    """Graph with the tensor names of freeze_yolo, the NMS mode constant if
+    nms is given."""
+    graph = tf.Graph()
+    with graph.as_default():
+        image = tf.placeholder(tf.float32, (None, 32, 32, 3), name=INPUT_NAME)
+        tf.placeholder(tf.float32, (2,), name=IMAGE_SHAPE_NAME)
+        tf.placeholder(tf.float32, (), name=SCORE_THRESHOLD_NAME)
+        tf.placeholder(tf.float32, (), name=IOU_THRESHOLD_NAME)
+        for name in OUTPUT_NAMES:
+            tf.identity(image, name=name)
+        for l in range(num_outputs):
+            tf.identity(image, name=YOLO_OUTPUT_NAME.format(l))
+        if nms is not None:
+            tf.constant(nms, name=NMS_MODE_NAME)
+    with open(path, 'wb') as fid:
+        fid.write(graph.as_graph_def().SerializeToString())
+    return path
+
+
+class LoadFrozenYoloTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'yolov3.pb')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tensors(self):
+        write_graph(self.path, nms='offset')
+        graph = tf.Graph()
+        tensors = load_frozen_yolo(self.path, graph)
+        self.assertEqual(tensors['nms'], 'offset')
+        self.assertEqual(tensors[INPUT_NAME].graph, graph)
+        self.assertEqual([tensor.name for tensor in tensors['yolo_outputs']],
+                         ['yolo_output_0:0', 'yolo_output_1:0'])
+
+    def test_missing_nms_mode(self):
+        write_graph(self.path)
+        graph = tf.Graph()
+        with self.assertRaisesRegex(ValueError, NMS_MODE_NAME):
+            load_frozen_yolo(self.path, graph)
+        # Refused before anything is imported.
+        self.assertFalse(graph.get_operations())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -342,7 +342,9 @@ def preprocess_true_boxes_v2(true_boxes, anchors, image_size):
     Parameters
     ----------
     true_boxes : array
-        List of ground truth boxes in form of relative x, y, w, h, class.
+        List of ground truth boxes in form of relative x, y, w, h, class,
+        shape (num_boxes, 5), or a batch of them padded with zero boxes,
+        shape (batch_size, num_boxes, 5).
         Relative coordinates are in the range [0, 1] indicating a percentage
         of the original image dimensions.
     anchors : array
@@ -355,7 +357,8 @@ def preprocess_true_boxes_v2(true_boxes, anchors, image_size):
     -------
     detectors_mask : array
         0/1 mask for detectors in [conv_height, conv_width, num_anchors, 1]
-        that should be compared with a matching ground truth box.
+        that should be compared with a matching ground truth box, with a
+        leading batch dimension for a batch of boxes.
     matching_true_boxes: array
         Same shape as detectors_mask with the corresponding ground truth box
         adjusted for comparison with predicted parameters at training time.
@@ -368,48 +371,54 @@ def preprocess_true_boxes_v2(true_boxes, anchors, image_size):
     assert width % 32 == 0, 'Image sizes in YOLO_v2 must be multiples of 32.'
     conv_height = height // 32
     conv_width = width // 32
-    num_box_params = true_boxes.shape[1]
+    true_boxes = np.asarray(true_boxes)
+    batched = true_boxes.ndim == 3
+    if not batched:
+        true_boxes = true_boxes[np.newaxis]
+    batch_size, _, num_box_params = true_boxes.shape
     detectors_mask = np.zeros(
-        (conv_height, conv_width, num_anchors, 1), dtype=np.float32)
+        (batch_size, conv_height, conv_width, num_anchors, 1),
+        dtype=np.float32)
     matching_true_boxes = np.zeros(
-        (conv_height, conv_width, num_anchors, num_box_params),
+        (batch_size, conv_height, conv_width, num_anchors, num_box_params),
         dtype=np.float32)
 
-    for box in true_boxes:
-        # scale box to convolutional feature spatial dimensions
-        box_class = box[4:5]
-        box = box[0:4] * np.array(
-            [conv_width, conv_height, conv_width, conv_height])
-        i = np.floor(box[1]).astype('int')
-        j = np.floor(box[0]).astype('int')
-        best_iou = 0
-        best_anchor = 0
-        for k, anchor in enumerate(anchors):
-            # Find IOU between box shifted to origin and anchor box.
-            box_maxes = box[2:4] / 2.
-            box_mins = -box_maxes
-            anchor_maxes = (anchor / 2.)
-            anchor_mins = -anchor_maxes
-
-            intersect_mins = np.maximum(box_mins, anchor_mins)
-            intersect_maxes = np.minimum(box_maxes, anchor_maxes)
-            intersect_wh = np.maximum(intersect_maxes - intersect_mins, 0.)
-            intersect_area = intersect_wh[0] * intersect_wh[1]
-            box_area = box[2] * box[3]
-            anchor_area = anchor[0] * anchor[1]
-            iou = intersect_area / (box_area + anchor_area - intersect_area)
-            if iou > best_iou:
-                best_iou = iou
-                best_anchor = k
-
-        if best_iou > 0:
-            detectors_mask[i, j, best_anchor] = 1
-            adjusted_box = np.array(
-                [
-                    box[0] - j, box[1] - i,
-                    np.log(box[2] / anchors[best_anchor][0]),
-                    np.log(box[3] / anchors[best_anchor][1]), box_class
-                ],
-                dtype=np.float32)
-            matching_true_boxes[i, j, best_anchor] = adjusted_box
-    return detectors_mask, matching_true_boxes
\ No newline at end of file
+    # scale boxes to convolutional feature spatial dimensions
+    anchors = np.asarray(anchors, dtype=np.float64)
+    boxes = true_boxes[..., 0:4] * np.array(
+        [conv_width, conv_height, conv_width, conv_height], dtype=np.float64)
+
+    # IOU between every box shifted to origin and every anchor box,
+    # shape (batch_size, num_boxes, num_anchors).
+    box_wh = boxes[..., np.newaxis, 2:4]
+    intersect_wh = np.maximum(np.minimum(box_wh, anchors), 0.)
+    intersect_area = intersect_wh[..., 0] * intersect_wh[..., 1]
+    box_area = box_wh[..., 0] * box_wh[..., 1]
+    anchor_area = anchors[:, 0] * anchors[:, 1]
+    iou = intersect_area / (box_area + anchor_area - intersect_area)
+
+    # First anchor of highest IOU, boxes without any overlap (the zero
+    # padding) are not matched.
+    b, t = np.nonzero(np.max(iou, axis=-1) > 0)
+    k = np.argmax(iou[b, t], axis=-1)
+    box = boxes[b, t]
+    i = np.floor(box[:, 1]).astype('int')
+    j = np.floor(box[:, 0]).astype('int')
+
+    # Boxes sharing a detector: the last one wins, as it overwrote the
+    # others when the boxes were matched one by one.
+    detectors = np.ravel_multi_index((b, i, j, k), detectors_mask.shape[:4])
+    _, last = np.unique(detectors[::-1], return_index=True)
+    last = len(detectors) - 1 - last
+    b, t, i, j, k, box = b[last], t[last], i[last], j[last], k[last], \
+        box[last]
+
+    detectors_mask[b, i, j, k] = 1
+    matching_true_boxes[b, i, j, k, 0] = box[:, 0] - j
+    matching_true_boxes[b, i, j, k, 1] = box[:, 1] - i
+    matching_true_boxes[b, i, j, k, 2] = np.log(box[:, 2] / anchors[k, 0])
+    matching_true_boxes[b, i, j, k, 3] = np.log(box[:, 3] / anchors[k, 1])
+    matching_true_boxes[b, i, j, k, 4:] = true_boxes[b, t, 4:]
+    if not batched:
+        return detectors_mask[0], matching_true_boxes[0]
+    return detectors_mask, matching_true_boxes
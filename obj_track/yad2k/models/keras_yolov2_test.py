@@ -0,0 +1,114 @@
+"""Tests for preprocess_true_boxes_v2 of obj_track.yad2k.models.keras_yolov2."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.yad2k.models.keras_yolov2 import preprocess_true_boxes_v2, \
+    voc_anchors
+
+
+def preprocess_true_boxes_v2_loop(true_boxes, anchors, image_size):
+    """Former per box and per anchor implementation, the reference."""
+    height, width = image_size
+    num_anchors = len(anchors)
+    conv_height = height // 32
+    conv_width = width // 32
+    num_box_params = true_boxes.shape[1]
+    detectors_mask = np.zeros(
+        (conv_height, conv_width, num_anchors, 1), dtype=np.float32)
+    matching_true_boxes = np.zeros(
+        (conv_height, conv_width, num_anchors, num_box_params),
+        dtype=np.float32)
+
+    for box in true_boxes:
+        # box[4:5] before, newer NumPy refuses it in the array below.
+        box_class = box[4]
+        box = box[0:4] * np.array(
+            [conv_width, conv_height, conv_width, conv_height])
+        i = np.floor(box[1]).astype('int')
+        j = np.floor(box[0]).astype('int')
+        best_iou = 0
+        best_anchor = 0
+        for k, anchor in enumerate(anchors):
+            box_maxes = box[2:4] / 2.
+            box_mins = -box_maxes
+            anchor_maxes = (anchor / 2.)
+            anchor_mins = -anchor_maxes
+
+            intersect_mins = np.maximum(box_mins, anchor_mins)
+            intersect_maxes = np.minimum(box_maxes, anchor_maxes)
+            intersect_wh = np.maximum(intersect_maxes - intersect_mins, 0.)
+            intersect_area = intersect_wh[0] * intersect_wh[1]
+            box_area = box[2] * box[3]
+            anchor_area = anchor[0] * anchor[1]
+            iou = intersect_area / (box_area + anchor_area - intersect_area)
+            if iou > best_iou:
+                best_iou = iou
+                best_anchor = k
+
+        if best_iou > 0:
+            detectors_mask[i, j, best_anchor] = 1
+            adjusted_box = np.array(
+                [
+                    box[0] - j, box[1] - i,
+                    np.log(box[2] / anchors[best_anchor][0]),
+                    np.log(box[3] / anchors[best_anchor][1]), box_class
+                ],
+                dtype=np.float32)
+            matching_true_boxes[i, j, best_anchor] = adjusted_box
+    return detectors_mask, matching_true_boxes
+
+
+def random_boxes(rng, m, max_boxes, num_classes):
+    """Batch of relative xywh boxes padded with trailing zero boxes."""
+    true_boxes = np.zeros((m, max_boxes, 5), dtype='float32')
+    for b in range(m):
+        n = rng.randint(0, max_boxes + 1)
+        true_boxes[b, :n, 0:2] = rng.uniform(0, 1, size=(n, 2))
+        true_boxes[b, :n, 2:4] = rng.uniform(0.01, 1, size=(n, 2))
+        true_boxes[b, :n, 4] = rng.randint(0, num_classes, size=n)
+    return true_boxes
+
+
+class PreprocessTrueBoxesV2Test(unittest.TestCase):
+
+    def test_single_image(self):
+        rng = np.random.RandomState(0)
+        for image_size in [(416, 416), (320, 608)]:
+            for true_boxes in random_boxes(rng, 20, 30, 20):
+                expected = preprocess_true_boxes_v2_loop(
+                    true_boxes, voc_anchors, image_size)
+                actual = preprocess_true_boxes_v2(
+                    true_boxes, voc_anchors, image_size)
+                for a, e in zip(actual, expected):
+                    self.assertEqual(a.shape, e.shape)
+                    np.testing.assert_array_equal(a, e)
+
+    def test_batch(self):
+        rng = np.random.RandomState(1)
+        true_boxes = random_boxes(rng, 8, 30, 20)
+        # Two boxes on the same detector, the last one is kept.
+        true_boxes[0, :2] = [[0.5, 0.5, 0.1, 0.1, 3],
+                             [0.51, 0.51, 0.1, 0.1, 7]]
+        detectors_mask, matching_true_boxes = preprocess_true_boxes_v2(
+            true_boxes, voc_anchors, (416, 416))
+        self.assertEqual(detectors_mask.shape, (8, 13, 13, 5, 1))
+        self.assertEqual(matching_true_boxes.shape, (8, 13, 13, 5, 5))
+        for b, boxes in enumerate(true_boxes):
+            expected = preprocess_true_boxes_v2_loop(
+                boxes, voc_anchors, (416, 416))
+            np.testing.assert_array_equal(detectors_mask[b], expected[0])
+            np.testing.assert_array_equal(matching_true_boxes[b],
+                                          expected[1])
+
+    def test_no_boxes(self):
+        detectors_mask, matching_true_boxes = preprocess_true_boxes_v2(
+            np.zeros((4, 5)), voc_anchors, (416, 416))
+        self.assertEqual(detectors_mask.shape, (13, 13, 5, 1))
+        self.assertFalse(detectors_mask.any())
+        self.assertFalse(matching_true_boxes.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -148,12 +148,17 @@ def yolo_head(feats, anchors, num_classes, input_shape, calc_loss=False):
 
 
 def yolo_correct_boxes(box_xy, box_wh, input_shape, image_shape):
-    '''Get corrected boxes'''
+    '''Get corrected boxes
+    image_shape is either one hw for all the boxes, shape=(2,), or one hw per
+    image broadcastable against box_xy, e.g. shape=(m, 1, 1, 1, 2).
+    '''
     box_yx = box_xy[..., ::-1]
     box_hw = box_wh[..., ::-1]
     input_shape = K.cast(input_shape, K.dtype(box_yx))
     image_shape = K.cast(image_shape, K.dtype(box_yx))
-    new_shape = K.round(image_shape * K.min(input_shape/image_shape))
+    # Reduce over the last axis only, image_shape may hold one hw per image.
+    new_shape = K.round(image_shape * K.min(input_shape/image_shape,
+                                            axis=-1, keepdims=True))
     offset = (input_shape-new_shape)/2./input_shape
     scale = input_shape/new_shape
     box_yx = (box_yx - offset) * scale
@@ -190,8 +195,12 @@ def yolo_eval(yolo_outputs,
               image_shape,
               max_boxes=20,
               score_threshold=.6,
-              iou_threshold=.5):
-    """Evaluate YOLO model on given input and return filtered boxes."""
+              iou_threshold=.5,
+              nms='per_class'):
+    """Evaluate YOLO model on given input and return filtered boxes.
+    nms is per_class for one NMS op per class or offset for a single class
+    aware NMS op over all the classes, both give the same boxes.
+    """
     num_layers = len(yolo_outputs)
     anchor_mask = [[6,7,8], [3,4,5], [0,1,2]] if num_layers==3 else [[3,4,5], [1,2,3]] # default setting
     input_shape = K.shape(yolo_outputs[0])[1:3] * 32
@@ -205,6 +214,25 @@ def yolo_eval(yolo_outputs,
     boxes = K.concatenate(boxes, axis=0)
     box_scores = K.concatenate(box_scores, axis=0)
 
+    return yolo_filter_boxes(boxes, box_scores, num_classes, max_boxes,
+                             score_threshold, iou_threshold, nms)
+
+
+def yolo_filter_boxes(boxes,
+                      box_scores,
+                      num_classes,
+                      max_boxes=20,
+                      score_threshold=.6,
+                      iou_threshold=.5,
+                      nms='per_class'):
+    """Threshold and run per class NMS on the boxes of a single image."""
+    if nms == 'offset':
+        return yolo_filter_boxes_offset(boxes, box_scores, num_classes,
+                                        max_boxes, score_threshold,
+                                        iou_threshold)
+    elif nms != 'per_class':
+        raise ValueError("NMS mode not valid. Valid options: per_class or "
+                         "offset")
     mask = box_scores >= score_threshold
     max_boxes_tensor = K.constant(max_boxes, dtype='int32')
     boxes_ = []
@@ -229,6 +257,105 @@ def yolo_eval(yolo_outputs,
     return boxes_, scores_, classes_
 
 
+def yolo_filter_boxes_offset(boxes,
+                             box_scores,
+                             num_classes,
+                             max_boxes=20,
+                             score_threshold=.6,
+                             iou_threshold=.5):
+    """Threshold and run a single class aware NMS on the boxes of a single
+    image. Every class is shifted to its own region of the plane so that
+    boxes of different classes never overlap, which makes one NMS op over
+    all the (box, class) pairs equivalent to the per class loop.
+    """
+    candidates = tf.where(box_scores >= score_threshold)
+    classes = K.cast(candidates[:, 1], 'int32')
+    boxes = K.gather(boxes, candidates[:, 0])
+    scores = tf.gather_nd(box_scores, candidates)
+
+    offset = K.max(boxes) - K.min(boxes) + 1.
+    shifted_boxes = boxes + K.expand_dims(K.cast(classes, K.dtype(boxes))) * offset
+    nms_index = tf.image.non_max_suppression(
+        shifted_boxes, scores, K.shape(scores)[0], iou_threshold=iou_threshold)
+
+    # Keep at most max_boxes per class, NMS output is sorted by score.
+    nms_classes = K.gather(classes, nms_index)
+    class_one_hot = K.one_hot(nms_classes, num_classes)
+    class_rank = K.sum(K.cumsum(class_one_hot, axis=0) * class_one_hot, axis=-1)
+    nms_index = tf.boolean_mask(nms_index, class_rank <= max_boxes)
+    nms_classes = tf.boolean_mask(nms_classes, class_rank <= max_boxes)
+
+    # Order by class then by score like the per class loop, a stable sort by
+    # class of the score sorted NMS output.
+    num_kept = K.shape(nms_index)[0]
+    sort_key = nms_classes * num_kept + K.arange(0, num_kept)
+    _, order = tf.nn.top_k(-sort_key, k=num_kept)
+    nms_index = K.gather(nms_index, order)
+
+    return (K.gather(boxes, nms_index), K.gather(scores, nms_index),
+            K.gather(classes, nms_index))
+
+
+def yolo_eval_batch(yolo_outputs,
+                    anchors,
+                    num_classes,
+                    image_shapes,
+                    max_boxes=20,
+                    score_threshold=.6,
+                    iou_threshold=.5,
+                    nms='per_class'):
+    """Evaluate YOLO model on a batch of images and return filtered boxes.
+    Parameters
+    ----------
+    yolo_outputs: list of tensor, the output of yolo_body for m images
+    image_shapes: tensor, shape=(m, 2), hw of every original image
+    Returns
+    -------
+    boxes, scores, classes: tensors of the detections of all the images
+    batch_index: tensor, index of the image every detection belongs to
+    """
+    num_layers = len(yolo_outputs)
+    anchor_mask = [[6,7,8], [3,4,5], [0,1,2]] if num_layers==3 else [[3,4,5], [1,2,3]] # default setting
+    input_shape = K.shape(yolo_outputs[0])[1:3] * 32
+    m = K.shape(yolo_outputs[0])[0] # batch size, tensor
+    # One hw per image, broadcast over grid and anchors.
+    image_shapes = K.reshape(image_shapes, [-1, 1, 1, 1, 2])
+    boxes = []
+    box_scores = []
+    for l in range(num_layers):
+        box_xy, box_wh, box_confidence, box_class_probs = yolo_head(
+            yolo_outputs[l], anchors[anchor_mask[l]], num_classes, input_shape)
+        _boxes = yolo_correct_boxes(box_xy, box_wh, input_shape, image_shapes)
+        boxes.append(K.reshape(_boxes, [m, -1, 4]))
+        box_scores.append(K.reshape(box_confidence * box_class_probs,
+                                    [m, -1, num_classes]))
+    boxes = K.concatenate(boxes, axis=1)
+    box_scores = K.concatenate(box_scores, axis=1)
+
+    # Filter every image of the batch, the number of detections varies.
+    boxes_ = tf.TensorArray(K.dtype(boxes), size=1, dynamic_size=True,
+                            infer_shape=False)
+    scores_ = tf.TensorArray(K.dtype(boxes), size=1, dynamic_size=True,
+                             infer_shape=False)
+    classes_ = tf.TensorArray('int32', size=1, dynamic_size=True,
+                              infer_shape=False)
+    index_ = tf.TensorArray('int32', size=1, dynamic_size=True,
+                            infer_shape=False)
+    def loop_body(b, boxes_, scores_, classes_, index_):
+        _boxes, _scores, _classes = yolo_filter_boxes(boxes[b], box_scores[b],
+            num_classes, max_boxes, score_threshold, iou_threshold, nms)
+        boxes_ = boxes_.write(b, _boxes)
+        scores_ = scores_.write(b, _scores)
+        classes_ = classes_.write(b, _classes)
+        index_ = index_.write(b, K.ones_like(_classes, 'int32') * b)
+        return b+1, boxes_, scores_, classes_, index_
+    _, boxes_, scores_, classes_, index_ = K.control_flow_ops.while_loop(
+        lambda b, *args: b<m, loop_body,
+        [0, boxes_, scores_, classes_, index_])
+
+    return boxes_.concat(), scores_.concat(), classes_.concat(), index_.concat()
+
+
 def preprocess_true_boxes(true_boxes, input_shape, anchors, num_classes):
     '''Preprocess true boxes to training input format
     Parameters
@@ -258,42 +385,46 @@ def preprocess_true_boxes(true_boxes, input_shape, anchors, num_classes):
     y_true = [np.zeros((m,grid_shapes[l][0],grid_shapes[l][1],len(anchor_mask[l]),5+num_classes),
         dtype='float32') for l in range(num_layers)]
 
-    # Expand dim to apply broadcasting.
-    anchors = np.expand_dims(anchors, 0)
-    anchor_maxes = anchors / 2.
-    anchor_mins = -anchor_maxes
-    valid_mask = boxes_wh[..., 0]>0
-
-    for b in range(m):
-        # Discard zero rows.
-        wh = boxes_wh[b, valid_mask[b]]
-        if len(wh)==0: continue
-        # Expand dim to apply broadcasting.
-        wh = np.expand_dims(wh, -2)
-        box_maxes = wh / 2.
-        box_mins = -box_maxes
-
-        intersect_mins = np.maximum(box_mins, anchor_mins)
-        intersect_maxes = np.minimum(box_maxes, anchor_maxes)
-        intersect_wh = np.maximum(intersect_maxes - intersect_mins, 0.)
-        intersect_area = intersect_wh[..., 0] * intersect_wh[..., 1]
-        box_area = wh[..., 0] * wh[..., 1]
-        anchor_area = anchors[..., 0] * anchors[..., 1]
-        iou = intersect_area / (box_area + anchor_area - intersect_area)
-
-        # Find best anchor for each true box
-        best_anchor = np.argmax(iou, axis=-1)
-
-        for t, n in enumerate(best_anchor):
-            for l in range(num_layers):
-                if n in anchor_mask[l]:
-                    i = np.floor(true_boxes[b,t,0]*grid_shapes[l][1]).astype('int32')
-                    j = np.floor(true_boxes[b,t,1]*grid_shapes[l][0]).astype('int32')
-                    k = anchor_mask[l].index(n)
-                    c = true_boxes[b,t, 4].astype('int32')
-                    y_true[l][b, j, i, k, 0:4] = true_boxes[b,t, 0:4]
-                    y_true[l][b, j, i, k, 4] = 1
-                    y_true[l][b, j, i, k, 5+c] = 1
+    # All the valid boxes of the batch at once, zero rows are discarded.
+    b, t = np.nonzero(boxes_wh[..., 0]>0)
+    if len(b)==0:
+        return y_true
+    boxes = true_boxes[b, t]
+    classes = boxes[:, 4].astype('int32')
+
+    # Find best anchor for each true box, iou of boxes and anchors
+    # sharing the same center, shape=(num_boxes, N).
+    anchors = np.asarray(anchors)
+    wh = boxes_wh[b, t]
+    intersect_wh = np.minimum(wh[:, None], anchors[None])
+    intersect_area = intersect_wh[..., 0] * intersect_wh[..., 1]
+    box_area = wh[:, 0:1] * wh[:, 1:2]
+    anchor_area = anchors[:, 0] * anchors[:, 1]
+    iou = intersect_area / (box_area + anchor_area - intersect_area)
+    best_anchor = np.argmax(iou, axis=-1)
+
+    for l in range(num_layers):
+        # Position of every anchor in the mask of the layer, -1 if absent.
+        mask_index = np.full(len(anchors), -1, dtype='int64')
+        mask_index[anchor_mask[l]] = np.arange(len(anchor_mask[l]))
+        k = mask_index[best_anchor]
+        on_layer = k>=0
+        if not on_layer.any():
+            continue
+        lb, lk, lboxes, lc = b[on_layer], k[on_layer], boxes[on_layer], \
+            classes[on_layer]
+        # float64 like the former per box scalar arithmetic.
+        i = np.floor(lboxes[:, 0].astype('float64')*grid_shapes[l][1]).astype('int32')
+        j = np.floor(lboxes[:, 1].astype('float64')*grid_shapes[l][0]).astype('int32')
+
+        # Boxes falling into the same cell and anchor: the last one sets
+        # xywh and objectness, the class bits of all of them are set.
+        cells = np.ravel_multi_index((lb, j, i, lk), y_true[l].shape[:4])
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        y_true[l][lb[last], j[last], i[last], lk[last], 0:4] = lboxes[last, 0:4]
+        y_true[l][lb[last], j[last], i[last], lk[last], 4] = 1
+        y_true[l][lb, j, i, lk, 5+lc] = 1
 
     return y_true
 
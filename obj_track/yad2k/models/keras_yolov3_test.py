@@ -0,0 +1,139 @@
+"""Tests for preprocess_true_boxes of obj_track.yad2k.models.keras_yolov3."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.yad2k.models.keras_yolov3 import preprocess_true_boxes
+
+ANCHORS = np.array([[10, 13], [16, 30], [33, 23], [30, 61], [62, 45],
+                    [59, 119], [116, 90], [156, 198], [373, 326]],
+                   dtype='float64')
+TINY_ANCHORS = np.array([[10, 14], [23, 27], [37, 58], [81, 82], [135, 169],
+                         [344, 319]], dtype='float64')
+
+
+def preprocess_true_boxes_loop(true_boxes, input_shape, anchors,
+                               num_classes):
+    """Former per image and per box implementation, the reference."""
+    num_layers = len(anchors)//3
+    anchor_mask = [[6,7,8], [3,4,5], [0,1,2]] if num_layers==3 else \
+        [[3,4,5], [1,2,3]]
+
+    true_boxes = np.array(true_boxes, dtype='float32')
+    input_shape = np.array(input_shape, dtype='int32')
+    boxes_xy = (true_boxes[..., 0:2] + true_boxes[..., 2:4]) // 2
+    boxes_wh = true_boxes[..., 2:4] - true_boxes[..., 0:2]
+    true_boxes[..., 0:2] = boxes_xy/input_shape[::-1]
+    true_boxes[..., 2:4] = boxes_wh/input_shape[::-1]
+
+    m = true_boxes.shape[0]
+    grid_shapes = [input_shape//{0:32, 1:16, 2:8}[l]
+                   for l in range(num_layers)]
+    y_true = [np.zeros((m, grid_shapes[l][0], grid_shapes[l][1],
+                        len(anchor_mask[l]), 5+num_classes), dtype='float32')
+              for l in range(num_layers)]
+
+    anchors = np.expand_dims(anchors, 0)
+    anchor_maxes = anchors / 2.
+    anchor_mins = -anchor_maxes
+    valid_mask = boxes_wh[..., 0]>0
+
+    for b in range(m):
+        wh = boxes_wh[b, valid_mask[b]]
+        if len(wh)==0: continue
+        wh = np.expand_dims(wh, -2)
+        box_maxes = wh / 2.
+        box_mins = -box_maxes
+
+        intersect_mins = np.maximum(box_mins, anchor_mins)
+        intersect_maxes = np.minimum(box_maxes, anchor_maxes)
+        intersect_wh = np.maximum(intersect_maxes - intersect_mins, 0.)
+        intersect_area = intersect_wh[..., 0] * intersect_wh[..., 1]
+        box_area = wh[..., 0] * wh[..., 1]
+        anchor_area = anchors[..., 0] * anchors[..., 1]
+        iou = intersect_area / (box_area + anchor_area - intersect_area)
+        best_anchor = np.argmax(iou, axis=-1)
+
+        for t, n in enumerate(best_anchor):
+            for l in range(num_layers):
+                if n in anchor_mask[l]:
+                    i = np.floor(true_boxes[b,t,0]*grid_shapes[l][1]).astype('int32')
+                    j = np.floor(true_boxes[b,t,1]*grid_shapes[l][0]).astype('int32')
+                    k = anchor_mask[l].index(n)
+                    c = true_boxes[b,t, 4].astype('int32')
+                    y_true[l][b, j, i, k, 0:4] = true_boxes[b,t, 0:4]
+                    y_true[l][b, j, i, k, 4] = 1
+                    y_true[l][b, j, i, k, 5+c] = 1
+
+    return y_true
+
+
+def random_boxes(rng, m, max_boxes, input_shape, num_classes):
+    """Batch of boxes padded with trailing zero rows, like get_random_data."""
+    h, w = input_shape
+    true_boxes = np.zeros((m, max_boxes, 5), dtype='float32')
+    for b in range(m):
+        n = rng.randint(0, max_boxes + 1)
+        x = np.sort(rng.randint(0, w, size=(n, 2)), axis=1)
+        y = np.sort(rng.randint(0, h, size=(n, 2)), axis=1)
+        x[:, 1] = np.maximum(x[:, 1], x[:, 0] + 1)
+        y[:, 1] = np.maximum(y[:, 1], y[:, 0] + 1)
+        true_boxes[b, :n, 0] = x[:, 0]
+        true_boxes[b, :n, 2] = x[:, 1]
+        true_boxes[b, :n, 1] = y[:, 0]
+        true_boxes[b, :n, 3] = y[:, 1]
+        true_boxes[b, :n, 4] = rng.randint(0, num_classes, size=n)
+    return true_boxes
+
+
+class PreprocessTrueBoxesTest(unittest.TestCase):
+
+    def assert_same_targets(self, true_boxes, input_shape, anchors,
+                            num_classes):
+        expected = preprocess_true_boxes_loop(true_boxes, input_shape,
+                                              anchors, num_classes)
+        y_true = preprocess_true_boxes(true_boxes, input_shape, anchors,
+                                       num_classes)
+        self.assertEqual(len(y_true), len(expected))
+        for actual, target in zip(y_true, expected):
+            self.assertEqual(actual.dtype, target.dtype)
+            np.testing.assert_array_equal(actual, target)
+
+    def test_random_batches(self):
+        rng = np.random.RandomState(0)
+        for input_shape in [(416, 416), (320, 608)]:
+            for _ in range(20):
+                true_boxes = random_boxes(rng, 4, 20, input_shape, 80)
+                self.assert_same_targets(true_boxes, input_shape, ANCHORS, 80)
+
+    def test_tiny_anchors(self):
+        rng = np.random.RandomState(1)
+        for _ in range(20):
+            true_boxes = random_boxes(rng, 4, 20, (416, 416), 3)
+            self.assert_same_targets(true_boxes, (416, 416), TINY_ANCHORS, 3)
+
+    def test_boxes_in_the_same_cell(self):
+        # Same cell and anchor: the last box sets xywh, both classes are on.
+        true_boxes = np.array([[[100, 100, 140, 160, 2],
+                                [101, 102, 141, 158, 5],
+                                [0, 0, 0, 0, 0]]], dtype='float32')
+        self.assert_same_targets(true_boxes, (416, 416), ANCHORS, 10)
+        y_true = preprocess_true_boxes(true_boxes, (416, 416), ANCHORS, 10)
+        objects = np.argwhere(y_true[1][..., 4])
+        self.assertEqual(len(objects), 1)
+        b, j, i, k = objects[0]
+        np.testing.assert_array_equal(
+            np.nonzero(y_true[1][b, j, i, k, 5:])[0], [2, 5])
+
+    def test_empty_batch(self):
+        true_boxes = np.zeros((2, 5, 5), dtype='float32')
+        y_true = preprocess_true_boxes(true_boxes, (416, 416), ANCHORS, 80)
+        self.assertEqual([y.shape for y in y_true],
+                         [(2, 13, 13, 3, 85), (2, 26, 26, 3, 85),
+                          (2, 52, 52, 3, 85)])
+        self.assertFalse(any(y.any() for y in y_true))
+
+
+if __name__ == '__main__':
+    unittest.main()
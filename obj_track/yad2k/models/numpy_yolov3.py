@@ -0,0 +1,198 @@
+"""YOLO_v3 post-processing in NumPy.
+
+Mirror of yolo_head, yolo_correct_boxes, yolo_boxes_and_scores and yolo_eval
+of keras_yolov3 working on the raw outputs of the model fetched with
+sess.run. The per class NMS loop of the graph version is replaced by a
+single class aware NMS over all the classes at once.
+"""
+
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1. / (1. + np.exp(-x))
+
+
+def yolo_head_np(feats, anchors, num_classes, input_shape):
+    """Convert final layer features to bounding box parameters."""
+    num_anchors = len(anchors)
+    grid_shape = feats.shape[1:3] # height, width
+    feats = feats.reshape(
+        (-1, grid_shape[0], grid_shape[1], num_anchors, num_classes + 5))
+
+    grid_y = np.tile(np.arange(grid_shape[0]).reshape(-1, 1, 1, 1),
+                     [1, grid_shape[1], 1, 1])
+    grid_x = np.tile(np.arange(grid_shape[1]).reshape(1, -1, 1, 1),
+                     [grid_shape[0], 1, 1, 1])
+    grid = np.concatenate([grid_x, grid_y], axis=-1).astype(feats.dtype)
+
+    # Adjust preditions to each spatial grid point and anchor size.
+    anchors = np.reshape(anchors, [1, 1, 1, num_anchors, 2])
+    box_xy = (_sigmoid(feats[..., :2]) + grid) / \
+        np.array(grid_shape[::-1], dtype=feats.dtype)
+    box_wh = np.exp(feats[..., 2:4]) * anchors / \
+        np.array(input_shape[::-1], dtype=feats.dtype)
+    box_confidence = _sigmoid(feats[..., 4:5])
+    box_class_probs = _sigmoid(feats[..., 5:])
+    return box_xy, box_wh.astype(feats.dtype), box_confidence, box_class_probs
+
+
+def yolo_correct_boxes_np(box_xy, box_wh, input_shape, image_shape):
+    '''Get corrected boxes
+    image_shape is either one hw for all the boxes, shape=(2,), or one hw per
+    image broadcastable against box_xy, e.g. shape=(m, 1, 1, 1, 2).
+    '''
+    box_yx = box_xy[..., ::-1]
+    box_hw = box_wh[..., ::-1]
+    input_shape = np.asarray(input_shape, dtype=box_yx.dtype)
+    image_shape = np.asarray(image_shape, dtype=box_yx.dtype)
+    new_shape = np.round(image_shape * np.min(input_shape/image_shape,
+                                              axis=-1, keepdims=True))
+    offset = (input_shape-new_shape)/2./input_shape
+    scale = input_shape/new_shape
+    box_yx = (box_yx - offset) * scale
+    box_hw = box_hw * scale
+
+    box_mins = box_yx - (box_hw / 2.)
+    box_maxes = box_yx + (box_hw / 2.)
+    # y_min, x_min, y_max, x_max
+    boxes = np.concatenate([box_mins, box_maxes], axis=-1)
+
+    # Scale boxes back to original image shape.
+    boxes *= np.concatenate([image_shape, image_shape], axis=-1)
+    return boxes
+
+
+def yolo_boxes_and_scores_np(feats, anchors, num_classes, input_shape,
+                             image_shape):
+    '''Process Conv layer output, boxes and scores keep the batch axis'''
+    box_xy, box_wh, box_confidence, box_class_probs = yolo_head_np(feats,
+        anchors, num_classes, input_shape)
+    if image_shape is None:
+        # Boxes relative to the model input, mapped back by the caller.
+        box_yx = box_xy[..., ::-1]
+        box_hw = box_wh[..., ::-1]
+        boxes = np.concatenate([box_yx - (box_hw / 2.),
+                                box_yx + (box_hw / 2.)], axis=-1)
+    else:
+        boxes = yolo_correct_boxes_np(box_xy, box_wh, input_shape,
+                                      image_shape)
+    m = feats.shape[0]
+    boxes = boxes.reshape((m, -1, 4))
+    box_scores = box_confidence * box_class_probs
+    box_scores = box_scores.reshape((m, -1, num_classes))
+    return boxes, box_scores
+
+
+def non_max_suppression_np(boxes, scores, classes, max_boxes=20,
+                           iou_threshold=.5):
+    """Greedy NMS of all the classes in one pass.
+    Every class is shifted to its own region of the plane so that boxes of
+    different classes never overlap, which makes a single NMS equivalent to
+    one NMS per class. At most max_boxes boxes are kept per class.
+    Returns
+    -------
+    keep: array, indices of the kept boxes by decreasing score
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype='int64')
+    boxes = boxes.astype('float64')
+    offset = boxes.max() - boxes.min() + 1.
+    boxes = boxes + classes[:, None] * offset
+    y_min, x_min, y_max, x_max = boxes.T
+    areas = (y_max - y_min) * (x_max - x_min)
+    class_counts = np.zeros(classes.max() + 1, dtype='int32')
+
+    order = np.argsort(-scores, kind='mergesort')
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        c = classes[i]
+        keep.append(i)
+        class_counts[c] += 1
+        rest = order[1:]
+        if class_counts[c] == max_boxes:
+            # Class is full, none of its remaining boxes can be selected.
+            order = rest[classes[rest] != c]
+            continue
+        intersect_h = np.maximum(np.minimum(y_max[i], y_max[rest]) -
+                                 np.maximum(y_min[i], y_min[rest]), 0.)
+        intersect_w = np.maximum(np.minimum(x_max[i], x_max[rest]) -
+                                 np.maximum(x_min[i], x_min[rest]), 0.)
+        intersect_area = intersect_h * intersect_w
+        union_area = areas[i] + areas[rest] - intersect_area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iou = np.where(union_area > 0, intersect_area / union_area, 0.)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype='int64')
+
+
+def yolo_filter_boxes_np(boxes,
+                         box_scores,
+                         num_classes,
+                         max_boxes=20,
+                         score_threshold=.6,
+                         iou_threshold=.5):
+    """Threshold and run class aware NMS on the boxes of a single image."""
+    box_index, classes = np.nonzero(box_scores >= score_threshold)
+    boxes = boxes[box_index]
+    scores = box_scores[box_index, classes]
+    keep = non_max_suppression_np(boxes, scores, classes, max_boxes,
+                                  iou_threshold)
+    # Same order as the graph version, by class then by decreasing score.
+    keep = keep[np.lexsort((-scores[keep], classes[keep]))]
+    return boxes[keep], scores[keep], classes[keep].astype('int32')
+
+
+def yolo_eval_np(yolo_outputs,
+                 anchors,
+                 num_classes,
+                 image_shape,
+                 max_boxes=20,
+                 score_threshold=.6,
+                 iou_threshold=.5):
+    """Evaluate YOLO model outputs of a single image and return filtered
+    boxes, same results as yolo_eval."""
+    image_shapes = None if image_shape is None else [image_shape]
+    return yolo_eval_batch_np(yolo_outputs, anchors, num_classes,
+                              image_shapes, max_boxes, score_threshold,
+                              iou_threshold)[0]
+
+
+def yolo_eval_batch_np(yolo_outputs,
+                       anchors,
+                       num_classes,
+                       image_shapes,
+                       max_boxes=20,
+                       score_threshold=.6,
+                       iou_threshold=.5):
+    """Evaluate YOLO model outputs of a batch of images.
+    Parameters
+    ----------
+    yolo_outputs: list of array, the outputs of yolo_body for m images
+    image_shapes: array-like, shape=(m, 2), hw of every original image, or
+        None to return boxes relative to the model input, e.g. to map them
+        back with a cached LetterboxGeometry
+    Returns
+    -------
+    detections: list with one (boxes, scores, classes) tuple per image
+    """
+    num_layers = len(yolo_outputs)
+    anchor_mask = [[6,7,8], [3,4,5], [0,1,2]] if num_layers==3 else [[3,4,5], [1,2,3]] # default setting
+    input_shape = np.array(yolo_outputs[0].shape[1:3]) * 32
+    # One hw per image, broadcast over grid and anchors.
+    if image_shapes is not None:
+        image_shapes = np.reshape(image_shapes, [-1, 1, 1, 1, 2])
+    boxes = []
+    box_scores = []
+    for l in range(num_layers):
+        _boxes, _box_scores = yolo_boxes_and_scores_np(yolo_outputs[l],
+            anchors[anchor_mask[l]], num_classes, input_shape, image_shapes)
+        boxes.append(_boxes)
+        box_scores.append(_box_scores)
+    boxes = np.concatenate(boxes, axis=1)
+    box_scores = np.concatenate(box_scores, axis=1)
+
+    return [yolo_filter_boxes_np(boxes[b], box_scores[b], num_classes,
+                                 max_boxes, score_threshold, iou_threshold)
+            for b in range(len(boxes))]
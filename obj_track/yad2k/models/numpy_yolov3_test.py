@@ -0,0 +1,151 @@
+"""Tests for obj_track.yad2k.models.numpy_yolov3."""
+
+import unittest
+
+import numpy as np
+
+from obj_track.yad2k.models.numpy_yolov3 import yolo_eval_batch_np, \
+    yolo_eval_np
+
+ANCHORS = np.array([[10, 13], [16, 30], [33, 23], [30, 61], [62, 45],
+                    [59, 119], [116, 90], [156, 198], [373, 326]],
+                   dtype='float32')
+ANCHOR_MASK = [[6, 7, 8], [3, 4, 5], [0, 1, 2]]
+NUM_CLASSES = 3
+INPUT_SIZE = 96
+
+
+def random_outputs(m, seed):
+    """Raw yolo_body outputs of m images, a few hundred boxes above the
+    threshold, many of them overlapping."""
+    rng = np.random.RandomState(seed)
+    outputs = []
+    for stride in (32, 16, 8):
+        grid = INPUT_SIZE // stride
+        feats = rng.randn(m, grid, grid, 3, NUM_CLASSES + 5)
+        feats[..., 2:4] *= .5
+        feats[..., 4] += 1.
+        outputs.append(feats.reshape(m, grid, grid, -1).astype('float32'))
+    return outputs
+
+
+def sigmoid(x):
+    return 1. / (1. + np.exp(-x))
+
+
+def iou(a, b):
+    h = max(min(a[2], b[2]) - max(a[0], b[0]), 0.)
+    w = max(min(a[3], b[3]) - max(a[1], b[1]), 0.)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - \
+        h * w
+    return h * w / union if union > 0 else 0.
+
+
+def reference_eval(outputs, image_shape, max_boxes, score_threshold,
+                   iou_threshold):
+    """Decode every cell and anchor in loops, then one greedy NMS per class
+    like yolo_eval does with tf.image.non_max_suppression."""
+    height, width = image_shape
+    scale = min(INPUT_SIZE / float(height), INPUT_SIZE / float(width))
+    new_h, new_w = round(height * scale), round(width * scale)
+    boxes = []
+    box_scores = []
+    for l, feats in enumerate(outputs):
+        grid = feats.shape[0]
+        feats = feats.reshape(grid, grid, 3, NUM_CLASSES + 5)
+        for row in range(grid):
+            for col in range(grid):
+                for a, anchor in enumerate(ANCHORS[ANCHOR_MASK[l]]):
+                    f = feats[row, col, a].astype('float64')
+                    x = (sigmoid(f[0]) + col) / grid
+                    y = (sigmoid(f[1]) + row) / grid
+                    w = np.exp(f[2]) * anchor[0] / INPUT_SIZE
+                    h = np.exp(f[3]) * anchor[1] / INPUT_SIZE
+                    # Undo the letterbox.
+                    x = (x - (INPUT_SIZE - new_w) / 2. / INPUT_SIZE) * \
+                        INPUT_SIZE / new_w
+                    y = (y - (INPUT_SIZE - new_h) / 2. / INPUT_SIZE) * \
+                        INPUT_SIZE / new_h
+                    w *= INPUT_SIZE / new_w
+                    h *= INPUT_SIZE / new_h
+                    boxes.append([(y - h / 2.) * height, (x - w / 2.) * width,
+                                  (y + h / 2.) * height,
+                                  (x + w / 2.) * width])
+                    box_scores.append(sigmoid(f[4]) * sigmoid(f[5:]))
+    boxes = np.array(boxes)
+    box_scores = np.array(box_scores)
+
+    out_boxes, out_scores, out_classes = [], [], []
+    for c in range(NUM_CLASSES):
+        candidates = np.nonzero(box_scores[:, c] >= score_threshold)[0]
+        candidates = candidates[np.argsort(-box_scores[candidates, c],
+                                           kind='mergesort')]
+        kept = []
+        for i in candidates:
+            if len(kept) == max_boxes:
+                break
+            if all(iou(boxes[i], boxes[k]) <= iou_threshold for k in kept):
+                kept.append(i)
+        out_boxes += [boxes[k] for k in kept]
+        out_scores += [box_scores[k, c] for k in kept]
+        out_classes += [c] * len(kept)
+    return (np.array(out_boxes).reshape(-1, 4), np.array(out_scores),
+            np.array(out_classes))
+
+
+class YoloEvalNpTest(unittest.TestCase):
+
+    def assert_detections_equal(self, detections, expected):
+        boxes, scores, classes = detections
+        expected_boxes, expected_scores, expected_classes = expected
+        np.testing.assert_array_equal(classes, expected_classes)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-4)
+        np.testing.assert_allclose(boxes, expected_boxes, rtol=1e-4,
+                                   atol=1e-2)
+
+    def test_single_image(self):
+        outputs = random_outputs(1, seed=0)
+        for image_shape in ((480, 640), (720, 405)):
+            detections = yolo_eval_np(outputs, ANCHORS, NUM_CLASSES,
+                                      image_shape, max_boxes=1000,
+                                      score_threshold=.3, iou_threshold=.5)
+            feats = [out[0] for out in outputs]
+            expected = reference_eval(feats, image_shape, 1000, .3, .5)
+            # The NMS removes part of the boxes above the threshold.
+            candidates = reference_eval(feats, image_shape, 1000, .3, 1.1)
+            self.assertLess(len(expected[2]), len(candidates[2]))
+            self.assert_detections_equal(detections, expected)
+
+    def test_max_boxes(self):
+        outputs = random_outputs(1, seed=1)
+        detections = yolo_eval_np(outputs, ANCHORS, NUM_CLASSES, (480, 640),
+                                  max_boxes=2, score_threshold=.2,
+                                  iou_threshold=.9)
+        expected = reference_eval([out[0] for out in outputs], (480, 640), 2,
+                                  .2, .9)
+        self.assertEqual(len(expected[2]), 2 * NUM_CLASSES)
+        self.assert_detections_equal(detections, expected)
+
+    def test_batch(self):
+        outputs = random_outputs(3, seed=2)
+        image_shapes = [(480, 640), (720, 1280), (300, 300)]
+        detections = yolo_eval_batch_np(outputs, ANCHORS, NUM_CLASSES,
+                                        image_shapes, score_threshold=.3)
+        self.assertEqual(len(detections), 3)
+        for b, image_shape in enumerate(image_shapes):
+            expected = reference_eval([out[b] for out in outputs],
+                                      image_shape, 20, .3, .5)
+            self.assert_detections_equal(detections[b], expected)
+
+    def test_no_detection(self):
+        outputs = random_outputs(2, seed=3)
+        for boxes, scores, classes in yolo_eval_batch_np(
+                outputs, ANCHORS, NUM_CLASSES, [(480, 640)] * 2,
+                score_threshold=1.1):
+            self.assertEqual(boxes.shape, (0, 4))
+            self.assertEqual(scores.shape, (0,))
+            self.assertEqual(classes.shape, (0,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Streaming reader of Darknet .weights files.
+
+The whole file is memory-mapped once and every tensor is a view on the map at
+a moving offset, nothing is copied until Keras assigns the weights to the
+layers and the OS only pages in the parts being read.
+"""
+
+import numpy as np
+
+
+class DarknetWeights(object):
+    """Darknet weights file read sequentially from a memory map.
+
+    Darknet writes a header (major, minor, revision, seen) followed by the
+    float32 weights of every layer in the order of the cfg file.
+
+    Parameters
+    ----------
+    path: str, path of the .weights file
+    legacy_header: bool, read seen as int32 whatever the version, like the
+        YOLOv2 branch of the converter always did (16 bytes of header)
+    """
+
+    def __init__(self, path, legacy_header=False):
+        self.path = path
+        self.data = np.memmap(path, dtype='uint8', mode='r')
+        self.offset = 0
+        major, minor, revision = self.read((3, ), dtype='int32')
+        if not legacy_header and (major * 10 + minor) >= 2 and \
+                major < 1000 and minor < 1000:
+            seen, = self.read((1, ), dtype='int64')
+        else:
+            seen, = self.read((1, ), dtype='int32')
+        self.header = (int(major), int(minor), int(revision), int(seen))
+        self.weights_start = self.offset
+
+    def read(self, shape, dtype='float32'):
+        """Return a read-only view of the next tensor and move past it."""
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        if self.offset + size > len(self.data):
+            raise ValueError(
+                'Tried to read {} bytes at offset {} of {}, only {} '
+                'left.'.format(size, self.offset, self.path,
+                               len(self.data) - self.offset))
+        array = np.ndarray(shape, dtype=dtype, buffer=self.data,
+                           offset=self.offset)
+        self.offset += size
+        return array
+
+    def read_conv(self, filters, in_channels, size, batch_normalize):
+        """Read the weights of a convolutional layer.
+
+        Darknet serializes convolutional weights as
+        [bias/beta, [gamma, mean, variance], conv_weights], the kernel
+        Caffe-style (out_dim, in_dim, height, width).
+
+        Returns
+        -------
+        conv_bias: array, shape=(filters,), bias, or beta with batch
+            normalization
+        bn_weights: array, shape=(3, filters), gamma, mean and variance,
+            None without batch normalization
+        conv_weights: array, kernel in Tensorflow order (height, width,
+            in_dim, out_dim), a transposed view copied only when it is used
+        """
+        conv_bias = self.read((filters, ))
+        bn_weights = self.read((3, filters)) if batch_normalize else None
+        conv_weights = self.read((filters, in_channels, size, size))
+        return conv_bias, bn_weights, conv_weights.transpose([2, 3, 1, 0])
+
+    @property
+    def count(self):
+        """Number of weights read after the header."""
+        return (self.offset - self.weights_start) // 4
+
+    @property
+    def remaining(self):
+        """Number of weights left to read."""
+        return (len(self.data) - self.offset) // 4
+
+    def close(self):
+        # Release the map, views still alive keep their own reference.
+        self.data = None
@@ -0,0 +1,82 @@
+"""Tests for obj_track.yad2k.utils.darknet_weights."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from obj_track.yad2k.utils.darknet_weights import DarknetWeights
+
+
+class DarknetWeightsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_weights(self, header, seen_dtype, *arrays):
+        path = os.path.join(self.tmp_dir, 'test.weights')
+        with open(path, 'wb') as fid:
+            fid.write(np.array(header, dtype='int32').tobytes())
+            fid.write(np.array([1000], dtype=seen_dtype).tobytes())
+            for array in arrays:
+                fid.write(np.asarray(array, dtype='float32').tobytes())
+        return path
+
+    def test_header(self):
+        path = self.write_weights([0, 2, 0], 'int64')
+        self.assertEqual(DarknetWeights(path).header, (0, 2, 0, 1000))
+        path = self.write_weights([0, 1, 0], 'int32')
+        self.assertEqual(DarknetWeights(path).header, (0, 1, 0, 1000))
+
+    def test_legacy_header(self):
+        path = self.write_weights([0, 2, 0], 'int32', [1., 2.])
+        weights = DarknetWeights(path, legacy_header=True)
+        self.assertEqual(weights.header, (0, 2, 0, 1000))
+        self.assertEqual(weights.remaining, 2)
+
+    def test_read_conv(self):
+        filters, in_channels, size = 4, 3, 3
+        bias = np.arange(filters)
+        bn = np.arange(3 * filters).reshape(3, filters) + 10
+        kernel = np.random.rand(filters, in_channels, size, size)
+        path = self.write_weights([0, 2, 0], 'int64', bias, bn, kernel,
+                                  bias, kernel)
+        weights = DarknetWeights(path)
+
+        conv_bias, bn_weights, conv_weights = weights.read_conv(
+            filters, in_channels, size, True)
+        np.testing.assert_array_equal(conv_bias, bias)
+        np.testing.assert_array_equal(bn_weights, bn)
+        np.testing.assert_array_equal(
+            conv_weights, np.transpose(kernel, [2, 3, 1, 0]).astype('float32'))
+        self.assertEqual(weights.count, filters * 4 + kernel.size)
+
+        conv_bias, bn_weights, conv_weights = weights.read_conv(
+            filters, in_channels, size, False)
+        self.assertIsNone(bn_weights)
+        np.testing.assert_array_equal(conv_bias, bias)
+        self.assertEqual(conv_weights.shape,
+                         (size, size, in_channels, filters))
+        self.assertEqual(weights.remaining, 0)
+
+    def test_views_are_not_copies(self):
+        path = self.write_weights([0, 2, 0], 'int64', np.ones(8))
+        weights = DarknetWeights(path)
+        conv_bias, _, conv_weights = weights.read_conv(2, 1, 1, False)
+        self.assertFalse(conv_bias.flags.owndata)
+        self.assertFalse(conv_weights.flags.writeable)
+
+    def test_read_past_end(self):
+        path = self.write_weights([0, 2, 0], 'int64', np.ones(3))
+        weights = DarknetWeights(path)
+        with self.assertRaises(ValueError):
+            weights.read((4, ))
+
+
+if __name__ == '__main__':
+    unittest.main()
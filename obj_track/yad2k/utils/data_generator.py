@@ -0,0 +1,178 @@
+"""Training batches of YOLO_v3 augmented in a pool of processes.
+
+get_random_data runs in worker processes which write the augmented images
+and boxes straight into batches in shared memory (multiprocessing.RawArray),
+so nothing but the annotation lines and the seeds is pickled. Batches are
+prepared ``prefetch`` ahead of the one being consumed.
+"""
+
+import collections
+import multiprocessing
+
+import cv2
+import numpy as np
+
+from ..models.keras_yolov3 import preprocess_true_boxes
+from .utils_yolo_v3 import get_random_data
+
+# Views on the shared batches of a worker process, set by _init_worker.
+_WORKER = {}
+
+
+def _batch_views(images, boxes, batch_shape, max_boxes):
+    # numpy views on the RawArrays of every slot.
+    return ([np.frombuffer(a, dtype='float32').reshape(batch_shape)
+             for a in images],
+            [np.frombuffer(a, dtype='float32').reshape(
+                (batch_shape[0], max_boxes, 5)) for a in boxes])
+
+
+def _init_worker(images, boxes, batch_shape, options):
+    # OpenCV threads would compete with the other workers.
+    cv2.setNumThreads(1)
+    _WORKER['images'], _WORKER['boxes'] = _batch_views(
+        images, boxes, batch_shape, options['max_boxes'])
+    _WORKER['options'] = options
+
+
+def _fill_sample(slot, index, annotation_line, seed):
+    """Augment one sample into its place of a shared batch."""
+    # Seeded per sample: forked workers would share the random state
+    # otherwise, and the batches do not depend on the number of workers.
+    np.random.seed(seed)
+    image_data, box_data = get_random_data(annotation_line,
+                                           **_WORKER['options'])
+    _WORKER['images'][slot][index] = image_data
+    _WORKER['boxes'][slot][index] = box_data
+
+
+class DataGenerator(object):
+    """Endless iterator of augmented (image_data, box_data) batches.
+
+    Parameters
+    ----------
+    annotation_lines: list of str, "path x_min,y_min,x_max,y_max,class ..."
+    batch_size: int
+    input_shape: tuple, hw, multiples of 32
+    workers: int, number of processes, cpu_count() if None, 0 augments in
+        the calling process
+    prefetch: int, number of batches prepared ahead
+    random: bool, augment the images or only letterbox them
+    max_boxes: int, boxes per image, zero padded
+    hsv: str, backend of the HSV jitter, see distort_image
+    copy: bool, return copies of the batches; if False the arrays are views
+        on shared memory, valid until the next call
+    seed: int, seed of the shuffling and of the augmentation
+    """
+
+    def __init__(self, annotation_lines, batch_size, input_shape,
+                 workers=None, prefetch=2, random=True, max_boxes=20,
+                 hsv='lut', copy=True, seed=None):
+        if not annotation_lines:
+            raise ValueError('No annotation lines')
+        self.annotation_lines = list(annotation_lines)
+        self.batch_size = batch_size
+        self.input_shape = tuple(input_shape)
+        self.copy = copy
+        self.rng = np.random.RandomState(seed)
+        self.index = 0
+        self.rng.shuffle(self.annotation_lines)
+
+        # One batch being consumed and prefetch being augmented.
+        num_slots = max(1, prefetch) + 1
+        batch_shape = (batch_size, ) + self.input_shape + (3, )
+        size = int(np.prod(batch_shape))
+        self._images = [multiprocessing.RawArray('f', size)
+                        for _ in range(num_slots)]
+        self._boxes = [multiprocessing.RawArray('f',
+                                                batch_size * max_boxes * 5)
+                       for _ in range(num_slots)]
+        options = {'input_shape': self.input_shape, 'random': random,
+                   'max_boxes': max_boxes, 'hsv': hsv}
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers > 0:
+            self.pool = multiprocessing.Pool(
+                workers, initializer=_init_worker,
+                initargs=(self._images, self._boxes, batch_shape, options))
+        else:
+            self.pool = None
+            _init_worker(self._images, self._boxes, batch_shape, options)
+        self.images, self.boxes = _batch_views(self._images, self._boxes,
+                                               batch_shape, max_boxes)
+
+        self._pending = collections.deque()
+        self._held = None
+        for slot in range(num_slots - 1):
+            self._submit(slot)
+        self._free = [num_slots - 1]
+
+    def _next_lines(self):
+        lines = []
+        for _ in range(self.batch_size):
+            lines.append(self.annotation_lines[self.index])
+            self.index += 1
+            if self.index == len(self.annotation_lines):
+                # New epoch, new order.
+                self.index = 0
+                self.rng.shuffle(self.annotation_lines)
+        return lines
+
+    def _submit(self, slot):
+        lines = self._next_lines()
+        seeds = self.rng.randint(0, 2 ** 31 - 1, size=len(lines))
+        if self.pool is None:
+            for index, (line, seed) in enumerate(zip(lines, seeds)):
+                _fill_sample(slot, index, line, seed)
+            results = []
+        else:
+            results = [self.pool.apply_async(_fill_sample,
+                                             (slot, index, line, seed))
+                       for index, (line, seed) in enumerate(zip(lines, seeds))]
+        self._pending.append((slot, results))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the next batch, image_data shape=(batch_size, h, w, 3)
+        from 0 to 1 and box_data shape=(batch_size, max_boxes, 5)."""
+        if self._held is not None:
+            # The views returned last time are not used anymore.
+            self._submit(self._held)
+            self._held = None
+        else:
+            self._submit(self._free.pop())
+        slot, results = self._pending.popleft()
+        for result in results:
+            # Raises the exception of a failed sample.
+            result.get()
+        if self.copy:
+            self._free.append(slot)
+            return self.images[slot].copy(), self.boxes[slot].copy()
+        self._held = slot
+        return self.images[slot], self.boxes[slot]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def data_generator(annotation_lines, batch_size, input_shape, anchors,
+                   num_classes, **kwargs):
+    """Keras generator of ([image_data, *y_true], dummy loss targets), the
+    batches augmented by a DataGenerator built with kwargs."""
+    with DataGenerator(annotation_lines, batch_size, input_shape,
+                       **kwargs) as batches:
+        for image_data, box_data in batches:
+            y_true = preprocess_true_boxes(box_data, input_shape, anchors,
+                                           num_classes)
+            yield [image_data] + y_true, np.zeros(batch_size)
@@ -0,0 +1,69 @@
+"""Tests for obj_track.yad2k.utils.data_generator."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from obj_track.yad2k.utils.data_generator import DataGenerator
+
+
+class DataGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.lines = []
+        for n in range(5):
+            path = os.path.join(self.tmp_dir, '{}.png'.format(n))
+            cv2.imwrite(path, rng.randint(0, 256, size=(120 + 10 * n, 160, 3),
+                                          dtype='uint8'))
+            self.lines.append('{} 10,20,90,100,{} 30,5,60,50,1'.format(path, n))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def batches(self, num_batches, **kwargs):
+        with DataGenerator(self.lines, 3, (64, 96), seed=1,
+                           **kwargs) as generator:
+            return [next(generator) for _ in range(num_batches)]
+
+    def test_shapes(self):
+        for image_data, box_data in self.batches(4, workers=0, max_boxes=4):
+            self.assertEqual(image_data.shape, (3, 64, 96, 3))
+            self.assertEqual(box_data.shape, (3, 4, 5))
+            self.assertTrue(0 <= image_data.min() <= image_data.max() <= 1)
+            # Both boxes of every image are in the batch, then padding.
+            self.assertTrue((box_data[:, 2:] == 0).all())
+
+    def test_workers_match_in_process(self):
+        expected = self.batches(4, workers=0)
+        for (image_data, box_data), (ref_image, ref_box) in zip(
+                self.batches(4, workers=2), expected):
+            np.testing.assert_array_equal(image_data, ref_image)
+            np.testing.assert_array_equal(box_data, ref_box)
+
+    def test_views(self):
+        with DataGenerator(self.lines, 2, (64, 96), workers=2, prefetch=1,
+                           copy=False, seed=1) as generator:
+            image_data, _ = next(generator)
+            self.assertFalse(image_data.flags.owndata)
+            first = image_data.copy()
+            next(generator)
+            # Slot of the first batch reused once the second one is taken.
+            next(generator)
+            self.assertFalse(np.array_equal(first, image_data))
+
+    def test_epoch_covers_every_line(self):
+        with DataGenerator(self.lines, 5, (64, 96), workers=0,
+                           random=False, seed=1) as generator:
+            _, box_data = next(generator)
+        self.assertEqual(sorted(box_data[:, :2, 4].max(axis=1)),
+                         [1, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
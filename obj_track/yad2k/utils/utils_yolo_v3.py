@@ -52,9 +52,69 @@ def letterbox_image_cv(image, size):
 def rand(a=0, b=1):
     return np.random.rand()*(b-a) + a
 
+HSV_BACKENDS = ('lut', 'cv2', 'matplotlib')
+
+
+def _hsv_luts(hue, sat, val):
+    # Lookup tables of the three HSV_FULL channels, hue on 256 levels.
+    levels = np.arange(256, dtype='float32')
+    lut = np.empty((256, 1, 3), dtype='uint8')
+    lut[:, 0, 0] = np.floor(levels + hue * 256 + .5).astype('int32') % 256
+    lut[:, 0, 1] = np.clip(levels * sat + .5, 0, 255)
+    lut[:, 0, 2] = np.clip(levels * val + .5, 0, 255)
+    return lut
+
+
+def distort_image(image, hue, sat, val, backend='lut'):
+    '''shift the hue and scale the saturation and value of an RGB image
+    Parameters
+    ----------
+    image: PIL image or uint8 array, RGB
+    hue: float, shift in [-1, 1] turns
+    sat, val: float, scale factors
+    backend: str, lut jitters the uint8 HSV image with cv2.LUT, cv2 and
+        matplotlib convert it to float32 and float64 HSV
+    Returns
+    -------
+    image_data: array, RGB from 0 to 1
+    '''
+    if backend == 'lut':
+        x = cv2.cvtColor(np.asarray(image, dtype='uint8'),
+                         cv2.COLOR_RGB2HSV_FULL)
+        x = cv2.LUT(x, _hsv_luts(hue, sat, val))
+        x = cv2.cvtColor(x, cv2.COLOR_HSV2RGB_FULL)
+        return x.astype('float32') * (1 / 255.)
+    if backend == 'cv2':
+        x = cv2.cvtColor(np.asarray(image, dtype='float32') * (1 / 255.),
+                         cv2.COLOR_RGB2HSV)
+        # Hue in degrees with float images.
+        h = x[..., 0]
+        h += hue * 360
+        h[h >= 360] -= 360
+        h[h < 0] += 360
+        x[..., 1] *= sat
+        x[..., 2] *= val
+        np.clip(x[..., 1:], 0, 1, out=x[..., 1:])
+        return cv2.cvtColor(x, cv2.COLOR_HSV2RGB)
+    if backend != 'matplotlib':
+        raise ValueError('Unknown HSV backend {}, expected one of '
+                         '{}'.format(backend, HSV_BACKENDS))
+    x = rgb_to_hsv(np.array(image)/255.)
+    x[..., 0] += hue
+    x[..., 0][x[..., 0]>1] -= 1
+    x[..., 0][x[..., 0]<0] += 1
+    x[..., 1] *= sat
+    x[..., 2] *= val
+    x[x>1] = 1
+    x[x<0] = 0
+    return hsv_to_rgb(x) # numpy array, 0 to 1
+
+
 def get_random_data(annotation_line, input_shape, random=True, max_boxes=20,
-                    jitter=.3, hue=.1, sat=1.5, val=1.5, proc_img=True):
-    '''random preprocessing for real-time data augmentation'''
+                    jitter=.3, hue=.1, sat=1.5, val=1.5, proc_img=True,
+                    hsv='lut'):
+    '''random preprocessing for real-time data augmentation, hsv is the
+    backend of distort_image'''
     line = annotation_line.split()
     image = Image.open(line[0])
     iw, ih = image.size
@@ -112,15 +172,7 @@ def get_random_data(annotation_line, input_shape, random=True, max_boxes=20,
     hue = rand(-hue, hue)
     sat = rand(1, sat) if rand()<.5 else 1/rand(1, sat)
     val = rand(1, val) if rand()<.5 else 1/rand(1, val)
-    x = rgb_to_hsv(np.array(image)/255.)
-    x[..., 0] += hue
-    x[..., 0][x[..., 0]>1] -= 1
-    x[..., 0][x[..., 0]<0] += 1
-    x[..., 1] *= sat
-    x[..., 2] *= val
-    x[x>1] = 1
-    x[x<0] = 0
-    image_data = hsv_to_rgb(x) # numpy array, 0 to 1
+    image_data = distort_image(image, hue, sat, val, backend=hsv)
 
     # correct boxes
     box_data = np.zeros((max_boxes,5))
@@ -0,0 +1,79 @@
+"""Tests for the HSV jitter backends of obj_track.yad2k.utils.utils_yolo_v3."""
+
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from obj_track.yad2k.utils.utils_yolo_v3 import distort_image, _hsv_luts
+
+# Grey levels lost by the uint8 HSV_FULL round trip of the lut backend.
+IDENTITY_MAX_ERROR = 8
+JITTER_MAX_ERROR = 12
+
+
+class DistortImageTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.image = rng.randint(0, 256, size=(64, 48, 3), dtype='uint8')
+
+    def difference(self, image, hue, sat, val):
+        """Grey level difference of the lut and matplotlib backends."""
+        lut = distort_image(image, hue, sat, val)
+        reference = distort_image(image, hue, sat, val,
+                                  backend='matplotlib')
+        self.assertEqual(lut.shape, reference.shape)
+        self.assertEqual(lut.dtype, np.float32)
+        return np.abs(lut - reference) * 255
+
+    def test_identity(self):
+        difference = self.difference(self.image, 0, 1, 1)
+        self.assertLessEqual(difference.max(), IDENTITY_MAX_ERROR + 1e-3)
+        self.assertLess(difference.mean(), 1)
+
+    def test_jitter(self):
+        for jitter in ((.1, 1.5, 1.5), (-.1, .7, .7), (.3, 1.2, .8),
+                       (-.45, 2, 2)):
+            difference = self.difference(self.image, *jitter)
+            self.assertLessEqual(difference.max(), JITTER_MAX_ERROR, jitter)
+            self.assertLess(difference.mean(), 2, jitter)
+
+    def test_pil_image(self):
+        np.testing.assert_array_equal(
+            distort_image(Image.fromarray(self.image), .1, 1.5, .8),
+            distort_image(self.image, .1, 1.5, .8))
+
+    def test_hue_wrap_around(self):
+        lut = _hsv_luts(.5, 1, 1)[:, 0, 0]
+        self.assertEqual(list(lut[[0, 127, 128, 255]]), [128, 255, 0, 127])
+        lut = _hsv_luts(-.25, 1, 1)[:, 0, 0]
+        self.assertEqual(list(lut[[0, 63, 64, 255]]), [192, 255, 0, 191])
+        # Red, green and blue turned by half a turn and a negative quarter.
+        primaries = np.array([[[255, 0, 0], [0, 255, 0], [0, 0, 255]]],
+                             dtype='uint8')
+        for hue in (.5, -.25):
+            self.assertLessEqual(
+                self.difference(primaries, hue, 1, 1).max(),
+                IDENTITY_MAX_ERROR, hue)
+
+    def test_saturation_value_clipping(self):
+        lut = _hsv_luts(0, 3, 3)
+        np.testing.assert_array_equal(lut[:, 0, 1], lut[:, 0, 2])
+        self.assertEqual(list(lut[[0, 1, 85, 86, 255], 0, 1]),
+                         [0, 3, 255, 255, 255])
+        # Bright pixels saturate instead of wrapping around.
+        bright = np.array([[[255, 200, 100], [250, 250, 250]]],
+                          dtype='uint8')
+        image_data = distort_image(bright, 0, 3, 3)
+        # Full saturation and value keep the hue of the orange pixel, the
+        # grey one stays unsaturated.
+        np.testing.assert_allclose(image_data[0, 0, [0, 2]], [1, 0])
+        self.assertGreater(image_data[0, 0, 1], .5)
+        np.testing.assert_allclose(image_data[0, 1], [1, 1, 1])
+        self.assertLessEqual(self.difference(bright, 0, 3, 3).max(),
+                             IDENTITY_MAX_ERROR)
+
+
+if __name__ == '__main__':
+    unittest.main()